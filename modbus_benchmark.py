@@ -0,0 +1,234 @@
+"""
+Benchmark de sondeo contra el simulador local (modbus_simulator.py).
+
+Levanta el simulador en este proceso, arma driver + broker + clientes de GRD y
+de reles igual que el orquestador (con una DB SQLite temporal) y corre ambos
+bucles durante --duracion segundos. Reporta por cliente:
+  - tiempo de ciclo (prom / p95 / max),
+  - requests Modbus por ciclo (contados del lado del simulador),
+  - latencia de deteccion de los cambios aplicados por el simulador.
+
+Uso:
+    python modbus_benchmark.py --duracion 60 --cambios-por-minuto 30 --latencia-ms 15
+    python modbus_benchmark.py --driver async --max-in-flight 8 --tasa-timeout 0.01
+"""
+import os
+import tempfile
+import threading
+import time
+
+from modbus_simulator import build_arg_parser, load_script, simulator_from_args
+
+
+def configure_environment(data_dir: str, host: str, port: int, unit_id: int, register_count: int, interval: float) -> None:
+    """Variables que src.config exige, apuntando al gateway indicado y a una DB en data_dir."""
+    os.environ.update({
+        "MODBUS_MW_MB_HOST": host,
+        "MODBUS_MW_MB_PORT": str(port),
+        "MODBUS_MW_MB_ID": str(unit_id),
+        "MODBUS_MW_MB_COUNT": str(register_count),
+        "MODBUS_MW_MB_INTERVAL_SECONDS": str(max(1, int(interval))),
+        "MODBUS_MW_DATA_DIR": data_dir,
+    })
+    for name, value in {
+        "MQTT_BROKER_HOST": "localhost",
+        "MQTT_BROKER_PORT": "1883",
+        "MQTT_BROKER_USERNAME": "benchmark",
+        "MQTT_BROKER_PASSWORD": "benchmark",
+        "MQTT_BROKER_USE_TLS": "false",
+    }.items():
+        os.environ.setdefault(name, value)
+
+
+class NullPublisher:
+    """El benchmark no publica a MQTT."""
+
+    def publish_grado(self, payload):
+        pass
+
+    def publish_grds(self, payload):
+        pass
+
+
+def _summary(values: list[float]) -> str:
+    if not values:
+        return "sin muestras"
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return (
+        f"n={len(ordered)} prom={1000 * sum(ordered) / len(ordered):.1f}ms "
+        f"p95={1000 * p95:.1f}ms max={1000 * ordered[-1]:.1f}ms"
+    )
+
+
+class _LoopStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.cycles: list[float] = []
+        self.requests: list[int] = []
+        self.detections: list[float] = []
+        self.missed = 0
+
+    def report(self) -> None:
+        requests = sum(self.requests) / len(self.requests) if self.requests else 0.0
+        print(f"[{self.name}]")
+        print(f"  ciclo:     {_summary(self.cycles)}")
+        print(f"  requests:  {requests:.1f} por ciclo")
+        print(f"  deteccion: {_summary(self.detections)} (no detectados: {self.missed})")
+
+
+def _run_loop(stats, step, units, simulator, detect, deadline, interval):
+    """Ejecuta step() a periodo fijo hasta deadline, midiendo ciclo, requests y detecciones."""
+    pending = []
+    seen = 0
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        before = sum(simulator.requests_by_unit.get(unit, 0) for unit in units())
+        step()
+        finished = time.monotonic()
+        stats.cycles.append(finished - started)
+        stats.requests.append(sum(simulator.requests_by_unit.get(unit, 0) for unit in units()) - before)
+
+        events = simulator.events[seen:]
+        seen += len(events)
+        pending.extend(event for event in events if event.kind == detect.kind)
+        still_pending = []
+        for event in pending:
+            if detect(event):
+                stats.detections.append(finished - event.at)
+            elif any(other.target == event.target and other.at > event.at for other in pending):
+                # Un cambio posterior del mismo destino lo tapo antes de detectarlo.
+                stats.missed += 1
+            else:
+                still_pending.append(event)
+        pending = still_pending
+
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    stats.missed += len(pending)
+
+
+def main() -> None:
+    parser = build_arg_parser()
+    parser.description = "Benchmark de sondeo GRD/reles contra el simulador"
+    parser.add_argument("--duracion", type=float, default=30.0, help="segundos de medicion")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="periodo de ciclo de cada cliente")
+    parser.add_argument("--driver", choices=("sync", "async"), default="sync")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--timeout-s", type=float, default=2.0)
+    parser.add_argument("--rele-concurrencia", type=int, default=1)
+    parser.add_argument("--sin-reles", action="store_true", help="medir solo el cliente de GRDs")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="modbus-bench-")
+    configure_environment(data_dir, args.host, args.port, args.gateway_unit, args.register_count, args.intervalo)
+
+    from src.logger import Logosaurio
+    from src.modbus.modbus_driver import ModbusTcpDriver
+    from src.modbus.modbus_driver_async import AsyncModbusTcpDriver
+    from src.modbus.request_broker import PRIORIDAD_GRD, PRIORIDAD_RELE, ModbusRequestBroker
+    from src.modbus.server_mb_middleware import GrdMiddlewareClient
+    from src.modbus.server_mb_reles import ProtectionRelayClient
+    from src.modbus.unit_health import UnitHealthRegistry
+    from src.persistencia import ddl_esquema
+    from src.persistencia.dao.dao_grd import grd_dao
+    from src.persistencia.dao.dao_reles import reles_dao
+    from src.services.state_store import ObserverStateStore
+
+    simulator = simulator_from_args(args)
+    simulator.start(args.host, args.port)
+
+    ddl_esquema.create_database_schema()
+    for grd_id in range(1, args.grds + 1):
+        grd_dao.insert_grd_description(grd_id, f"GRD simulado {grd_id}")
+    if not args.sin_reles:
+        for unit_id in args.reles:
+            reles_dao.insert_rele_description(unit_id, f"Rele simulado {unit_id}")
+
+    logger = Logosaurio()
+    health = UnitHealthRegistry(min_timeout=0.05, max_timeout=args.timeout_s)
+    if args.driver == "async":
+        driver = AsyncModbusTcpDriver(
+            args.host, args.port, args.timeout_s, logger, max_in_flight=args.max_in_flight, health=health
+        )
+        workers = args.max_in_flight
+    else:
+        driver = ModbusTcpDriver(args.host, args.port, args.timeout_s, logger, health=health)
+        workers = 1
+    broker = ModbusRequestBroker(driver, logger, workers=workers)
+    broker.start()
+
+    grd_client = GrdMiddlewareClient(
+        modbus_driver=broker.channel(PRIORIDAD_GRD),
+        default_unit_id=args.gateway_unit,
+        register_count=args.register_count,
+        refresh_interval=args.intervalo,
+        logger=logger,
+        mqtt_publisher=NullPublisher(),
+    )
+    grd_client._refresh_grd_data()
+    grd_ids = list(grd_client._active_grd_data or {})
+
+    observer_store = ObserverStateStore(os.path.join(data_dir, "modbus-mw-state.json"))
+    observer_store.set_reles_enabled(not args.sin_reles)
+    relay_client = ProtectionRelayClient(
+        modbus_driver=broker.channel(PRIORIDAD_RELE),
+        refresh_interval=args.intervalo,
+        logger=logger,
+        observer_store=observer_store,
+        max_concurrency=args.rele_concurrencia,
+    )
+    relay_ids = list(relay_client.relay_unit_ids)
+
+    def grd_detected(event):
+        return grd_client.state_cache.get(event.target) == event.value
+    grd_detected.kind = "grd"
+
+    def fault_detected(event):
+        watermark = relay_client._watermarks.get(event.target)
+        return watermark is not None and watermark[0] >= event.value
+    fault_detected.kind = "falla"
+
+    deadline = time.monotonic() + args.duracion
+    grd_stats = _LoopStats("GRD")
+    relay_stats = _LoopStats("Reles")
+    threads = [
+        threading.Thread(
+            target=simulator.run_script,
+            args=(load_script(args.guion), args.cambios_por_minuto, args.duracion),
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_run_loop,
+            args=(grd_stats, lambda: grd_client.poll_once(grd_ids), lambda: {args.gateway_unit},
+                  simulator, grd_detected, deadline, args.intervalo),
+            daemon=True,
+        ),
+    ]
+    if relay_ids:
+        threads.append(threading.Thread(
+            target=_run_loop,
+            args=(relay_stats, lambda: relay_client.sweep(relay_ids), lambda: set(relay_ids),
+                  simulator, fault_detected, deadline, args.intervalo),
+            daemon=True,
+        ))
+
+    print(f"Midiendo {args.duracion:.0f}s: {len(grd_ids)} GRDs, reles {relay_ids}, driver {args.driver}")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print()
+    grd_stats.report()
+    if relay_ids:
+        relay_stats.report()
+    print(f"[simulador] {simulator.stats}")
+    print(f"[broker] {broker.get_stats()}")
+
+    broker.stop()
+    driver.disconnect()
+    simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
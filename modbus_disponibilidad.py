@@ -0,0 +1,37 @@
+"""
+Backfill de los rollups de disponibilidad (disponibilidad_hora / disponibilidad_dia)
+a partir de 'historicos'. Aplica antes las migraciones pendientes del esquema.
+
+El servicio mantiene los rollups en cada insert; este comando solo hace falta
+para cargar la historia previa o para recalcularla. Es idempotente y procesa un
+GRD por transaccion, por lo que puede correr con el servicio levantado.
+
+Uso:
+    python modbus_disponibilidad.py
+    python modbus_disponibilidad.py --grd 5 --grd 7
+"""
+import argparse
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill de rollups de disponibilidad por GRD")
+    parser.add_argument("--grd", type=int, action="append", help="GRD a recalcular (repetible; por defecto todos)")
+    args = parser.parse_args()
+
+    from src.persistencia import ddl_esquema
+    from src.persistencia.dao.dao_base import close_all_connections
+    from src.persistencia.dao.dao_disponibilidad import disponibilidad_dao
+
+    ddl_esquema.create_database_schema()
+    started = time.perf_counter()
+    result = disponibilidad_dao.rebuild(args.grd)
+    elapsed = time.perf_counter() - started
+    for grd_id, hours in result.items():
+        print(f"GRD {grd_id}: {hours} horas")
+    print(f"Disponibilidad recalculada para {len(result)} GRDs en {elapsed:.1f}s")
+    close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Reproduce una captura de respuestas Modbus (MODBUS_MW_CAPTURE_FILE) contra los
+clientes de GRD y de reles, a maxima velocidad y sin red.
+
+Usa una DB SQLite temporal (o --data-dir) con los catalogos de config, repite
+ciclos de poll_once / sweep mientras la captura siga respondiendo y reporta
+frames consumidos, ciclos, tiempo de decodificacion + persistencia y cambios
+registrados. La captura debe venir del mismo conjunto de GRDs/reles e
+intervalos: las lecturas se emparejan por (funcion, unit, direccion, cantidad).
+
+Uso:
+    python modbus_replay.py /app/data/captura.bin --register-count 16 --gateway-unit 1
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from modbus_benchmark import NullPublisher, configure_environment
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay de capturas Modbus")
+    parser.add_argument("captura", help="archivo de captura (se leen tambien sus rotaciones .1, .2, ...)")
+    parser.add_argument("--register-count", type=int, default=16, help="registros por bloque de GRD")
+    parser.add_argument("--gateway-unit", type=int, default=1, help="unit id de los bloques de GRD")
+    parser.add_argument("--data-dir", help="directorio de la DB (por defecto uno temporal)")
+    parser.add_argument("--sin-reles", action="store_true", help="reproducir solo el trafico de GRDs")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="modbus-replay-")
+    configure_environment(data_dir, "replay", 0, args.gateway_unit, args.register_count, 1)
+
+    from src import config
+    from src.logger import Logosaurio
+    from src.modbus.frame_recorder import ReplayDriver, iter_capture
+    from src.modbus.server_mb_middleware import GrdMiddlewareClient
+    from src.modbus.server_mb_reles import ProtectionRelayClient
+    from src.persistencia import ddl_esquema
+    from src.persistencia.dao.dao_base import get_db_connection, release_db_connection
+    from src.persistencia.dao.dao_grd import grd_dao
+    from src.persistencia.dao.dao_reles import reles_dao
+    from src.services.state_store import ObserverStateStore
+
+    ddl_esquema.create_database_schema()
+    for grd_id, description in config.GRD_DESCRIPTIONS.items():
+        grd_dao.insert_grd_description(grd_id, description)
+    for unit_id, description in config.ESCLAVOS_MB.items():
+        if not description.strip().upper().startswith("NO APLICA"):
+            reles_dao.insert_rele_description(unit_id, description)
+
+    driver = ReplayDriver(iter_capture(args.captura))
+    print(f"Captura: {driver.total} frames, {len(driver.keys())} lecturas distintas")
+    logger = Logosaurio()
+
+    grd_client = GrdMiddlewareClient(
+        modbus_driver=driver,
+        default_unit_id=args.gateway_unit,
+        register_count=args.register_count,
+        refresh_interval=1,
+        logger=logger,
+        mqtt_publisher=NullPublisher(),
+    )
+    grd_client._refresh_grd_data()
+    grd_ids = list(grd_client._active_grd_data or {})
+
+    started = time.perf_counter()
+    grd_cycles = 0
+    while True:
+        served = driver.served
+        grd_client.poll_once(grd_ids)
+        if driver.served == served:
+            break
+        grd_cycles += 1
+    grd_elapsed = time.perf_counter() - started
+
+    relay_cycles = 0
+    relay_elapsed = 0.0
+    if not args.sin_reles:
+        observer_store = ObserverStateStore(os.path.join(data_dir, "modbus-mw-state.json"))
+        observer_store.set_reles_enabled(True)
+        relay_client = ProtectionRelayClient(
+            modbus_driver=driver,
+            refresh_interval=1,
+            logger=logger,
+            observer_store=observer_store,
+        )
+        started = time.perf_counter()
+        while relay_client.relay_unit_ids:
+            served = driver.served
+            relay_client.sweep(relay_client.relay_unit_ids)
+            if driver.served == served:
+                break
+            relay_cycles += 1
+        relay_elapsed = time.perf_counter() - started
+
+    conn = get_db_connection()
+    try:
+        historicos = conn.execute("SELECT COUNT(*) FROM historicos").fetchone()[0]
+        fallas = conn.execute("SELECT COUNT(*) FROM fallas_reles").fetchone()[0]
+    finally:
+        release_db_connection(conn)
+
+    print()
+    print(f"[GRD]   ciclos={grd_cycles} tiempo={grd_elapsed * 1000:.1f}ms "
+          f"({grd_elapsed * 1000 / max(grd_cycles, 1):.2f}ms/ciclo)")
+    print(f"[Reles] ciclos={relay_cycles} tiempo={relay_elapsed * 1000:.1f}ms "
+          f"({relay_elapsed * 1000 / max(relay_cycles, 1):.2f}ms/ciclo)")
+    print(f"[frames] servidos={driver.served} sin_respuesta={driver.misses} restantes={driver.remaining}")
+    print(f"[DB] historicos={historicos} fallas_reles={fallas} ({data_dir})")
+
+
+if __name__ == "__main__":
+    main()
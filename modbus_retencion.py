@@ -0,0 +1,44 @@
+"""
+Archivo de la historia vieja: mueve las filas de 'historicos' y 'fallas_reles'
+anteriores al horizonte a archivos comprimidos por mes (ARCHIVE_DIR) y las borra
+de la DB. Aplica antes las migraciones pendientes del esquema.
+
+El servicio lo hace solo cuando MODBUS_MW_RETENTION_DAYS > 0; este comando sirve
+para la primera pasada sobre una base grande o para correrlo a mano. Es idempotente
+y puede correr con el servicio levantado (--vacuum bloquea las escrituras mientras dura).
+
+Uso:
+    python modbus_retencion.py --dias 180
+    python modbus_retencion.py --dias 180 --vacuum
+"""
+import argparse
+import time
+
+
+def main() -> None:
+    from src import config
+
+    parser = argparse.ArgumentParser(description="Archivo de historicos y fallas de reles anteriores a N dias")
+    parser.add_argument("--dias", type=int, default=config.RETENTION_DAYS or None, required=not config.RETENTION_DAYS,
+                        help="Dias de historia que quedan en la DB (por defecto MODBUS_MW_RETENTION_DAYS)")
+    parser.add_argument("--vacuum", action="store_true", help="Compactar la DB al terminar")
+    args = parser.parse_args()
+    if args.dias <= 0:
+        parser.error("--dias debe ser mayor a 0")
+
+    from src.persistencia import ddl_esquema, retencion
+    from src.persistencia.dao.dao_base import close_all_connections
+
+    ddl_esquema.create_database_schema()
+    started = time.perf_counter()
+    result = retencion.archive_older_than(args.dias)
+    for table, (archived, deleted) in result.items():
+        print(f"{table}: {archived} filas archivadas, {deleted} borradas de la DB")
+    if args.vacuum:
+        retencion.vacuum()
+    print(f"Retencion de {args.dias} dias aplicada en {time.perf_counter() - started:.1f}s (archivo en {config.ARCHIVE_DIR})")
+    close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
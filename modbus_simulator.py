@@ -0,0 +1,370 @@
+"""
+Simulador local del gateway Exemys para pruebas de carga sin hardware.
+
+Emula por Modbus TCP:
+  - N bloques de GRD en input registers del unit del gateway (bit 0 de la
+    palabra 15 de cada bloque = conectado), y
+  - M reles MiCOM con su tabla de fallas circular en 0x3700..0x3718
+    (cada direccion devuelve la ventana de 15 palabras de su slot; una lectura
+    de mas de 15 palabras responde 0x02, el modo "bloque" no se modela).
+
+Permite inyectar latencia, timeouts (requests sin respuesta), respuestas de
+excepcion de gateway (0x0B) y cambios de estado guionados o aleatorios.
+
+Uso:
+    python modbus_simulator.py --port 5020 --grds 17 --reles 3,5,6 --latencia-ms 20
+    python modbus_simulator.py --guion cambios.json
+        (guion: [{"t": 5, "grd": 3, "conectado": 0}, {"t": 8, "rele": 5, "falla": {"ia": 900}}])
+"""
+import argparse
+import asyncio
+import json
+import random
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+_MBAP = struct.Struct(">HHHB")
+_REQUEST = struct.Struct(">BHH")
+
+FAULT_START_ADDRESS = 0x3700
+FAULT_SLOTS = 25
+FAULT_WORDS = 15
+
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_GATEWAY_NO_RESPONSE = 0x0B
+
+
+@dataclass
+class SimEvent:
+    """Cambio aplicado por el simulador (para medir latencia de deteccion)."""
+    kind: str  # "grd" | "falla"
+    target: int
+    value: int
+    at: float  # time.monotonic()
+
+
+def encode_fault(fault_number: int, when: datetime, currents: dict | None = None) -> list[int]:
+    """Ventana de 15 palabras de una falla MiCOM con fecha IEC 870."""
+    currents = currents or {}
+    millis = when.second * 1000 + when.microsecond // 1000
+    return [
+        fault_number & 0xFFFF,
+        (when.year - 2000) & 0x7F,
+        (when.month << 8) | (when.isoweekday() << 5) | when.day,
+        (when.hour << 8) | when.minute,
+        millis,
+        0,
+        int(currents.get("grupo", 1)),
+        int(currents.get("fases", 7)),
+        int(currents.get("tipo", 1)),
+        int(currents.get("amplitud", 0)),
+        int(currents.get("ia", 0)),
+        int(currents.get("ib", 0)),
+        int(currents.get("ic", 0)),
+        int(currents.get("ie", 0)),
+        0,
+    ]
+
+
+class GatewaySimulator:
+    """Estado del gateway simulado y servidor Modbus TCP (MBAP) sobre asyncio."""
+
+    def __init__(
+        self,
+        grds: int = 17,
+        register_count: int = 16,
+        gateway_unit: int = 1,
+        reles: tuple[int, ...] = (3, 5, 6),
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        timeout_rate: float = 0.0,
+        exception_rate: float = 0.0,
+        dead_units: tuple[int, ...] = (),
+        serial: bool = True,
+        seed: int | None = None,
+    ):
+        self.grds = grds
+        self.register_count = register_count
+        self.gateway_unit = gateway_unit
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.timeout_rate = timeout_rate
+        self.exception_rate = exception_rate
+        self.dead_units = set(dead_units)
+        self.serial = serial
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._input = [0] * (grds * register_count)
+        for grd_id in range(1, grds + 1):
+            self._input[(grd_id - 1) * register_count + 15] = 1
+
+        self._faults: dict[int, list[list[int]]] = {}
+        self._fault_numbers: dict[int, int] = {}
+        for unit_id in reles:
+            self._faults[unit_id] = [[0] * FAULT_WORDS for _ in range(FAULT_SLOTS)]
+            self._fault_numbers[unit_id] = 0
+            for _ in range(3):
+                self._store_fault(unit_id, None)
+
+        self.events: list[SimEvent] = []
+        self.stats = {"requests": 0, "timeouts": 0, "excepciones": 0}
+        self.requests_by_unit: dict[int, int] = {}
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._thread: threading.Thread | None = None
+        self._bus: asyncio.Lock | None = None
+        self._connections: set[asyncio.Task] = set()
+
+    # ------------------------------------------------------------------ estado
+    def set_grd(self, grd_id: int, conectado: int) -> None:
+        with self._lock:
+            index = (grd_id - 1) * self.register_count + 15
+            word = self._input[index]
+            new_word = (word | 1) if conectado else (word & ~1)
+            if new_word == word:
+                return
+            self._input[index] = new_word
+            self.events.append(SimEvent("grd", grd_id, int(bool(conectado)), time.monotonic()))
+
+    def get_grd(self, grd_id: int) -> int:
+        with self._lock:
+            return self._input[(grd_id - 1) * self.register_count + 15] & 1
+
+    def _store_fault(self, unit_id: int, currents: dict | None) -> int:
+        number = self._fault_numbers[unit_id] + 1
+        self._fault_numbers[unit_id] = number
+        slot = (number - 1) % FAULT_SLOTS
+        self._faults[unit_id][slot] = encode_fault(number, datetime.now(timezone.utc), currents)
+        return number
+
+    def add_fault(self, unit_id: int, currents: dict | None = None) -> int:
+        with self._lock:
+            number = self._store_fault(unit_id, currents)
+            self.events.append(SimEvent("falla", unit_id, number, time.monotonic()))
+            return number
+
+    def toggle_random_grd(self) -> None:
+        grd_id = self._random.randint(1, self.grds)
+        self.set_grd(grd_id, 1 - self.get_grd(grd_id))
+
+    # ------------------------------------------------------------------ protocolo
+    def _respond(self, unit_id: int, pdu: bytes) -> bytes | None:
+        """Arma el PDU de respuesta; None = no responder (timeout)."""
+        function_code = pdu[0]
+        if unit_id in self.dead_units:
+            return bytes([function_code | 0x80, EXC_GATEWAY_NO_RESPONSE])
+        if self.timeout_rate and self._random.random() < self.timeout_rate:
+            self.stats["timeouts"] += 1
+            return None
+        if self.exception_rate and self._random.random() < self.exception_rate:
+            self.stats["excepciones"] += 1
+            return bytes([function_code | 0x80, EXC_GATEWAY_NO_RESPONSE])
+
+        if function_code == 0x06:
+            return pdu[:5]
+        if function_code not in (0x03, 0x04) or len(pdu) < _REQUEST.size:
+            return bytes([function_code | 0x80, EXC_ILLEGAL_FUNCTION])
+        _, address, count = _REQUEST.unpack_from(pdu)
+
+        with self._lock:
+            if function_code == 0x04 and unit_id == self.gateway_unit:
+                if address + count > len(self._input):
+                    return bytes([function_code | 0x80, EXC_ILLEGAL_ADDRESS])
+                words = self._input[address:address + count]
+            elif function_code == 0x03 and unit_id in self._faults:
+                slot = address - FAULT_START_ADDRESS
+                if not 0 <= slot < FAULT_SLOTS or count > FAULT_WORDS:
+                    return bytes([function_code | 0x80, EXC_ILLEGAL_ADDRESS])
+                words = self._faults[unit_id][slot][:count]
+            else:
+                return bytes([function_code | 0x80, EXC_GATEWAY_NO_RESPONSE])
+
+        return struct.pack(f">BB{len(words)}H", function_code, 2 * len(words), *words)
+
+    async def _delay(self) -> None:
+        delay = self.latency
+        if self.latency_jitter:
+            delay += self._random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _transact(self, writer: asyncio.StreamWriter, tid: int, unit_id: int, pdu: bytes) -> None:
+        """Atiende una transaccion y escribe su respuesta con el mismo transaction id."""
+        # El bus serie detras del gateway atiende una transaccion a la vez.
+        if self.serial:
+            async with self._bus:
+                await self._delay()
+                response = self._respond(unit_id, pdu)
+        else:
+            await self._delay()
+            response = self._respond(unit_id, pdu)
+
+        if response is None:
+            return
+        try:
+            writer.write(_MBAP.pack(tid, 0, len(response) + 1, unit_id) + response)
+            await writer.drain()
+        except ConnectionError:
+            pass  # el cliente cerro; el lector de la conexion termina con IncompleteReadError
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        # Sin bus serie (--paralelo) cada request de la conexion corre en su propia tarea
+        # y se responde al completar, en cualquier orden (el cliente empareja por tid).
+        pending: set[asyncio.Task] = set()
+        try:
+            while True:
+                header = await reader.readexactly(_MBAP.size)
+                tid, _protocol, length, unit_id = _MBAP.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                self.stats["requests"] += 1
+                self.requests_by_unit[unit_id] = self.requests_by_unit.get(unit_id, 0) + 1
+
+                if self.serial:
+                    await self._transact(writer, tid, unit_id, pdu)
+                    continue
+                transaction = asyncio.ensure_future(self._transact(writer, tid, unit_id, pdu))
+                pending.add(transaction)
+                transaction.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for transaction in list(pending):
+                transaction.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._connections.discard(task)
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        self._bus = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    def start(self, host: str = "127.0.0.1", port: int = 5020) -> None:
+        """Levanta el servidor en un hilo propio y retorna cuando ya escucha."""
+        ready = threading.Event()
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.serve(host, port))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="modbus-sim", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def _close():
+            self._server.close()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+    # ------------------------------------------------------------------ guion
+    def run_script(self, script: list[dict], changes_per_minute: float = 0.0, duration: float | None = None) -> None:
+        """
+        Aplica los cambios guionados en su instante (segundos desde el arranque) y,
+        si changes_per_minute > 0, conmuta GRDs al azar con esa tasa media.
+        Bloquea hasta terminar el guion o duration.
+        """
+        started = time.monotonic()
+        pending = sorted(script, key=lambda item: float(item.get("t", 0)))
+        next_random = started + self._random.expovariate(changes_per_minute / 60) if changes_per_minute > 0 else None
+
+        while pending or next_random is not None:
+            now = time.monotonic()
+            if duration is not None and now - started >= duration:
+                return
+            while pending and now - started >= float(pending[0].get("t", 0)):
+                item = pending.pop(0)
+                if "grd" in item:
+                    self.set_grd(int(item["grd"]), int(item.get("conectado", 0)))
+                elif "rele" in item:
+                    self.add_fault(int(item["rele"]), item.get("falla"))
+            if next_random is not None and now >= next_random:
+                self.toggle_random_grd()
+                next_random = now + self._random.expovariate(changes_per_minute / 60)
+            time.sleep(0.01)
+
+
+def _ids(text: str) -> tuple[int, ...]:
+    return tuple(int(item) for item in text.split(",") if item.strip())
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Simulador del gateway Modbus (GRDs + reles MiCOM)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--grds", type=int, default=17, help="cantidad de bloques de GRD")
+    parser.add_argument("--register-count", type=int, default=16, help="registros por bloque de GRD")
+    parser.add_argument("--gateway-unit", type=int, default=1, help="unit id de los bloques de GRD")
+    parser.add_argument("--reles", type=_ids, default=(3, 5, 6), help="unit ids de reles, ej. 3,5,6")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latencia fija por transaccion")
+    parser.add_argument("--latencia-jitter-ms", type=float, default=0.0, help="latencia aleatoria extra")
+    parser.add_argument("--tasa-timeout", type=float, default=0.0, help="probabilidad de no responder")
+    parser.add_argument("--tasa-excepcion", type=float, default=0.0, help="probabilidad de excepcion 0x0B")
+    parser.add_argument("--units-caidos", type=_ids, default=(), help="unit ids que siempre responden 0x0B")
+    parser.add_argument("--paralelo", action="store_true", help="no serializar transacciones (bus ideal)")
+    parser.add_argument("--guion", help="archivo JSON con cambios guionados")
+    parser.add_argument("--cambios-por-minuto", type=float, default=0.0, help="conmutaciones aleatorias de GRDs")
+    parser.add_argument("--seed", type=int)
+    return parser
+
+
+def simulator_from_args(args: argparse.Namespace) -> GatewaySimulator:
+    return GatewaySimulator(
+        grds=args.grds,
+        register_count=args.register_count,
+        gateway_unit=args.gateway_unit,
+        reles=args.reles,
+        latency=args.latencia_ms / 1000,
+        latency_jitter=args.latencia_jitter_ms / 1000,
+        timeout_rate=args.tasa_timeout,
+        exception_rate=args.tasa_excepcion,
+        dead_units=args.units_caidos,
+        serial=not args.paralelo,
+        seed=args.seed,
+    )
+
+
+def load_script(path: str | None) -> list[dict]:
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def main() -> None:
+    args = build_arg_parser().parse_args()
+    simulator = simulator_from_args(args)
+    simulator.start(args.host, args.port)
+    print(f"Simulador escuchando en {args.host}:{args.port} ({args.grds} GRDs, reles {list(args.reles)})")
+    try:
+        simulator.run_script(load_script(args.guion), args.cambios_por_minuto)
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(f"Estadisticas: {simulator.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from src.logger import Logosaurio
 from src.persistencia import ddl_esquema
+from src.persistencia.dao.dao_base import close_all_connections
+from src.persistencia.dao.dao_disponibilidad import disponibilidad_dao
 from src.persistencia.dao.dao_fallas_reles import fallas_reles_dao
 from src.persistencia.dao.dao_grd import grd_dao
 from src.persistencia.dao.dao_historicos import historicos_dao
@@ -48,6 +50,15 @@ def _startup() -> None:
     orchestrator.start()
 
 
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    if orchestrator is not None:
+        logger_app.log("Deteniendo orquestador y vaciando la cola de escritura.", origen="MW/APP")
+        orchestrator.stop()
+    logger_app.log("Cerrando conexiones a la base de datos.", origen="MW/APP")
+    close_all_connections()
+
+
 @app.get("/health")
 def health() -> Dict[str, str]:
     return {"status": "up"}
@@ -56,26 +67,37 @@ def health() -> Dict[str, str]:
 def _serialize_disconnected(rows: List[dict]) -> List[dict]:
     serialized: List[dict] = []
     for row in rows:
-        ts = row.get("last_disconnected_timestamp")
-        iso_ts = ""
-        if ts:
-            try:
-                if isinstance(ts, str):
-                    iso_ts = timebox.utc_iso(timebox.parse(ts, legacy=True))
-                else:
-                    iso_ts = timebox.utc_iso(ts)
-            except Exception:
-                iso_ts = str(ts)
         serialized.append(
             {
                 "id_grd": row.get("id_grd"),
                 "description": row.get("description"),
-                "last_disconnected_timestamp": iso_ts,
+                "last_disconnected_timestamp": timebox.iso_from_epoch_ms(row.get("last_disconnected_timestamp")),
             }
         )
     return serialized
 
 
+@app.get("/api/modbus/stats")
+def get_modbus_stats() -> Dict[str, Any]:
+    if orchestrator is None:
+        raise HTTPException(status_code=503, detail="Orquestador no iniciado")
+    return orchestrator.get_stats()
+
+
+@app.get("/api/grd/flaps")
+def get_grd_flaps() -> Dict[str, Any]:
+    if orchestrator is None:
+        raise HTTPException(status_code=503, detail="Orquestador no iniciado")
+    return orchestrator.get_grd_flaps()
+
+
+@app.get("/api/grd/telemetry")
+def get_grd_telemetry() -> Dict[str, Any]:
+    if orchestrator is None:
+        raise HTTPException(status_code=503, detail="Orquestador no iniciado")
+    return {"items": orchestrator.get_grd_telemetry()}
+
+
 @app.get("/api/grd/descriptions")
 def get_grd_descriptions() -> Dict[str, Any]:
     return {"items": grd_dao.get_all_grds_with_descriptions()}
@@ -134,7 +156,42 @@ def _compute_range(window: str, page: int):
     return start, end
 
 
-def _history_payload(grd_id: int, window: str, page: int) -> Dict[str, Any]:
+def _availability_payload(grd_id: int, start: datetime | None, end: datetime, granularity: str) -> Dict[str, Any]:
+    """Disponibilidad desde los rollups: total del rango y un item por hora/dia."""
+    buckets = disponibilidad_dao.get_availability(
+        grd_id,
+        timebox.to_epoch_ms(start) if start is not None else None,
+        timebox.to_epoch_ms(end),
+        granularity,
+    )
+    items: List[dict] = []
+    conectado_ms = observado_ms = 0
+    for bucket in buckets:
+        conectado_ms += bucket["conectado_ms"]
+        observado_ms += bucket["observado_ms"]
+        items.append(
+            {
+                "inicio": timebox.iso_from_epoch_ms(bucket["inicio"]),
+                "conectado_s": bucket["conectado_ms"] / 1000.0,
+                "observado_s": bucket["observado_ms"] / 1000.0,
+                "porcentaje": round(bucket["conectado_ms"] * 100.0 / bucket["observado_ms"], 2),
+            }
+        )
+    return {
+        "granularidad": granularity,
+        "porcentaje": round(conectado_ms * 100.0 / observado_ms, 2) if observado_ms else None,
+        "conectado_s": conectado_ms / 1000.0,
+        "observado_s": observado_ms / 1000.0,
+        "items": items,
+    }
+
+
+def _history_payload(grd_id: int, window: str, page: int, raw: bool = True) -> Dict[str, Any]:
+    """
+    Historial de un GRD para la ventana pedida. 'data' son las transiciones crudas
+    (el grafico de estado necesita sus instantes exactos, que los rollups no guardan);
+    con raw=False no se leen y el rango se describe solo con 'availability' (rollups).
+    """
     descriptions = grd_dao.get_all_grds_with_descriptions()
     if grd_id not in descriptions:
         raise HTTPException(status_code=404, detail="GRD no encontrado")
@@ -142,19 +199,30 @@ def _history_payload(grd_id: int, window: str, page: int) -> Dict[str, Any]:
     today_str = timebox.utc_now().strftime("%Y-%m-%d")
     window_norm = window if window in {"1sem", "1mes", "todo"} else "1sem"
     plot_start = plot_end = None
+    df = None
 
     if window_norm == "1sem":
-        df = historicos_dao.get_weekly_data_for_grd(grd_id, today_str, page)
+        if raw:
+            df = historicos_dao.get_weekly_data_for_grd(grd_id, today_str, page)
         total_periods = max(1, historicos_dao.get_total_weeks_for_grd(grd_id, today_str))
         plot_start, plot_end = _compute_range(window_norm, page)
+        availability_end = plot_end
     elif window_norm == "1mes":
-        df = historicos_dao.get_monthly_data_for_grd(grd_id, today_str, page)
+        if raw:
+            df = historicos_dao.get_monthly_data_for_grd(grd_id, today_str, page)
         total_periods = max(1, historicos_dao.get_total_months_for_grd(grd_id, today_str))
         plot_start, plot_end = _compute_range(window_norm, page)
+        availability_end = plot_end
     else:
-        df = historicos_dao.get_all_data_for_grd(grd_id)
         total_periods = 1
-        if df is not None and not df.empty:
+        # El estado vigente sigue abierto desde la ultima transicion hasta ahora.
+        availability_end = timebox.utc_now()
+        first_ms = None if raw else historicos_dao.get_first_timestamp_for_grd(grd_id)
+        if raw:
+            df = historicos_dao.get_all_data_for_grd(grd_id)
+        if first_ms is not None:
+            plot_start, plot_end = timebox.from_epoch_ms(first_ms), availability_end
+        elif df is not None and not df.empty:
             timestamps = df["timestamp"]
             first_ts = timestamps.min()
             last_ts = timestamps.max()
@@ -181,12 +249,36 @@ def _history_payload(grd_id: int, window: str, page: int) -> Dict[str, Any]:
         "range_end": timebox.utc_iso(plot_end),
         "connected_before": int(connected_before),
         "data": _df_to_records(df),
+        "availability": _availability_payload(
+            grd_id, plot_start, availability_end, "hora" if window_norm == "1sem" else "dia"
+        ),
     }
 
 
 @app.get("/api/grd/history")
-def get_grd_history(grd_id: int, window: str = "1sem", page: int = 0) -> Dict[str, Any]:
-    return _history_payload(grd_id, window, max(page, 0))
+def get_grd_history(grd_id: int, window: str = "1sem", page: int = 0, raw: bool = True) -> Dict[str, Any]:
+    return _history_payload(grd_id, window, max(page, 0), raw)
+
+
+@app.get("/api/grd/availability")
+def get_grd_availability(grd_id: int, window: str = "1mes", page: int = 0, granularity: str = "dia") -> Dict[str, Any]:
+    if grd_id not in grd_dao.get_all_grds_with_descriptions():
+        raise HTTPException(status_code=404, detail="GRD no encontrado")
+    if granularity not in {"hora", "dia"}:
+        raise HTTPException(status_code=400, detail="granularity debe ser 'hora' o 'dia'")
+    window_norm = window if window in {"1sem", "1mes", "todo"} else "1mes"
+    if window_norm == "todo":
+        start, end = None, timebox.utc_now()
+    else:
+        start, end = _compute_range(window_norm, max(page, 0))
+    return {
+        "grd_id": grd_id,
+        "window": window_norm,
+        "page": max(page, 0),
+        "range_start": timebox.utc_iso(start) if start is not None else "",
+        "range_end": timebox.utc_iso(end),
+        **_availability_payload(grd_id, start, end, granularity),
+    }
 
 
 @app.get("/api/reles/faults")
@@ -199,13 +291,7 @@ def get_reles_faults() -> Dict[str, Any]:
             continue
         latest = fallas_reles_dao.get_latest_falla_for_rele(internal_id)
         if latest:
-            ts_value = latest.get("timestamp")
-            if ts_value:
-                try:
-                    parsed = ts_value if isinstance(ts_value, datetime) else timebox.parse(ts_value, legacy=True)
-                    latest["timestamp"] = timebox.utc_iso(parsed)
-                except Exception:
-                    latest["timestamp"] = str(ts_value)
+            latest["timestamp"] = timebox.iso_from_epoch_ms(latest.get("timestamp"))
         items.append(
             {
                 "id_modbus": modbus_id,
@@ -8,12 +8,62 @@ def _req(name: str, default: str | None = None) -> str:
     return str(value).strip()
 
 
+def _positive(name: str, value: float) -> float:
+    if not value > 0:
+        raise EnvironmentError(f"{name} debe ser mayor a 0 (valor: {value})")
+    return value
+
+
+def _intervals(name: str) -> dict[int, float]:
+    """Parsea "id:segundos,id:segundos" en {id: segundos}; los segundos deben ser > 0."""
+    result: dict[int, float] = {}
+    for item in os.getenv(name, "").split(","):
+        if not item.strip():
+            continue
+        key, _, seconds = item.partition(":")
+        try:
+            result[int(key)] = float(seconds)
+        except ValueError:
+            raise EnvironmentError(f"{name}: item invalido '{item.strip()}' (se espera id:segundos)") from None
+        _positive(f"{name} (id {int(key)})", result[int(key)])
+    return result
+
+
 # ------------------ Modbus middleware ------------------
 MB_HOST = _req("MODBUS_MW_MB_HOST")
 MB_PORT = int(_req("MODBUS_MW_MB_PORT"))
 MB_ID = int(_req("MODBUS_MW_MB_ID"))
 MB_COUNT = int(_req("MODBUS_MW_MB_COUNT"))
-MB_INTERVAL_SECONDS = int(_req("MODBUS_MW_MB_INTERVAL_SECONDS"))
+MB_INTERVAL_SECONDS = _positive("MODBUS_MW_MB_INTERVAL_SECONDS", int(_req("MODBUS_MW_MB_INTERVAL_SECONDS")))
+# Campos extra del bloque de cada GRD, JSON: [{"name", "offset", "type", "bit", "scale"}, ...]
+# tipos: uint16, int16, uint32, int32, float32, bit. 'conectado' (palabra 15, bit 0) siempre existe.
+GRD_REGISTER_MAP = os.getenv("MODBUS_MW_GRD_REGISTER_MAP", "")
+# "sync" (pymodbus, una transaccion a la vez) o "async" (varias transacciones en vuelo)
+MB_DRIVER = os.getenv("MODBUS_MW_MB_DRIVER", "sync").strip().lower()
+MB_MAX_IN_FLIGHT = int(os.getenv("MODBUS_MW_MB_MAX_IN_FLIGHT", "8"))
+# Timeouts adaptativos (acotados a [MIN, MAX]) y circuit breaker por Unit ID
+MB_TIMEOUT_SECONDS = float(os.getenv("MODBUS_MW_MB_TIMEOUT_SECONDS", "10"))
+MB_TIMEOUT_MIN_SECONDS = float(os.getenv("MODBUS_MW_MB_TIMEOUT_MIN_SECONDS", "0.5"))
+MB_BREAKER_FAILURES = int(os.getenv("MODBUS_MW_MB_BREAKER_FAILURES", "3"))
+MB_BREAKER_BACKOFF_SECONDS = float(os.getenv("MODBUS_MW_MB_BREAKER_BACKOFF_SECONDS", "5"))
+MB_BREAKER_BACKOFF_MAX_SECONDS = float(os.getenv("MODBUS_MW_MB_BREAKER_BACKOFF_MAX_SECONDS", "300"))
+# Gateways adicionales, JSON: [{"nombre", "host", "port", "unit_id", "grds": [...], "reles": [...], "grd_base"}]
+# Los GRDs/reles no listados se consultan por el gateway principal (MB_HOST/MB_PORT/MB_ID).
+GATEWAYS = os.getenv("MODBUS_MW_GATEWAYS", "")
+# Intervalos particulares por GRD / rele (id modbus); el resto usa MB_INTERVAL_SECONDS
+GRD_INTERVALS = _intervals("MODBUS_MW_GRD_INTERVALS")
+RELE_INTERVALS = _intervals("MODBUS_MW_RELE_INTERVALS")
+POLL_JITTER = float(os.getenv("MODBUS_MW_POLL_JITTER", "0.1"))
+# Histeresis de conectividad: un cambio se persiste tras N lecturas iguales y/o T segundos estable
+DEBOUNCE_READS = int(os.getenv("MODBUS_MW_DEBOUNCE_READS", "1"))
+DEBOUNCE_SECONDS = float(os.getenv("MODBUS_MW_DEBOUNCE_SECONDS", "0"))
+# Barrido completo de la tabla de fallas de cada rele cada N ciclos aunque el watermark no cambie
+RELE_FULL_SCAN_EVERY = int(os.getenv("MODBUS_MW_RELE_FULL_SCAN_EVERY", "60"))
+# "ventanas": una lectura por direccion 0x3700..0x3718 (acceso por registro MiCOM)
+# "bloque": una lectura contigua de toda la zona y ventanas decodificadas localmente
+RELE_FAULT_READ_MODE = os.getenv("MODBUS_MW_RELE_FAULT_READ_MODE", "ventanas").strip().lower()
+# Reles barridos en paralelo (con el driver "async" quedan todos en vuelo sobre el socket)
+RELE_MAX_CONCURRENCY = int(os.getenv("MODBUS_MW_RELE_MAX_CONCURRENCY", "4"))
 
 GRD_DESCRIPTIONS: dict[int, str] = {
     1: "SS - presuriz doradillo",
@@ -57,6 +107,35 @@ DATABASE_DIR = os.getenv("MODBUS_MW_DATA_DIR", "/app/data")
 DATABASE_NAME = os.getenv("MODBUS_MW_DATABASE_NAME", "grdconectados.db")
 OBS_STATE_FILE = os.path.join(DATABASE_DIR, "modbus-mw-state.json")
 
+# SQLite en modo WAL: las lecturas usan conexiones de solo lectura sin el lock global.
+# Checkpoint PASSIVE cada N transacciones de escritura (0 = solo el autocheckpoint de SQLite)
+# y TRUNCATE al apagar el servicio.
+DB_CHECKPOINT_EVERY_WRITES = int(os.getenv("MODBUS_MW_DB_CHECKPOINT_EVERY_WRITES", "500"))
+
+# Escritura diferida: los hilos de sondeo encolan y un hilo escritor persiste en grupos.
+# Cola acotada a N comandos; con la cola llena se espera hasta TIMEOUT segundos y luego
+# se rechaza. Un grupo junta hasta BATCH_MAX comandos llegados en BATCH_SECONDS.
+# Al apagar se espera hasta DRAIN segundos a que se vacie la cola.
+DB_WRITE_QUEUE_SIZE = int(os.getenv("MODBUS_MW_DB_WRITE_QUEUE_SIZE", "1000"))
+DB_WRITE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("MODBUS_MW_DB_WRITE_QUEUE_TIMEOUT_SECONDS", "5"))
+DB_WRITE_BATCH_MAX = int(os.getenv("MODBUS_MW_DB_WRITE_BATCH_MAX", "200"))
+DB_WRITE_BATCH_SECONDS = float(os.getenv("MODBUS_MW_DB_WRITE_BATCH_SECONDS", "0.05"))
+DB_WRITE_DRAIN_SECONDS = float(os.getenv("MODBUS_MW_DB_WRITE_DRAIN_SECONDS", "10"))
+
+# Retencion: las filas de historicos / fallas_reles mas viejas que N dias pasan a archivos
+# comprimidos por mes en ARCHIVE_DIR y se borran de la DB (0 = deshabilitada).
+ARCHIVE_DIR = os.getenv("MODBUS_MW_ARCHIVE_DIR", os.path.join(DATABASE_DIR, "archivo"))
+RETENTION_DAYS = int(os.getenv("MODBUS_MW_RETENTION_DAYS", "0"))
+RETENTION_INTERVAL_SECONDS = _positive(
+    "MODBUS_MW_RETENTION_INTERVAL_SECONDS", int(os.getenv("MODBUS_MW_RETENTION_INTERVAL_SECONDS", "86400"))
+)
+
+# Captura opcional de respuestas Modbus crudas (vacio = deshabilitada), con rotacion por tamaño.
+# Con varios gateways cada uno escribe en <archivo>.<nombre> (el principal en <archivo>).
+CAPTURE_FILE = os.getenv("MODBUS_MW_CAPTURE_FILE", "").strip()
+CAPTURE_MAX_BYTES = int(os.getenv("MODBUS_MW_CAPTURE_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_BACKUPS = int(os.getenv("MODBUS_MW_CAPTURE_BACKUPS", "5"))
+
 # ------------------ MQTT ------------------
 MQTT_BROKER_HOST = _req("MQTT_BROKER_HOST")
 MQTT_BROKER_PORT = int(_req("MQTT_BROKER_PORT"))
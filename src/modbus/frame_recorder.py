@@ -0,0 +1,229 @@
+import os
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+FC_READ_HOLDING = 0x03
+FC_READ_INPUT = 0x04
+
+MAGIC = b"MBREC1\n"
+# timestamp (epoch s), unit, funcion, direccion, cantidad pedida, registros recibidos
+_HEADER = struct.Struct(">dBBHHH")
+# cantidad de registros que marca una lectura fallida (sin respuesta util)
+_FAILED = 0xFFFF
+
+
+@dataclass(frozen=True)
+class Frame:
+    """Respuesta Modbus capturada; registers es None si la lectura fallo."""
+    timestamp: float
+    unit_id: int
+    function: int
+    address: int
+    count: int
+    registers: tuple[int, ...] | None
+
+
+class FrameRecorder:
+    """
+    Log binario de respuestas Modbus, de solo anexado y con rotacion por tamaño.
+    Cada registro ocupa 16 bytes de cabecera + 2 por registro leido. Al superar
+    max_bytes el archivo se renombra a .1 (y los anteriores a .2, .3, ...),
+    conservando hasta backups archivos rotados.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backups: int = 5):
+        self.path = path
+        self.max_bytes = max(1024, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self.frames = 0
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._file.write(MAGIC)
+            self._size = len(MAGIC)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def record(self, unit_id: int, function: int, address: int, count: int, registers: Sequence[int] | None) -> None:
+        if registers is None:
+            data = _HEADER.pack(time.time(), unit_id & 0xFF, function, address, count, _FAILED)
+        else:
+            data = _HEADER.pack(time.time(), unit_id & 0xFF, function, address, count, len(registers))
+            data += struct.pack(f">{len(registers)}H", *registers)
+        with self._lock:
+            if self._file is None:
+                self._open()
+            if self._size + len(data) > self.max_bytes and self._size > len(MAGIC):
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.frames += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_frames(path: str) -> Iterator[Frame]:
+    """Recorre los frames de un archivo de captura (un registro truncado al final se ignora)."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un archivo de captura Modbus.")
+        while True:
+            header = fh.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            timestamp, unit_id, function, address, count, received = _HEADER.unpack(header)
+            registers = None
+            if received != _FAILED:
+                payload = fh.read(2 * received)
+                if len(payload) < 2 * received:
+                    return
+                registers = struct.unpack(f">{received}H", payload)
+            yield Frame(timestamp, unit_id, function, address, count, registers)
+
+
+def capture_files(path: str) -> list[str]:
+    """Archivo de captura y sus rotaciones, del mas viejo al mas nuevo."""
+    rotated = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        rotated.append(f"{path}.{index}")
+        index += 1
+    files = list(reversed(rotated))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def iter_capture(path: str) -> Iterator[Frame]:
+    for file_path in capture_files(path):
+        yield from read_frames(file_path)
+
+
+class RecordingDriver:
+    """
+    Envoltorio de un driver Modbus que anota cada respuesta de lectura en un
+    FrameRecorder. El resto de la interfaz se delega sin cambios.
+    """
+
+    def __init__(self, driver, recorder: FrameRecorder):
+        self.driver = driver
+        self.recorder = recorder
+        self.host = driver.host
+        self.port = driver.port
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def read_input_registers(self, address_offset: int, count: int, unit_id: int):
+        registers = self.driver.read_input_registers(address_offset, count, unit_id=unit_id)
+        self.recorder.record(unit_id, FC_READ_INPUT, address_offset, count, registers)
+        return registers
+
+    def read_holding_registers(self, address_offset: int, count: int, unit_id: int):
+        registers = self.driver.read_holding_registers(address_offset, count, unit_id=unit_id)
+        self.recorder.record(unit_id, FC_READ_HOLDING, address_offset, count, registers)
+        return registers
+
+    def _record_many(self, function: int, requests: Sequence[tuple[int, int, int]], results: list) -> list:
+        for (address, count, unit_id), registers in zip(requests, results):
+            self.recorder.record(unit_id, function, address, count, registers)
+        return results
+
+    def read_input_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return self._record_many(FC_READ_INPUT, requests, self.driver.read_input_registers_many(requests))
+
+    def read_holding_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return self._record_many(FC_READ_HOLDING, requests, self.driver.read_holding_registers_many(requests))
+
+
+class ReplayDriver:
+    """
+    Driver que responde con frames capturados, sin red ni esperas.
+    Las respuestas se encolan por (funcion, unit, direccion, cantidad) y cada
+    lectura consume la siguiente de su clave; sin frames disponibles responde
+    None como una lectura fallida.
+    """
+
+    def __init__(self, frames: Iterable[Frame], host: str = "replay", port: int = 0):
+        self.host = host
+        self.port = port
+        self._lock = threading.Lock()
+        self._queues: dict[tuple[int, int, int, int], deque] = {}
+        self.total = 0
+        for frame in frames:
+            key = (frame.function, frame.unit_id, frame.address, frame.count)
+            self._queues.setdefault(key, deque()).append(frame)
+            self.total += 1
+        self.served = 0
+        self.misses = 0
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def keys(self) -> list[tuple[int, int, int, int]]:
+        """Claves (funcion, unit, direccion, cantidad) presentes en la captura."""
+        return sorted(self._queues)
+
+    def connect(self) -> bool:
+        return True
+
+    def disconnect(self):
+        return None
+
+    def is_connected(self) -> bool:
+        return True
+
+    def _next(self, function: int, address: int, count: int, unit_id: int):
+        with self._lock:
+            queue = self._queues.get((function, unit_id, address, count))
+            if not queue:
+                self.misses += 1
+                return None
+            self.served += 1
+            registers = queue.popleft().registers
+        return list(registers) if registers is not None else None
+
+    def read_input_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._next(FC_READ_INPUT, address_offset, count, unit_id)
+
+    def read_holding_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._next(FC_READ_HOLDING, address_offset, count, unit_id)
+
+    def write_single_register(self, address_offset: int, value: int, unit_id: int):
+        return True
+
+    def read_input_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return [self.read_input_registers(address, count, unit_id=unit_id) for address, count, unit_id in requests]
+
+    def read_holding_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return [self.read_holding_registers(address, count, unit_id=unit_id) for address, count, unit_id in requests]
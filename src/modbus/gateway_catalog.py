@@ -0,0 +1,89 @@
+import json
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class GatewayConfig:
+    """
+    Gateway Modbus TCP y los equipos que se consultan a traves de el.
+
+    grds / reles en None = el gateway atiende todos los equipos que no esten
+    asignados a otro (gateway por defecto). grd_base es el GRD que ocupa el
+    primer bloque de registros del gateway.
+    """
+    nombre: str
+    host: str
+    port: int
+    unit_id: int
+    grds: frozenset[int] | None = None
+    reles: frozenset[int] | None = None
+    grd_base: int = 1
+
+
+class GatewayCatalog:
+    """Asignacion de GRDs y reles a gateways."""
+
+    def __init__(self, gateways: list[GatewayConfig]):
+        if not gateways:
+            raise ValueError("El catalogo de gateways esta vacio.")
+        names = [gateway.nombre for gateway in gateways]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Nombres de gateway repetidos: {names}")
+        self.gateways = list(gateways)
+
+        self._grd_owner: dict[int, str] = {}
+        self._rele_owner: dict[int, str] = {}
+        self._default_grd: str | None = None
+        self._default_rele: str | None = None
+        for gateway in self.gateways:
+            self._default_grd = self._assign(gateway.nombre, gateway.grds, self._grd_owner, self._default_grd, "GRD")
+            self._default_rele = self._assign(gateway.nombre, gateway.reles, self._rele_owner, self._default_rele, "rele")
+
+    @staticmethod
+    def _assign(name, devices, owners, default, kind):
+        if devices is None:
+            if default is not None:
+                raise ValueError(f"Mas de un gateway por defecto para {kind}s: {default}, {name}")
+            return name
+        for device in devices:
+            if device in owners:
+                raise ValueError(f"{kind} {device} asignado a los gateways {owners[device]} y {name}")
+            owners[device] = name
+        return default
+
+    def gateway_for_grd(self, grd_id: int) -> str | None:
+        return self._grd_owner.get(grd_id, self._default_grd)
+
+    def gateway_for_rele(self, unit_id: int) -> str | None:
+        return self._rele_owner.get(unit_id, self._default_rele)
+
+    def owns_grd(self, gateway_name: str, grd_id: int) -> bool:
+        return self.gateway_for_grd(grd_id) == gateway_name
+
+    def owns_rele(self, gateway_name: str, unit_id: int) -> bool:
+        return self.gateway_for_rele(unit_id) == gateway_name
+
+
+def _ids(value) -> frozenset[int] | None:
+    return None if value is None else frozenset(int(item) for item in value)
+
+
+def load_gateway_catalog(default: GatewayConfig, extra_json: str = "") -> GatewayCatalog:
+    """
+    Catalogo con el gateway por defecto (MB_HOST/MB_PORT) mas los declarados en
+    extra_json: [{"nombre", "host", "port", "unit_id", "grds", "reles", "grd_base"}].
+    Los equipos listados en un gateway extra dejan de consultarse por el de defecto.
+    """
+    gateways = [default]
+    if extra_json.strip():
+        for item in json.loads(extra_json):
+            gateways.append(GatewayConfig(
+                nombre=str(item["nombre"]),
+                host=str(item["host"]),
+                port=int(item.get("port", 502)),
+                unit_id=int(item.get("unit_id", default.unit_id)),
+                grds=_ids(item.get("grds", [])),
+                reles=_ids(item.get("reles", [])),
+                grd_base=int(item.get("grd_base", 1)),
+            ))
+    return GatewayCatalog(gateways)
@@ -1,12 +1,16 @@
+import time
+from typing import Sequence
+
 from pymodbus.client import ModbusTcpClient
 from src.logger import Logosaurio
+from .unit_health import GATEWAY_EXCEPTION_CODES, UnitHealthRegistry
 
 class ModbusTcpDriver:
     """
     Driver generico para la conexion y comunicacion con un servidor Modbus TCP.
     Encapsula la logica de conexion, reintento y manejo de errores basicos.
     """
-    def __init__(self, host: str, port: int, timeout: int, logger: Logosaurio):
+    def __init__(self, host: str, port: int, timeout: int, logger: Logosaurio, health: UnitHealthRegistry | None = None):
         """
         Inicializa el driver Modbus TCP.
 
@@ -15,11 +19,13 @@ class ModbusTcpDriver:
             port (int): Puerto del servidor Modbus TCP (por defecto 502).
             timeout (int): Tiempo de espera en segundos para intentar la conexion.
             logger (Logosaurio): Instancia del logger para registrar eventos.
+            health (UnitHealthRegistry | None): Circuit breaker y timeouts adaptativos por Unit ID.
         """
         self.host = host
         self.port = port
         self.timeout = timeout
         self.logger = logger
+        self.health = health
         self._client = None
         self._is_connected = False
 
@@ -35,7 +41,9 @@ class ModbusTcpDriver:
         self.disconnect()
         
         try:
-            self._client = ModbusTcpClient(self.host, port=self.port, timeout=self.timeout)
+            # Sin reintentos internos: cada reintento de pymodbus multiplicaria el timeout
+            # adaptativo del unit; el reintento es el proximo ciclo de sondeo.
+            self._client = ModbusTcpClient(self.host, port=self.port, timeout=self.timeout, retries=0)
             
             if self._client.connect():
                 self._is_connected = True
@@ -62,6 +70,49 @@ class ModbusTcpDriver:
             self._is_connected = False
             self.logger.log(f"Desconectado de {self.host}:{self.port}", origen="OBS/DRV")
 
+    def _apply_timeout(self, timeout: float) -> None:
+        """Ajusta el timeout de la proxima transaccion del cliente pymodbus."""
+        # pymodbus toma el timeout de comm_params en cada recv; el socket se ajusta tambien.
+        try:
+            self._client.comm_params.timeout_connect = timeout
+            if self._client.socket is not None:
+                self._client.socket.settimeout(timeout)
+        except AttributeError:
+            pass
+
+    def _begin_transaction(self, unit_id: int) -> bool:
+        """Consulta el circuit breaker del unit y fija el timeout adaptativo."""
+        if self.health is None:
+            return True
+        if not self.health.allow(unit_id):
+            self.logger.log(f"Unit ID {unit_id} con circuito abierto. Se omite la consulta.", origen="OBS/DRV")
+            return False
+        self._apply_timeout(self.health.timeout_for(unit_id))
+        return True
+
+    def _end_transaction(self, unit_id: int, started: float, result) -> None:
+        """Registra RTT o falla del unit segun la respuesta obtenida."""
+        if self.health is None:
+            return
+        failed = result is None or (
+            hasattr(result, 'isError') and result.isError()
+            and getattr(result, 'exception_code', None) in GATEWAY_EXCEPTION_CODES
+        )
+        if failed:
+            self.health.record_failure(unit_id)
+        else:
+            self.health.record_success(unit_id, time.monotonic() - started)
+
+    def _handle_exception(self, unit_id: int, started: float) -> None:
+        """
+        Registra la falla del unit y cierra la conexion. pymodbus (cliente sync) acepta
+        la primera respuesta del mismo unit sin verificar el transaction id: tras un
+        timeout, una respuesta tardia se tomaria como la de la proxima consulta sobre
+        el socket. Reconectar descarta lo que quede en vuelo.
+        """
+        self._end_transaction(unit_id, started, None)
+        self.disconnect()
+
     def read_input_registers(self, address_offset: int, count: int, unit_id: int):
         """
         Lee una serie de registros de entrada (Input Registers) del esclavo Modbus.
@@ -78,9 +129,14 @@ class ModbusTcpDriver:
             self.logger.log(f"Fallo al conectar para leer registros de entrada (Unit ID {unit_id})", origen="OBS/DRV")
             return None
 
+        if not self._begin_transaction(unit_id):
+            return None
+
+        started = time.monotonic()
         try:
             # IMPORTANTE: usar unit= (pymodbus 3.x) en lugar de slave=
             result = self._client.read_input_registers(address_offset, count=count, slave=unit_id)
+            self._end_transaction(unit_id, started, result)
 
             if result is None:
                 self.logger.log(
@@ -109,7 +165,7 @@ class ModbusTcpDriver:
                 f"Excepcion en lectura para Unit ID {unit_id}, Addr {address_offset}, Cant {count}: {e}.",
                 origen="OBS/DRV"
             )
-            self.disconnect()
+            self._handle_exception(unit_id, started)
             return None
 
     def read_holding_registers(self, address_offset: int, count: int, unit_id: int):
@@ -120,9 +176,14 @@ class ModbusTcpDriver:
             self.logger.log(f"Fallo al conectar para leer holding registers (Unit ID {unit_id})", origen="OBS/DRV")
             return None
 
+        if not self._begin_transaction(unit_id):
+            return None
+
+        started = time.monotonic()
         try:
             # unit= en lugar de slave=
             result = self._client.read_holding_registers(address_offset, count=count, slave=unit_id)
+            self._end_transaction(unit_id, started, result)
             if result is None or (hasattr(result, 'isError') and result.isError()):
                 self.logger.log(
                     f"Error al leer holding registers para Unit ID {unit_id}, Addr {address_offset}: {result}",
@@ -135,7 +196,7 @@ class ModbusTcpDriver:
                 f"Excepcion en lectura de holding registers para Unit ID {unit_id}, Addr {address_offset}: {e}",
                 origen="OBS/DRV"
             )
-            self.disconnect()
+            self._handle_exception(unit_id, started)
             return None
 
     def write_single_register(self, address_offset: int, value: int, unit_id: int):
@@ -146,9 +207,14 @@ class ModbusTcpDriver:
             self.logger.log(f"Fallo al conectar para escribir registro (Unit ID {unit_id})", origen="OBS/DRV")
             return False
 
+        if not self._begin_transaction(unit_id):
+            return False
+
+        started = time.monotonic()
         try:
             # unit= en lugar de slave=
             result = self._client.write_register(address_offset, value, slave=unit_id)
+            self._end_transaction(unit_id, started, result)
             if result is None or (hasattr(result, 'isError') and result.isError()):
                 self.logger.log(
                     f"Error al escribir registro para Unit ID {unit_id}, Addr {address_offset}, Value {value}: {result}",
@@ -163,9 +229,20 @@ class ModbusTcpDriver:
                 f"Excepcion al escribir registro para Unit ID {unit_id}, Addr {address_offset}, Value {value}: {e}",
                 origen="OBS/DRV"
             )
-            self.disconnect()
+            self._handle_exception(unit_id, started)
             return False
 
+    def read_input_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        """
+        Ejecuta varias lecturas (address_offset, count, unit_id) en orden y retorna
+        sus resultados alineados. Mantiene la misma interfaz que AsyncModbusTcpDriver.
+        """
+        return [self.read_input_registers(address, count, unit_id) for address, count, unit_id in requests]
+
+    def read_holding_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        """Igual que read_input_registers_many, para holding registers."""
+        return [self.read_holding_registers(address, count, unit_id) for address, count, unit_id in requests]
+
     def is_connected(self) -> bool:
         """
         Retorna el estado actual de la conexion.
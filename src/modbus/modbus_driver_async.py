@@ -0,0 +1,336 @@
+import asyncio
+import struct
+import threading
+import time
+from typing import Sequence
+
+from src.logger import Logosaurio
+from .unit_health import GATEWAY_EXCEPTION_CODES, UnitHealthRegistry
+
+# Cabecera MBAP: transaction id, protocol id, length, unit id.
+_MBAP = struct.Struct(">HHHB")
+_REQUEST_PDU = struct.Struct(">BHH")
+
+FC_READ_HOLDING_REGISTERS = 0x03
+FC_READ_INPUT_REGISTERS = 0x04
+FC_WRITE_SINGLE_REGISTER = 0x06
+
+
+class ModbusExceptionResponse(Exception):
+    """El esclavo respondio con una excepcion Modbus (function code | 0x80)."""
+
+    def __init__(self, function_code: int, exception_code: int):
+        super().__init__(f"excepcion Modbus fc={function_code:#04x} code={exception_code:#04x}")
+        self.function_code = function_code
+        self.exception_code = exception_code
+
+
+class CircuitOpenError(Exception):
+    """El circuit breaker del unit esta abierto: la transaccion no se envia."""
+
+
+class ResponseMismatchError(Exception):
+    """La respuesta con el transaction id esperado trae otro unit id o function code."""
+
+
+class MalformedResponseError(Exception):
+    """El PDU de respuesta es mas corto de lo que declara su function code / byte count."""
+
+
+def _check_response(response: bytes) -> None:
+    """Valida el largo del PDU de respuesta antes de decodificarlo."""
+    function_code = response[0]
+    if len(response) < 2:
+        raise MalformedResponseError(f"respuesta fc={function_code:#04x} de {len(response)} bytes")
+    if function_code & 0x80:
+        return
+    if function_code in (FC_READ_HOLDING_REGISTERS, FC_READ_INPUT_REGISTERS):
+        byte_count = response[1]
+        if byte_count % 2 or len(response) < 2 + byte_count:
+            raise MalformedResponseError(
+                f"byte count {byte_count} con {len(response) - 2} bytes de datos (fc={function_code:#04x})"
+            )
+    elif function_code == FC_WRITE_SINGLE_REGISTER and len(response) < _REQUEST_PDU.size:
+        raise MalformedResponseError(f"respuesta fc={function_code:#04x} de {len(response)} bytes")
+
+
+class AsyncModbusTcpDriver:
+    """
+    Variante asincrona de ModbusTcpDriver: mantiene varias transacciones en vuelo
+    sobre el mismo socket y empareja cada respuesta por transaction id (MBAP).
+    Corre su propio event loop en un hilo dedicado; expone la misma interfaz
+    sincronica que ModbusTcpDriver y corutinas *_async para uso directo.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        timeout: int,
+        logger: Logosaurio,
+        max_in_flight: int = 8,
+        health: UnitHealthRegistry | None = None,
+    ):
+        """
+        Args:
+            host (str): Direccion IP o nombre de host del servidor Modbus TCP.
+            port (int): Puerto del servidor Modbus TCP.
+            timeout (int): Tiempo de espera en segundos para conexion y cada transaccion.
+            logger (Logosaurio): Instancia del logger para registrar eventos.
+            max_in_flight (int): Maximo de transacciones pendientes simultaneas.
+            health (UnitHealthRegistry | None): Circuit breaker y timeouts adaptativos por Unit ID.
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.logger = logger
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.health = health
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._loop_lock = threading.Lock()
+
+        # Estado propio del event loop (solo se toca desde su hilo).
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._connect_lock: asyncio.Lock | None = None
+        self._in_flight: asyncio.Semaphore | None = None
+        # tid -> (future, unit id, function code) de cada transaccion en vuelo
+        self._pending: dict[int, tuple[asyncio.Future, int, int]] = {}
+        self._next_tid = 0
+        self._is_connected = False
+
+    # ------------------------------------------------------------------ loop
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name=f"modbus-async-{self.host}", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def _run(self, coro):
+        """Ejecuta una corutina en el loop del driver y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    # ------------------------------------------------------------ conexion
+
+    async def connect_async(self) -> bool:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._connect_lock:
+            if self._is_connected:
+                return True
+
+            self.logger.log(f"Intentando conectar a {self.host}:{self.port}...", origen="OBS/DRV")
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), timeout=self.timeout
+                )
+            except Exception as e:
+                self.logger.log(f"Error al intentar conectar a {self.host}:{self.port}: {e}", origen="OBS/DRV")
+                return False
+
+            self._is_connected = True
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_responses())
+            self.logger.log(f"Conectado exitosamente a {self.host}:{self.port}", origen="OBS/DRV")
+            return True
+
+    async def disconnect_async(self) -> None:
+        if not self._is_connected:
+            return
+        self._is_connected = False
+        if self._reader_task is not None and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader_task = None
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        self._writer = None
+        self._reader = None
+        self._fail_pending(ConnectionError("conexion cerrada"))
+        self.logger.log(f"Desconectado de {self.host}:{self.port}", origen="OBS/DRV")
+
+    def connect(self) -> bool:
+        return self._run(self.connect_async())
+
+    def disconnect(self):
+        if self._loop is not None:
+            self._run(self.disconnect_async())
+
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    # -------------------------------------------------------- transacciones
+
+    def _fail_pending(self, exc: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future, _unit_id, _function_code in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    def _allocate_tid(self) -> int:
+        for _ in range(0x10000):
+            self._next_tid = (self._next_tid + 1) & 0xFFFF
+            if self._next_tid not in self._pending:
+                return self._next_tid
+        raise RuntimeError("No hay transaction ids libres")
+
+    async def _read_responses(self) -> None:
+        """
+        Lee respuestas del socket y resuelve la transaccion pendiente por tid. Una
+        respuesta cuyo unit id o function code (o su excepcion, fc | 0x80) no coincide
+        con el pedido hace fallar la transaccion en lugar de entregar datos de otro unit.
+        """
+        try:
+            while True:
+                header = await self._reader.readexactly(_MBAP.size)
+                tid, _protocol, length, unit_id = _MBAP.unpack(header)
+                pdu = await self._reader.readexactly(length - 1)
+                pending = self._pending.pop(tid, None)
+                if pending is None or pending[0].done():
+                    # Respuesta tardia de una transaccion ya vencida: se descarta.
+                    continue
+                future, expected_unit, expected_function = pending
+                if unit_id != expected_unit or not pdu or pdu[0] & 0x7F != expected_function:
+                    future.set_exception(ResponseMismatchError(
+                        f"tid {tid}: se esperaba unit {expected_unit} fc={expected_function:#04x}, "
+                        f"llego unit {unit_id} fc={pdu[0] if pdu else 0:#04x}"
+                    ))
+                    continue
+                future.set_result(pdu)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.log(f"Conexion con {self.host}:{self.port} interrumpida: {e}", origen="OBS/DRV")
+            await self.disconnect_async()
+
+    async def _execute(self, unit_id: int, pdu: bytes) -> bytes:
+        """Envia un PDU y espera su respuesta, sin bloquear otras transacciones."""
+        if not self._is_connected and not await self.connect_async():
+            raise ConnectionError(f"Sin conexion con {self.host}:{self.port}")
+
+        timeout = self.timeout
+        if self.health is not None:
+            if not self.health.allow(unit_id):
+                raise CircuitOpenError(f"Unit ID {unit_id} con circuito abierto")
+            timeout = self.health.timeout_for(unit_id)
+
+        async with self._in_flight:
+            tid = self._allocate_tid()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[tid] = (future, unit_id, pdu[0])
+            started = time.monotonic()
+            try:
+                self._writer.write(_MBAP.pack(tid, 0, len(pdu) + 1, unit_id) + pdu)
+                await self._writer.drain()
+                response = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.CancelledError:
+                # Cancelada por el llamador (cancel_pending, apagado): no es una falla del unit.
+                raise
+            except BaseException:
+                if self.health is not None:
+                    self.health.record_failure(unit_id)
+                raise
+            finally:
+                self._pending.pop(tid, None)
+
+        try:
+            _check_response(response)
+        except MalformedResponseError:
+            if self.health is not None:
+                self.health.record_failure(unit_id)
+            raise
+
+        function_code = response[0]
+        if self.health is not None:
+            if function_code & 0x80 and response[1] in GATEWAY_EXCEPTION_CODES:
+                self.health.record_failure(unit_id)
+            else:
+                self.health.record_success(unit_id, time.monotonic() - started)
+        if function_code & 0x80:
+            raise ModbusExceptionResponse(function_code & 0x7F, response[1])
+        return response
+
+    async def _read_registers(self, function_code: int, address_offset: int, count: int, unit_id: int):
+        label = "registros de entrada" if function_code == FC_READ_INPUT_REGISTERS else "holding registers"
+        try:
+            response = await self._execute(unit_id, _REQUEST_PDU.pack(function_code, address_offset, count))
+            registers = list(struct.unpack_from(f">{response[1] // 2}H", response, 2))
+        except ModbusExceptionResponse as e:
+            self.logger.log(
+                f"El esclavo (Unit ID {unit_id}) reporto un error de protocolo: {e} al leer {address_offset}.",
+                origen="OBS/DRV"
+            )
+            return None
+        except Exception as e:
+            self.logger.log(
+                f"Excepcion en lectura de {label} para Unit ID {unit_id}, Addr {address_offset}, Cant {count}: {e!r}.",
+                origen="OBS/DRV"
+            )
+            return None
+
+        if not registers:
+            self.logger.log(
+                f"Se recibio una respuesta valida, pero sin registros para Unit ID {unit_id}, Addr {address_offset}, Cant {count}.",
+                origen="OBS/DRV"
+            )
+            return None
+        return registers
+
+    async def read_input_registers_async(self, address_offset: int, count: int, unit_id: int):
+        return await self._read_registers(FC_READ_INPUT_REGISTERS, address_offset, count, unit_id)
+
+    async def read_holding_registers_async(self, address_offset: int, count: int, unit_id: int):
+        return await self._read_registers(FC_READ_HOLDING_REGISTERS, address_offset, count, unit_id)
+
+    async def write_single_register_async(self, address_offset: int, value: int, unit_id: int) -> bool:
+        try:
+            await self._execute(unit_id, _REQUEST_PDU.pack(FC_WRITE_SINGLE_REGISTER, address_offset, value))
+        except Exception as e:
+            self.logger.log(
+                f"Excepcion al escribir registro para Unit ID {unit_id}, Addr {address_offset}, Value {value}: {e!r}",
+                origen="OBS/DRV"
+            )
+            return False
+        self.logger.log(f"Escritura exitosa: Unit ID {unit_id}, Addr {address_offset}, Value {value}", origen="OBS/DRV")
+        return True
+
+    # ------------------------------------------------- interfaz sincronica
+
+    def read_input_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._run(self.read_input_registers_async(address_offset, count, unit_id))
+
+    def read_holding_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._run(self.read_holding_registers_async(address_offset, count, unit_id))
+
+    def write_single_register(self, address_offset: int, value: int, unit_id: int):
+        return self._run(self.write_single_register_async(address_offset, value, unit_id))
+
+    def read_input_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        """
+        Lanza todas las lecturas (address_offset, count, unit_id) a la vez y
+        retorna sus resultados en el mismo orden.
+        """
+        async def _gather():
+            return await asyncio.gather(
+                *(self.read_input_registers_async(address, count, unit_id) for address, count, unit_id in requests)
+            )
+        return self._run(_gather())
+
+    def read_holding_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        """Igual que read_input_registers_many, para holding registers."""
+        async def _gather():
+            return await asyncio.gather(
+                *(self.read_holding_registers_async(address, count, unit_id) for address, count, unit_id in requests)
+            )
+        return self._run(_gather())
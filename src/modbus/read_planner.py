@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from typing import Hashable, Mapping, Sequence
+
+# Limite del protocolo para funciones 0x03/0x04 (registros por request).
+MODBUS_MAX_REGISTERS = 125
+
+
+@dataclass(frozen=True)
+class BlockRead:
+    """
+    Lectura contigua planificada: cubre uno o mas bloques logicos.
+    Cada bloque se guarda como (clave, direccion, cantidad).
+    """
+    address: int
+    count: int
+    blocks: tuple[tuple[Hashable, int, int], ...]
+
+
+def plan_block_reads(
+    blocks: Mapping[Hashable, tuple[int, int]],
+    max_count: int = MODBUS_MAX_REGISTERS,
+    max_gap: int | None = None,
+) -> list[BlockRead]:
+    """
+    Agrupa bloques {clave: (direccion, cantidad)} en la menor cantidad de lecturas
+    contiguas posible, sin superar max_count registros por request.
+
+    Args:
+        blocks: Bloques a leer, indexados por una clave arbitraria (ej. grd_id).
+        max_count: Maximo de registros por lectura (125 para Modbus).
+        max_gap: Maximo de registros no pedidos que se aceptan leer entre dos bloques
+            para fusionarlos. None = sin limite (solo restringe max_count).
+
+    Returns:
+        list[BlockRead]: Lecturas ordenadas por direccion.
+    """
+    ordered = sorted(blocks.items(), key=lambda item: item[1][0])
+    plan: list[BlockRead] = []
+
+    start = end = None
+    members: list[tuple[Hashable, int, int]] = []
+
+    for key, (address, count) in ordered:
+        block_end = address + count
+        if start is not None:
+            gap = address - end
+            fits = max(end, block_end) - start <= max_count
+            if fits and (max_gap is None or gap <= max_gap):
+                end = max(end, block_end)
+                members.append((key, address, count))
+                continue
+            plan.append(BlockRead(start, end - start, tuple(members)))
+        start, end = address, block_end
+        members = [(key, address, count)]
+
+    if start is not None:
+        plan.append(BlockRead(start, end - start, tuple(members)))
+    return plan
+
+
+def slice_block_reads(
+    plan: Sequence[BlockRead],
+    results: Sequence[list[int] | None],
+) -> dict[Hashable, list[int] | None]:
+    """
+    Reparte el resultado de cada lectura planificada entre sus bloques.
+    Un bloque queda en None si su lectura fallo o vino incompleta.
+    """
+    sliced: dict[Hashable, list[int] | None] = {}
+    for block_read, registers in zip(plan, results):
+        for key, address, count in block_read.blocks:
+            offset = address - block_read.address
+            if registers is None or len(registers) < offset + count:
+                sliced[key] = None
+            else:
+                sliced[key] = registers[offset:offset + count]
+    return sliced
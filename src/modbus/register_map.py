@@ -0,0 +1,144 @@
+import json
+import struct
+from dataclasses import dataclass
+from itertools import chain
+from typing import Iterable, Mapping, Sequence
+
+# tipo -> (formato struct big-endian, palabras Modbus que ocupa)
+FIELD_TYPES: dict[str, tuple[str, int]] = {
+    "uint16": ("H", 1),
+    "int16": ("h", 1),
+    "uint32": ("I", 2),
+    "int32": ("i", 2),
+    "float32": ("f", 2),
+    "bit": ("H", 1),
+}
+
+
+@dataclass(frozen=True)
+class RegisterField:
+    """
+    Campo del bloque de registros de un GRD.
+
+    offset es relativo al inicio del bloque del GRD; bit solo aplica al tipo
+    "bit"; scale multiplica el valor crudo (1 = sin escalar).
+    """
+    name: str
+    offset: int
+    type: str = "uint16"
+    bit: int | None = None
+    scale: float = 1.0
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "RegisterField":
+        return cls(
+            name=str(data["name"]),
+            offset=int(data["offset"]),
+            type=str(data.get("type", "uint16")),
+            bit=int(data["bit"]) if data.get("bit") is not None else None,
+            scale=float(data.get("scale", 1.0)),
+        )
+
+
+# Mapa minimo del bloque Exemys: la palabra 15 lleva el estado y su bit 0 la conexion.
+DEFAULT_GRD_FIELDS: tuple[RegisterField, ...] = (
+    RegisterField("conectado", 15, "bit", bit=0),
+    RegisterField("estado", 15, "uint16"),
+)
+
+
+class RegisterMap:
+    """
+    Mapa declarativo compilado a un unico struct por bloque.
+    Los campos se agrupan por (offset, tipo) en slots sin superposicion; el
+    formato resultante (con relleno 'x' entre slots) decodifica un bloque entero
+    en una sola llamada, y decode_many lo aplica con iter_unpack sobre los
+    bloques de todos los GRDs concatenados.
+    """
+
+    def __init__(self, fields: Iterable[RegisterField], register_count: int):
+        self.fields = tuple(fields)
+        self.register_count = int(register_count)
+
+        slots: set[tuple[int, str]] = set()
+        for field in self.fields:
+            if field.type not in FIELD_TYPES:
+                raise ValueError(f"Tipo de registro desconocido para '{field.name}': {field.type}")
+            if field.type == "bit" and not (field.bit is not None and 0 <= field.bit <= 15):
+                raise ValueError(f"Campo '{field.name}' de tipo bit requiere bit entre 0 y 15.")
+            words = FIELD_TYPES[field.type][1]
+            if field.offset < 0 or field.offset + words > self.register_count:
+                raise ValueError(
+                    f"Campo '{field.name}' fuera del bloque de {self.register_count} registros (offset {field.offset})."
+                )
+            # bit y uint16 sobre la misma palabra comparten slot
+            slot_type = "uint16" if field.type == "bit" else field.type
+            slots.add((field.offset, slot_type))
+
+        ordered = sorted(slots, key=lambda slot: slot[0])
+        fmt = ">"
+        position = 0
+        slot_index: dict[tuple[int, str], int] = {}
+        for offset, slot_type in ordered:
+            if offset < position:
+                raise ValueError(f"Campos superpuestos en el offset {offset} del mapa de registros.")
+            type_format, words = FIELD_TYPES[slot_type]
+            fmt += "x" * (2 * (offset - position)) + type_format
+            position = offset + words
+            slot_index[(offset, slot_type)] = len(slot_index)
+        fmt += "x" * (2 * (self.register_count - position))
+
+        self._block = struct.Struct(fmt)
+        self._words = struct.Struct(f">{self.register_count}H")
+        self._extractors = tuple(
+            (
+                field.name,
+                slot_index[(field.offset, "uint16" if field.type == "bit" else field.type)],
+                field.bit if field.type == "bit" else None,
+                field.scale,
+            )
+            for field in self.fields
+        )
+
+    def _fields_from(self, values: tuple) -> dict:
+        result = {}
+        for name, index, bit, scale in self._extractors:
+            value = values[index]
+            if bit is not None:
+                value = (value >> bit) & 1
+            elif scale != 1.0:
+                value = value * scale
+            result[name] = value
+        return result
+
+    def decode(self, registers: Sequence[int]) -> dict:
+        """Decodifica el bloque de un GRD en {campo: valor}."""
+        return self._fields_from(self._block.unpack(self._words.pack(*registers[:self.register_count])))
+
+    def decode_many(self, blocks: Mapping[int, Sequence[int]]) -> dict[int, dict]:
+        """Decodifica en una pasada los bloques {grd_id: registros} de varios GRDs."""
+        if not blocks:
+            return {}
+        keys = list(blocks)
+        raw = struct.pack(
+            f">{self.register_count * len(keys)}H",
+            *chain.from_iterable(blocks[key][:self.register_count] for key in keys),
+        )
+        return {
+            key: self._fields_from(values)
+            for key, values in zip(keys, self._block.iter_unpack(raw))
+        }
+
+
+def load_grd_register_map(register_count: int, extra_json: str = "") -> RegisterMap:
+    """
+    Mapa por defecto mas los campos declarados en extra_json (lista de objetos con
+    name, offset, type, bit, scale). Un campo extra con el nombre de uno por
+    defecto lo reemplaza.
+    """
+    fields = {field.name: field for field in DEFAULT_GRD_FIELDS}
+    if extra_json.strip():
+        for item in json.loads(extra_json):
+            field = RegisterField.from_dict(item)
+            fields[field.name] = field
+    return RegisterMap(fields.values(), register_count)
@@ -0,0 +1,217 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Sequence
+
+from src.logger import Logosaurio
+
+# Menor numero = mayor prioridad.
+PRIORIDAD_GRD = 0
+PRIORIDAD_RELE = 10
+
+PRIORIDAD_NOMBRES = {PRIORIDAD_GRD: "grd", PRIORIDAD_RELE: "rele"}
+
+
+class _LatencyStats:
+    """Acumulado de espera en cola y duracion de transacciones para una prioridad."""
+
+    def __init__(self):
+        self.count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_last = 0.0
+        self.exec_total = 0.0
+        self.exec_max = 0.0
+
+    def add(self, wait: float, duration: float) -> None:
+        self.count += 1
+        self.wait_total += wait
+        self.wait_last = wait
+        self.wait_max = max(self.wait_max, wait)
+        self.exec_total += duration
+        self.exec_max = max(self.exec_max, duration)
+
+    def to_dict(self) -> dict:
+        count = self.count or 1
+        return {
+            "requests": self.count,
+            "cola_ms_prom": round(self.wait_total * 1000 / count, 3),
+            "cola_ms_max": round(self.wait_max * 1000, 3),
+            "cola_ms_ultima": round(self.wait_last * 1000, 3),
+            "exec_ms_prom": round(self.exec_total * 1000 / count, 3),
+            "exec_ms_max": round(self.exec_max * 1000, 3),
+        }
+
+
+class ModbusRequestBroker:
+    """
+    Cola de prioridad delante de un driver Modbus compartido.
+    Los hilos de GRDs y relés encolan transacciones; los workers las ejecutan en
+    orden de prioridad, de modo que una lectura de conectividad nunca espera detras
+    de todo un barrido de fallas. Con un worker (driver sincronico) se garantiza una
+    unica transaccion por socket a la vez.
+    """
+
+    def __init__(self, driver, logger: Logosaurio, workers: int = 1):
+        self.driver = driver
+        self.logger = logger
+        self.host = driver.host
+        self.port = driver.port
+        self._workers = max(1, int(workers))
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._stats: dict[int, _LatencyStats] = {}
+        self._stats_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._pending: dict[int, set[Future]] = {}
+        self._pending_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self._workers):
+                thread = threading.Thread(target=self._worker, name=f"modbus-broker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        with self._start_lock:
+            for _ in self._threads:
+                self._queue.put((float("inf"), next(self._seq), 0.0, None, None, (), {}))
+            for thread in self._threads:
+                thread.join(timeout=5)
+            self._threads = []
+
+    def _worker(self) -> None:
+        while True:
+            priority, _seq, enqueued_at, future, method, args, kwargs = self._queue.get()
+            if future is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.monotonic()
+            try:
+                result = getattr(self.driver, method)(*args, **kwargs)
+            except Exception as e:
+                self.logger.log(f"Excepcion en transaccion {method} (prioridad {priority}): {e}", origen="OBS/BRK")
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finished_at = time.monotonic()
+
+            with self._stats_lock:
+                stats = self._stats.setdefault(priority, _LatencyStats())
+                stats.add(started_at - enqueued_at, finished_at - started_at)
+
+    def submit(self, priority: int, method: str, *args, **kwargs) -> Future:
+        """Encola una llamada al driver y retorna un Future con su resultado."""
+        self.start()
+        future: Future = Future()
+        with self._pending_lock:
+            self._pending.setdefault(priority, set()).add(future)
+        future.add_done_callback(lambda done: self._forget(priority, done))
+        self._queue.put((priority, next(self._seq), time.monotonic(), future, method, args, kwargs))
+        return future
+
+    def _forget(self, priority: int, future: Future) -> None:
+        with self._pending_lock:
+            self._pending.get(priority, set()).discard(future)
+
+    def cancel_pending(self, priority: int) -> int:
+        """
+        Cancela las transacciones aun encoladas de una prioridad (las que ya estan
+        en ejecucion terminan normalmente). Retorna cuantas se cancelaron.
+        """
+        with self._pending_lock:
+            futures = list(self._pending.get(priority, ()))
+        cancelled = sum(1 for future in futures if future.cancel())
+        if cancelled:
+            self.logger.log(
+                f"Canceladas {cancelled} transacciones pendientes (prioridad {priority}).", origen="OBS/BRK"
+            )
+        return cancelled
+
+    def call(self, priority: int, method: str, *args, **kwargs) -> Any:
+        """Encola una llamada al driver y espera su resultado."""
+        return self.submit(priority, method, *args, **kwargs).result()
+
+    def channel(self, priority: int) -> "BrokerChannel":
+        return BrokerChannel(self, priority)
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            por_prioridad = {
+                PRIORIDAD_NOMBRES.get(priority, str(priority)): stats.to_dict()
+                for priority, stats in sorted(self._stats.items())
+            }
+        return {
+            "workers": self._workers,
+            "pendientes": self._queue.qsize(),
+            "prioridades": por_prioridad,
+        }
+
+
+class BrokerChannel:
+    """
+    Vista de un ModbusRequestBroker con una prioridad fija. Expone la misma
+    interfaz que ModbusTcpDriver para que los clientes no cambien.
+    """
+
+    def __init__(self, broker: ModbusRequestBroker, priority: int):
+        self.broker = broker
+        self.priority = priority
+        self.host = broker.host
+        self.port = broker.port
+
+    def _call(self, method: str, *args, **kwargs):
+        try:
+            return self.broker.call(self.priority, method, *args, **kwargs)
+        except CancelledError:
+            return None
+
+    def cancel_pending(self) -> int:
+        return self.broker.cancel_pending(self.priority)
+
+    def connect(self) -> bool:
+        return bool(self._call("connect"))
+
+    def disconnect(self):
+        return self._call("disconnect")
+
+    def is_connected(self) -> bool:
+        return self.broker.driver.is_connected()
+
+    def read_input_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._call("read_input_registers", address_offset, count, unit_id=unit_id)
+
+    def read_holding_registers(self, address_offset: int, count: int, unit_id: int):
+        return self._call("read_holding_registers", address_offset, count, unit_id=unit_id)
+
+    def write_single_register(self, address_offset: int, value: int, unit_id: int):
+        return bool(self._call("write_single_register", address_offset, value, unit_id=unit_id))
+
+    def _many(self, method: str, requests: Sequence[tuple[int, int, int]]) -> list:
+        # Cada lectura se encola por separado: otra prioridad puede intercalarse
+        # entre ellas y, con varios workers, quedan todas en vuelo a la vez.
+        futures = [
+            self.broker.submit(self.priority, method, address, count, unit_id=unit_id)
+            for address, count, unit_id in requests
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except CancelledError:
+                results.append(None)
+        return results
+
+    def read_input_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return self._many("read_input_registers", requests)
+
+    def read_holding_registers_many(self, requests: Sequence[tuple[int, int, int]]) -> list:
+        return self._many("read_holding_registers", requests)
@@ -1,10 +1,17 @@
 import time
+from typing import Callable
 from src.persistencia.dao.dao_historicos import historicos_dao as dao
 from src.persistencia.dao.dao_grd import grd_dao
 from .modbus_driver import ModbusTcpDriver
+from .read_planner import plan_block_reads, slice_block_reads
+from .register_map import RegisterMap, load_grd_register_map
 from src.logger import Logosaurio
 from src.services.mqtt_publisher import ModbusMqttPublisher
-from src import config
+from src.services.connectivity_cache import ConnectivityStateCache
+from src.services.flap_filter import FlapFilter
+from src.services.persistence_writer import PersistenceWriter
+from src.services.poll_scheduler import DeadlineScheduler
+from src.services.snapshot_publisher import GrdSnapshotPublisher
 from src.utils import timebox
 
 class GrdMiddlewareClient:
@@ -21,7 +28,24 @@ class GrdMiddlewareClient:
         refresh_interval: int,
         logger: Logosaurio,
         mqtt_publisher: ModbusMqttPublisher,
+        intervals: dict[int, float] | None = None,
+        jitter: float = 0.0,
+        state_cache: ConnectivityStateCache | None = None,
+        flap_filter: FlapFilter | None = None,
+        register_map: RegisterMap | None = None,
+        snapshots: GrdSnapshotPublisher | None = None,
+        grd_filter: Callable[[int], bool] | None = None,
+        block_base: int = 1,
+        gateway_name: str = "principal",
+        writer: PersistenceWriter | None = None,
     ):
+        """
+        grd_filter restringe los GRDs activos a los que atiende este gateway y
+        block_base es el GRD que ocupa el primer bloque de registros del gateway.
+        state_cache y snapshots se comparten entre los clientes de todos los gateways.
+        Con writer las transiciones se persisten en su hilo (write-behind); sin el,
+        en el propio ciclo de sondeo.
+        """
         self.driver = modbus_driver
         self.default_unit_id = default_unit_id
         self.register_count = register_count
@@ -29,11 +53,20 @@ class GrdMiddlewareClient:
         self.logger = logger
         self._active_grd_data = None
         self._last_grd_data_refresh = 0
+        self.scheduler = DeadlineScheduler(refresh_interval, intervals, jitter)
+        # Estado vigente por GRD: se carga una vez de la DB y se mantiene en cada insercion.
+        self.state_cache = state_cache or ConnectivityStateCache()
+        self.flap_filter = flap_filter or FlapFilter()
+        # Decodifica el bloque completo de cada GRD; 'conectado' alimenta la deteccion de cambios.
+        self.register_map = register_map or load_grd_register_map(register_count)
+        self._telemetry: dict[int, dict] = {}
+        self.grd_filter = grd_filter
+        self.block_base = block_base
+        self.gateway_name = gateway_name
+        self.writer = writer
 
         self.publisher = mqtt_publisher
-
-        self._last_payload_grado = None
-        self._last_payload_down = None
+        self.snapshots = snapshots or GrdSnapshotPublisher(mqtt_publisher, logger)
 
     def _refresh_grd_data(self):
         """Refresca la lista de GRDs activos desde la base de datos."""
@@ -54,63 +87,152 @@ class GrdMiddlewareClient:
         return (value >> bit_index) & 1
 
     def _publish_snapshots_if_changed(self):
+        """Publica grado global y desconectados si cambiaron (ver GrdSnapshotPublisher)."""
+        self.snapshots.publish_if_changed()
+
+    def _read_telemetry(self, grd_ids: list[int]) -> dict[int, dict | None]:
         """
-        Calcula grado global y lista de desconectados; publica si hay cambios
-        (y la primera vez siempre publica).
+        Lee el bloque de cada GRD agrupando los bloques en la menor cantidad de
+        lecturas contiguas posible y los decodifica con el mapa de registros.
+        Un GRD cuya lectura falla queda con None.
         """
-        latest_states = dao.get_latest_states_for_all_grds()
-        total = len(latest_states)
-        conectados = sum(1 for v in latest_states.values() if v == 1)
-        porcentaje = round((conectados / total) * 100, 2) if total else 0.0
-
-        grado_payload = {
-            "porcentaje": porcentaje,
-            "total": total,
-            "conectados": conectados,
-            "ts": timebox.utc_iso()
-        }
+        blocks = {}
+        for grd_id in grd_ids:
+            if grd_id == 4:
+                self.logger.log(f"Omitiendo GRD_ID {grd_id} del monitoreo.", origen="OBS/MW")
+                continue
+            blocks[grd_id] = ((grd_id - self.block_base) * self.register_count, self.register_count)
 
-        down = []
-        for item in dao.get_all_disconnected_grds():
-            last_down = item.get("last_disconnected_timestamp")
-            if last_down:
-                try:
-                    parsed = timebox.parse(last_down, legacy=True)
-                    ultima_caida = timebox.utc_iso(parsed)
-                except Exception:
-                    ultima_caida = str(last_down)
+        plan = plan_block_reads(blocks)
+        results = self.driver.read_input_registers_many(
+            [(block_read.address, block_read.count, self.default_unit_id) for block_read in plan]
+        )
+        registers_by_grd = slice_block_reads(plan, results)
+
+        decoded = self.register_map.decode_many(
+            {grd_id: registers for grd_id, registers in registers_by_grd.items() if registers is not None}
+        )
+        return {grd_id: decoded.get(grd_id) for grd_id in blocks}
+
+    def _read_connected_states(self, grd_ids: list[int], timestamp: int | None = None) -> dict[int, int]:
+        """
+        Lee la telemetria de los GRDs, la guarda como ultima lectura y retorna el
+        bit de conexion de cada uno. Un GRD cuya lectura falla se asume DESCONECTADO.
+        """
+        timestamp = timestamp or timebox.utc_now_ms()
+        ts_iso = timebox.iso_from_epoch_ms(timestamp)
+        states: dict[int, int] = {}
+        # Copia por ciclo y cambio de referencia al final: get_telemetry (hilos de la API)
+        # itera siempre un dict que el sondeo ya no modifica.
+        telemetry = dict(self._telemetry)
+        for grd_id, fields in self._read_telemetry(grd_ids).items():
+            if fields is not None:
+                telemetry[grd_id] = {**fields, "ts": ts_iso}
+                states[grd_id] = int(fields["conectado"])
             else:
-                ultima_caida = ""
-            down.append({
-                "id": item["id_grd"],
-                "nombre": item["description"],
-                "ultima_caida": ultima_caida
-            })
-
-        down_timestamp = timebox.utc_iso()
-        down_payload = {
-            "items": down,
-            "ts": down_timestamp
+                grd_description = self._active_grd_data.get(grd_id, "Desconocido")
+                self.logger.log(
+                    f"Fallo al leer registros para GRD_ID {grd_id} ({grd_description}). Asumiendo estado DESCONECTADO.",
+                    origen="OBS/MW"
+                )
+                states[grd_id] = 0
+        self._telemetry = telemetry
+        return states
+
+    def get_telemetry(self) -> dict[int, dict]:
+        """Ultima telemetria decodificada por GRD ({grd_id: {campo: valor, 'ts': ...}})."""
+        telemetry = self._telemetry
+        return {grd_id: dict(fields) for grd_id, fields in sorted(telemetry.items())}
+
+    def poll_once(self, grd_ids: list[int]) -> None:
+        """
+        Ejecuta un ciclo de sondeo sobre los GRDs indicados: lee Modbus, persiste
+        los cambios contra la DB y publica snapshots si hubo alguno.
+        """
+        # No-op si el orquestador ya cargo el cache al iniciar.
+        self.state_cache.ensure_loaded(dao.get_latest_connected_state_by_grd)
+
+        timestamp_now = timebox.utc_now_ms()
+
+        if not self.driver.is_connected() and not self.driver.connect():
+            self.logger.log(
+                "No se pudo establecer conexion con el servidor Modbus. Reintentando en el proximo ciclo.",
+                origen="OBS/MW"
+            )
+            return
+
+        current_states = self._read_connected_states(grd_ids, timestamp_now)
+
+        changed = self.state_cache.changed(current_states)
+        # Sin estado previo no hay nada que filtrar: se persiste directamente.
+        transitions = {
+            grd_id: (current_states[grd_id], timestamp_now)
+            for grd_id in changed if self.state_cache.get(grd_id) is None
         }
+        transitions.update(self.flap_filter.observe(
+            current_states, [grd_id for grd_id in changed if grd_id not in transitions], timestamp_now
+        ))
 
-        # Publicar grado si cambió
-        if grado_payload != self._last_payload_grado:
-            self.publisher.publish_grado(grado_payload)
-            self._last_payload_grado = grado_payload
-            self.logger.log(f"Publicado grado global en {config.MQTT_TOPIC_GRADO}: {grado_payload}", origen="OBS/MW")
+        # Las transiciones del ciclo se persisten juntas, en una sola transaccion.
+        # La validez del GRD se toma del catalogo en memoria (GRDs activos).
+        catalog = self._active_grd_data or {}
+        rows = []
+        for grd_id, (current_connected_value, transition_timestamp) in transitions.items():
+            if grd_id not in catalog:
+                self.logger.log(
+                    f"Cambio en GRD ID {grd_id} descartado: el equipo no esta en el catalogo de GRDs activos.",
+                    origen="OBS/MW"
+                )
+                continue
+            self.logger.log(
+                f"Cambio detectado en ({catalog[grd_id]}): MB={current_connected_value}, DB={self.state_cache.get(grd_id)}",
+                origen="OBS/MW"
+            )
+            rows.append((grd_id, transition_timestamp, current_connected_value))
+
+        if rows:
+            self._persist_transitions(rows)
+
+    def _persist_transitions(self, rows: list[tuple[int, int, int]]) -> None:
+        """
+        Persiste las transiciones del ciclo y publica snapshots una vez escritas.
+        Con el escritor diferido el estado en memoria se actualiza al encolar (el
+        proximo ciclo ya no las detecta como cambio) y se olvida si la escritura
+        falla o no se pudo encolar, para que se vuelvan a persistir.
+        """
+        if self.writer is None:
+            if dao.insert_historico_readings(rows) is not None:
+                for grd_id, _, current_connected_value in rows:
+                    self.state_cache.update(grd_id, current_connected_value)
+                self._publish_snapshots_if_changed()
+            return
+
+        for grd_id, _, current_connected_value in rows:
+            self.state_cache.update(grd_id, current_connected_value)
+        if not self.writer.submit_historicos(rows, lambda inserted: self._on_transitions_written(rows, inserted)):
+            self.state_cache.forget(grd_id for grd_id, _, _ in rows)
 
-        # Publicar desconectados si cambió
-        if down_payload != self._last_payload_down:
-            self.publisher.publish_grds(down_payload)
-            self._last_payload_down = down_payload
-            self.logger.log(f"Publicado snapshot de desconectados en {config.MQTT_TOPIC_GRDS}: {down_payload}", origen="OBS/MW")
+    def _on_transitions_written(self, rows: list[tuple[int, int, int]], inserted: int | None) -> None:
+        """Callback del escritor (corre en su hilo)."""
+        if inserted is None:
+            self.logger.log(
+                f"No se pudieron persistir {len(rows)} transiciones; se reintentan en el proximo ciclo.",
+                origen="OBS/MW"
+            )
+            self.state_cache.forget(grd_id for grd_id, _, _ in rows)
+            return
+        self._publish_snapshots_if_changed()
+
+    def get_stats(self) -> dict:
+        return {"scheduler": self.scheduler.get_stats(), "flaps": self.flap_filter.get_stats()}
 
     def start_observer_loop(self):
         """
         Loop principal: lee estados Modbus, persiste cambios y publica snapshots normalizados.
         """
         self.logger.log(
-            f"Iniciando observador de GRD Middleware (Unit ID: {self.default_unit_id}, Intervalo: {self.refresh_interval}s)...",
+            f"Iniciando observador de GRD Middleware (Gateway: {self.gateway_name} {self.driver.host}:{self.driver.port}, "
+            f"Unit ID: {self.default_unit_id}, Intervalo: {self.refresh_interval}s)...",
             origen="OBS/MW"
         )
 
@@ -123,59 +245,21 @@ class GrdMiddlewareClient:
         while True:
             self._refresh_grd_data()
             grd_ids_to_monitor = list(self._active_grd_data.keys()) if self._active_grd_data else []
+            if self.grd_filter is not None:
+                grd_ids_to_monitor = [grd_id for grd_id in grd_ids_to_monitor if self.grd_filter(grd_id)]
 
             if not grd_ids_to_monitor:
                 self.logger.log("No hay GRDs para monitorear. Esperando...", origen="OBS/MW")
                 time.sleep(self.refresh_interval)
                 continue
 
-            timestamp_now = timebox.utc_now().strftime('%Y-%m-%d %H:%M:%S')
-
-            if not self.driver.is_connected() and not self.driver.connect():
-                self.logger.log(
-                    "No se pudo establecer conexion con el servidor Modbus. Reintentando en el proximo ciclo.",
-                    origen="OBS/MW"
-                )
-                time.sleep(self.refresh_interval)
-                continue
-
-            hubo_cambios = False
-
-            for grd_id in grd_ids_to_monitor:
-                if grd_id == 4:
-                    self.logger.log(f"Omitiendo GRD_ID {grd_id} del monitoreo.", origen="OBS/MW")
-                    continue
-
-                grd_description = self._active_grd_data.get(grd_id, "Desconocido")
-                modbus_start_address_offset = (grd_id - 1) * self.register_count
-
-                registers_data = self.driver.read_input_registers(
-                    modbus_start_address_offset,
-                    self.register_count,
-                    unit_id=self.default_unit_id
-                )
-
-                if registers_data is not None and len(registers_data) >= self.register_count:
-                    reg_16_value = registers_data[15]
-                    current_connected_value = self.get_bit(reg_16_value, 0)
-                else:
-                    self.logger.log(
-                        f"Fallo al leer registros para GRD_ID {grd_id} ({grd_description}). Asumiendo estado DESCONECTADO.",
-                        origen="OBS/MW"
-                    )
-                    current_connected_value = 0
-
-                latest_value_in_db_for_grd = dao.get_latest_connected_state_for_grd(grd_id)
-
-                if current_connected_value != latest_value_in_db_for_grd:
-                    self.logger.log(
-                        f"Cambio detectado en ({grd_description}): MB={current_connected_value}, DB={latest_value_in_db_for_grd}",
-                        origen="OBS/MW"
-                    )
-                    dao.insert_historico_reading(grd_id, timestamp_now, current_connected_value)
-                    hubo_cambios = True
-
-            if hubo_cambios:
-                self._publish_snapshots_if_changed()
+            self.scheduler.sync(grd_ids_to_monitor)
+            wait = self.scheduler.time_until_next()
+            if wait:
+                time.sleep(wait)
 
-            time.sleep(self.refresh_interval)
+            # Los GRDs que vencen dentro del margen de jitter se leen en el mismo ciclo
+            # para no partir las lecturas agrupadas.
+            due_grd_ids = self.scheduler.due(lookahead=2 * self.scheduler.jitter * self.refresh_interval)
+            self.poll_once(due_grd_ids)
+            self.scheduler.complete(due_grd_ids)
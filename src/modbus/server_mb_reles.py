@@ -1,11 +1,24 @@
 import time
 import json
-from src.modelo.registro_falla import RegistroFalla
+import threading
+from typing import Callable
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.modelo.registro_falla import LoteRegistrosFalla, RegistroFalla
 from src.persistencia.dao.dao_reles import reles_dao
-from src.persistencia.dao.dao_fallas_reles import fallas_reles_dao
 from .modbus_driver import ModbusTcpDriver
 from src.logger import Logosaurio
+from src.services.persistence_writer import PersistenceWriter, store_falla
+from src.services.poll_scheduler import DeadlineScheduler
 from src.services.state_store import ObserverStateStore
+from src.utils import timebox
+
+# Tabla de fallas MiCOM: una ventana de 15 palabras por direccion, 0x3700..0x3718.
+FAULT_START_ADDRESS = 0x3700
+FAULT_END_ADDRESS = 0x3718
+FAULT_WORDS = 15
+FAULT_SLOTS = FAULT_END_ADDRESS - FAULT_START_ADDRESS + 1
 
 class ProtectionRelayClient:
     """
@@ -18,19 +31,57 @@ class ProtectionRelayClient:
         refresh_interval: int,
         logger: Logosaurio,
         observer_store: ObserverStateStore,
+        intervals: dict[int, float] | None = None,
+        jitter: float = 0.0,
+        full_scan_every: int = 0,
+        fault_read_mode: str = "ventanas",
+        max_concurrency: int = 1,
+        relay_filter: Callable[[int], bool] | None = None,
+        gateway_name: str = "principal",
+        writer: PersistenceWriter | None = None,
     ):
         """
-        inicializa cliente con driver modbus compartido y periodo de refresco
+        inicializa cliente con driver modbus compartido y periodo de refresco.
+        full_scan_every fuerza un barrido completo de la tabla de fallas cada N
+        ciclos aunque el sondeo por watermark no detecte fallas nuevas (0 = nunca).
+        fault_read_mode elige como se lee la tabla de fallas ("ventanas" o "bloque").
+        max_concurrency limita cuantos reles se barren en paralelo.
+        relay_filter restringe los reles de la base a los que atiende este gateway.
+        writer persiste las fallas en su hilo (write-behind); sin el, en el barrido.
         """
         self.driver = modbus_driver
         self.refresh_interval = refresh_interval
         self.logger = logger
+        self.scheduler = DeadlineScheduler(refresh_interval, intervals, jitter)
 
         # ids modbus activos desde la base
-        self.relay_unit_ids = list(reles_dao.get_all_reles_with_descriptions().keys())
+        self.gateway_name = gateway_name
+        self.writer = writer
+        self.relay_unit_ids = [
+            unit_id for unit_id in reles_dao.get_all_reles_with_descriptions().keys()
+            if relay_filter is None or relay_filter(unit_id)
+        ]
 
         self._last_observing_status = None
         self.observer_store = observer_store
+        # se activa al pausar el monitoreo: corta los barridos en curso
+        self._scan_abort = threading.Event()
+        if not self.observer_store.get_reles_enabled():
+            self._scan_abort.set()
+        self.observer_store.add_reles_listener(self._on_observing_changed)
+
+        # watermark por rele: ultimo numero de falla conocido y slot donde se leyo
+        self.full_scan_every = max(0, int(full_scan_every))
+        self._watermarks: dict[int, tuple[int, int]] = self.observer_store.get_rele_watermarks()
+        # el callback del escritor de DB puede revertir un watermark desde su hilo
+        self._watermark_lock = threading.Lock()
+        self._cycles_since_full_scan: dict[int, int] = {}
+        self.fault_read_mode = fault_read_mode
+
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="rele-scan")
+        self._scan_latency: dict[int, dict] = {}
+        self._latency_lock = threading.Lock()
 
         if not self.relay_unit_ids:
             self.logger.log(
@@ -50,18 +101,108 @@ class ProtectionRelayClient:
             self.logger.log(f"ERROR al leer flag reles_consultar: {e}", origen="OBS/RELE")
             return False
 
-    def read_relay_status(self, relay_id: int):
+    def _on_observing_changed(self, enabled: bool) -> None:
         """
-        lee registros de falla de un rele y guarda la falla mas reciente si es nueva
+        reacciona al cambio de la bandera en el hilo que la modifico: al pausar
+        marca los barridos para abortar y descarta las lecturas de reles aun
+        encoladas en el broker; al reanudar habilita los barridos y adelanta la
+        planificacion para que el proximo ciclo arranque ya
+        """
+        if enabled:
+            self._scan_abort.clear()
+            self.scheduler.reschedule_now()
+            return
+        self._scan_abort.set()
+        cancel_pending = getattr(self.driver, "cancel_pending", None)
+        if cancel_pending is not None:
+            cancel_pending()
+
+    def _scan_aborted(self) -> bool:
+        return self._scan_abort.is_set()
+
+    def _has_new_fault(self, relay_id: int, watermark: tuple[int, int]) -> bool:
+        """
+        sondeo barato: lee solo el numero de falla del slot del watermark y del
+        siguiente. hay falla nueva si el slot conocido cambio (tabla desplazada)
+        o si el siguiente tiene un numero mayor (tabla circular)
+        """
+        fault_number, slot = watermark
+        next_slot = (slot + 1) % FAULT_SLOTS
+        probes = self.driver.read_holding_registers_many([
+            (FAULT_START_ADDRESS + slot, 1, relay_id),
+            (FAULT_START_ADDRESS + next_slot, 1, relay_id),
+        ])
+        if any(not registers for registers in probes):
+            self.logger.log(
+                f"Fallo el sondeo de watermark del Rele (Unit ID {relay_id}). Se omite el ciclo.",
+                origen="OBS/RELE"
+            )
+            return False
+        at_slot, at_next = probes[0][0], probes[1][0]
+        return at_slot != fault_number or at_next > fault_number
+
+    def _update_watermark(self, relay_id: int, fault_number: int, slot: int) -> tuple[int, int] | None:
+        """fija el watermark del rele y retorna el anterior"""
+        with self._watermark_lock:
+            previous = self._watermarks.get(relay_id)
+            if previous != (fault_number, slot):
+                self._set_watermark(relay_id, (fault_number, slot))
+            return previous
+
+    def _set_watermark(self, relay_id: int, watermark: tuple[int, int] | None) -> None:
+        if watermark is None:
+            self._watermarks.pop(relay_id, None)
+        else:
+            self._watermarks[relay_id] = watermark
+        try:
+            if watermark is None:
+                self.observer_store.clear_rele_watermark(relay_id)
+            else:
+                self.observer_store.set_rele_watermark(relay_id, *watermark)
+        except Exception as e:
+            self.logger.log(f"ERROR al persistir watermark del Rele (Unit ID {relay_id}): {e}", origen="OBS/RELE")
+
+    def _rollback_watermark(self, relay_id: int, applied: tuple[int, int], previous: tuple[int, int] | None) -> None:
+        """
+        vuelve al watermark anterior si la falla no se pudo persistir, para que el
+        proximo sondeo la vuelva a detectar (salvo que otro barrido ya lo haya movido)
+        """
+        with self._watermark_lock:
+            if self._watermarks.get(relay_id) == applied:
+                self._set_watermark(relay_id, previous)
+
+    def _read_fault_windows(self, relay_id: int):
+        """
+        lee la tabla de fallas y retorna [(direccion, ventana de 15 palabras | None)].
+        en modo "ventanas" pide cada direccion por separado (acceso por registro del
+        MiCOM); en modo "bloque" trae toda la zona en una lectura contigua y arma las
+        ventanas como vistas (memoryview) sobre ese buffer, sin copiar.
+        retorna None si el monitoreo se deshabilita en medio de la lectura
         """
-        start_address = int('3700', 16)
-        end_address = int('3718', 16)
-        num_registers_per_fault = 15
+        addresses = range(FAULT_START_ADDRESS, FAULT_END_ADDRESS + 1)
 
-        all_fault_records = []
+        if self.fault_read_mode == "bloque":
+            if self._scan_aborted():
+                return None
+            self.logger.log(
+                f"Rele (Unit ID: {relay_id}) - Leyendo tabla de fallas en bloque "
+                f"{hex(FAULT_START_ADDRESS)}-{hex(FAULT_END_ADDRESS + FAULT_WORDS - 1)}",
+                origen="OBS/RELE"
+            )
+            registers = self.driver.read_holding_registers(
+                FAULT_START_ADDRESS, FAULT_SLOTS + FAULT_WORDS - 1, unit_id=relay_id
+            )
+            if not registers or len(registers) < FAULT_SLOTS + FAULT_WORDS - 1:
+                return None if self._scan_aborted() else [(address, None) for address in addresses]
+            buffer = memoryview(array("H", registers))
+            return [
+                (address, buffer[slot:slot + FAULT_WORDS])
+                for slot, address in enumerate(addresses)
+            ]
 
-        for current_address in range(start_address, end_address + 1):
-            if not self._is_observing_enabled():
+        windows = []
+        for current_address in addresses:
+            if self._scan_aborted():
                 self.logger.log(
                     f"Monitoreo deshabilitado durante la lectura de Rele (Unit ID: {relay_id}). Deteniendo lectura en Addr {hex(current_address)}.",
                     origen="OBS/RELE"
@@ -72,96 +213,179 @@ class ProtectionRelayClient:
                 f"Rele (Unit ID: {relay_id}) - Leyendo registro Addr {hex(current_address)} (Decimal: {current_address})",
                 origen="OBS/RELE"
             )
+            windows.append(
+                (current_address, self.driver.read_holding_registers(current_address, FAULT_WORDS, unit_id=relay_id))
+            )
+        # una pausa durante la ultima lectura deja ventanas canceladas (None)
+        return None if self._scan_aborted() else windows
 
-            registers = self.driver.read_holding_registers(current_address, num_registers_per_fault, unit_id=relay_id)
-
-            if registers:
-                try:
-                    registro_falla = RegistroFalla(registers, self.logger)
-                    all_fault_records.append(registro_falla)
-                    self.logger.log(
-                        f"Rele (Unit ID: {relay_id}) - Registro {hex(current_address)} decodificado. Falla nro {registro_falla.fault_number}",
-                        origen="OBS/RELE"
-                    )
-                except ValueError as e:
-                    self.logger.log(
-                        f"ERROR al decodificar registros de falla desde Addr {hex(current_address)} para Unit ID {relay_id}: {e}. Registros brutos: {registers}",
-                        origen="OBS/RELE"
-                    )
-                except Exception as e:
-                    self.logger.log(
-                        f"ERROR inesperado al procesar registros desde Addr {hex(current_address)} para Unit ID {relay_id}: {e}",
-                        origen="OBS/RELE"
-                    )
-            else:
+    def scan_relay(self, relay_id: int):
+        """
+        lee la tabla de fallas de un rele y retorna (slot, RegistroFalla) de la falla
+        mas reciente, o None si no hay novedades o no se pudo leer. no toca la DB,
+        por lo que puede correr en paralelo para varios reles.
+        si el rele tiene watermark, primero sondea si hay fallas nuevas y solo
+        entonces barre la tabla completa
+        """
+        watermark = self._watermarks.get(relay_id)
+        cycles = self._cycles_since_full_scan.get(relay_id, 0) + 1
+        full_scan_due = self.full_scan_every and cycles >= self.full_scan_every
+        if watermark is not None and not full_scan_due:
+            if self._scan_aborted():
+                return None
+            if not self._has_new_fault(relay_id, watermark):
+                self._cycles_since_full_scan[relay_id] = cycles
                 self.logger.log(
-                    f"Fallo al leer {num_registers_per_fault} registros desde Addr {hex(current_address)} de Rele (Unit ID {relay_id}).",
+                    f"Rele (Unit ID: {relay_id}) sin fallas nuevas (watermark Nro {watermark[0]}).",
                     origen="OBS/RELE"
                 )
+                return None
+        self._cycles_since_full_scan[relay_id] = 0
 
-        if all_fault_records:
-            latest_fault_record = None
-            max_fault_number = -1
-
-            for record in all_fault_records:
-                if record.fault_number is not None and isinstance(record.fault_number, int) and record.fault_number > max_fault_number:
-                    max_fault_number = record.fault_number
-                    latest_fault_record = record
+        windows = self._read_fault_windows(relay_id)
+        if windows is None:
+            return None
 
-            if latest_fault_record:
+        # matriz slots x 15 palabras; las ventanas que no se pudieron leer quedan
+        # fuera de la mascara 'present'
+        matrix = np.zeros((len(windows), FAULT_WORDS), dtype=np.uint16)
+        present = np.zeros(len(windows), dtype=bool)
+        for row, (current_address, registers) in enumerate(windows):
+            if registers and len(registers) == FAULT_WORDS:
+                matrix[row] = registers
+                present[row] = True
+            else:
                 self.logger.log(
-                    f"Falla mas reciente encontrada para Rele (Unit ID {relay_id}) con Numero de Falla: {latest_fault_record.fault_number}.",
+                    f"Fallo al leer {FAULT_WORDS} registros desde Addr {hex(current_address)} de Rele (Unit ID {relay_id}).",
                     origen="OBS/RELE"
                 )
 
-                internal_rele_id = reles_dao.get_internal_id_by_modbus_id(relay_id)
-
-                if internal_rele_id is not None:
-                    fault_timestamp_iso = latest_fault_record.fault_datetime.isoformat() if latest_fault_record.fault_datetime else None
-
-                    if not fallas_reles_dao.falla_exists(internal_rele_id, latest_fault_record.fault_number, fault_timestamp_iso):
-                        fallas_reles_dao.insert_falla_rele(
-                            id_rele=internal_rele_id,
-                            numero_falla=latest_fault_record.fault_number,
-                            timestamp=fault_timestamp_iso,
-                            fasea_corr=latest_fault_record.current_phase_a,
-                            faseb_corr=latest_fault_record.current_phase_b,
-                            fasec_corr=latest_fault_record.current_phase_c,
-                            tierra_corr=latest_fault_record.earth_current
-                        )
-                        self.logger.log("Falla insertada en la DB", origen="OBS/RELE")
-                    else:
-                        self.logger.log(
-                            f"Falla (Nro {latest_fault_record.fault_number}, Timestamp: {fault_timestamp_iso}) para Rele interno ID {internal_rele_id} ya existe en la DB. No se reinserta.",
-                            origen="OBS/RELE"
-                        )
-                else:
-                    self.logger.log(
-                        f"No se pudo encontrar el ID interno para el rele Modbus ID {relay_id}. No se registrara la falla en la BD.",
-                        origen="OBS/RELE"
-                    )
-                    return None
+        batch = LoteRegistrosFalla(matrix, present)
+        latest_slot = batch.latest()
+        if latest_slot is None:
+            self.logger.log(
+                f"No se encontraron registros de falla validos para Rele (Unit ID {relay_id}) en el rango {hex(FAULT_START_ADDRESS)}-{hex(FAULT_END_ADDRESS)}.",
+                origen="OBS/RELE"
+            )
+            return None
 
-                return latest_fault_record.to_dict()
-            else:
-                self.logger.log(
-                    "No se pudo determinar la falla mas reciente a pesar de haber registros decodificados.",
-                    origen="OBS/RELE"
-                )
-                return None
+        # solo la falla mas reciente se materializa como RegistroFalla
+        latest_fault_record = batch.registro(latest_slot, self.logger)
+        self.logger.log(
+            f"Falla mas reciente encontrada para Rele (Unit ID {relay_id}) con Numero de Falla: {latest_fault_record.fault_number} "
+            f"({int(present.sum())}/{len(windows)} registros leidos).",
+            origen="OBS/RELE"
+        )
+        return latest_slot, latest_fault_record
+
+    def store_latest_fault(self, relay_id: int, latest_slot: int, latest_fault_record: RegistroFalla):
+        """
+        actualiza el watermark del rele y guarda su falla mas reciente si es nueva
+        """
+        internal_rele_id = reles_dao.get_internal_id_by_modbus_id(relay_id)
+
+        if internal_rele_id is None:
+            self.logger.log(
+                f"No se pudo encontrar el ID interno para el rele Modbus ID {relay_id}. No se registrara la falla en la BD.",
+                origen="OBS/RELE"
+            )
+            return None
+
+        fault_datetime = latest_fault_record.fault_datetime
+        fault_timestamp_ms = timebox.to_epoch_ms(fault_datetime) if fault_datetime else None
+
+        applied = (latest_fault_record.fault_number, latest_slot)
+        previous = self._update_watermark(relay_id, *applied)
+
+        falla = dict(
+            id_rele=internal_rele_id,
+            numero_falla=latest_fault_record.fault_number,
+            timestamp=fault_timestamp_ms,
+            fasea_corr=latest_fault_record.current_phase_a,
+            faseb_corr=latest_fault_record.current_phase_b,
+            fasec_corr=latest_fault_record.current_phase_c,
+            tierra_corr=latest_fault_record.earth_current
+        )
+        def on_done(inserted: bool | None) -> None:
+            self._on_falla_stored(relay_id, falla, inserted, applied, previous)
+
+        if self.writer is None:
+            on_done(store_falla(falla))
+        elif not self.writer.submit_falla(falla, on_done):
+            self.logger.log(
+                f"Falla (Nro {falla['numero_falla']}) para Rele interno ID {internal_rele_id} no encolada para persistir.",
+                origen="OBS/RELE"
+            )
+            self._rollback_watermark(relay_id, applied, previous)
+
+        return latest_fault_record.to_dict()
+
+    def _on_falla_stored(self, relay_id: int, falla: dict, inserted: bool | None, applied, previous) -> None:
+        if inserted is None:
+            self.logger.log(
+                f"Falla (Nro {falla['numero_falla']}) para Rele interno ID {falla['id_rele']} no se pudo persistir. Se reintenta en el proximo sondeo.",
+                origen="OBS/RELE"
+            )
+            self._rollback_watermark(relay_id, applied, previous)
+        elif inserted:
+            self.logger.log("Falla insertada en la DB", origen="OBS/RELE")
         else:
             self.logger.log(
-                f"No se encontraron registros de falla validos para Rele (Unit ID {relay_id}) en el rango {hex(start_address)}-{hex(end_address)}.",
+                f"Falla (Nro {falla['numero_falla']}, Timestamp: {timebox.iso_from_epoch_ms(falla['timestamp']) or None}) para Rele interno ID {falla['id_rele']} ya existe en la DB. No se reinserta.",
                 origen="OBS/RELE"
             )
+
+    def read_relay_status(self, relay_id: int):
+        """
+        lee registros de falla de un rele y guarda la falla mas reciente si es nueva
+        """
+        scanned = self.scan_relay(relay_id)
+        if scanned is None:
             return None
+        return self.store_latest_fault(relay_id, *scanned)
+
+    def _timed_scan(self, relay_id: int):
+        """scan_relay midiendo la latencia del barrido del rele"""
+        started = time.monotonic()
+        try:
+            return self.scan_relay(relay_id)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._latency_lock:
+                stats = self._scan_latency.setdefault(relay_id, {"scans": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+                stats["scans"] += 1
+                stats["total"] += elapsed
+                stats["last"] = elapsed
+                stats["max"] = max(stats["max"], elapsed)
+
+    def sweep(self, relay_ids: list[int]) -> None:
+        """
+        barre los reles indicados con hasta max_concurrency lecturas en paralelo.
+        la persistencia se hace despues, en este hilo y en orden de Unit ID, para
+        que el resultado en 'fallas_reles' no dependa del orden de llegada
+        """
+        futures = {}
+        for relay_id in relay_ids:
+            if self._scan_aborted():
+                break
+            self.logger.log(f"Comienza iteracion sobre rele {relay_id}", origen="OBS/RELE")
+            futures[relay_id] = self._pool.submit(self._timed_scan, relay_id)
+
+        for relay_id in sorted(futures):
+            try:
+                scanned = futures[relay_id].result()
+            except Exception as e:
+                self.logger.log(f"ERROR inesperado al barrer Rele (Unit ID {relay_id}): {e}", origen="OBS/RELE")
+                continue
+            if scanned is not None:
+                self.store_latest_fault(relay_id, *scanned)
 
     def start_monitoring_loop(self):
         """
         bucle continuo de monitoreo de reles activos
         """
         self.logger.log(
-            f"Iniciando observador de Reles (Host: {self.driver.host}:{self.driver.port}, Intervalo: {self.refresh_interval}s)...",
+            f"Iniciando observador de Reles (Gateway: {self.gateway_name} {self.driver.host}:{self.driver.port}, Intervalo: {self.refresh_interval}s)...",
             origen="OBS/RELE"
         )
 
@@ -176,7 +400,8 @@ class ProtectionRelayClient:
                 self._last_observing_status = current_observing_status
 
             if not current_observing_status:
-                time.sleep(self.refresh_interval)
+                # sin timeout: despierta apenas se reanuda el monitoreo
+                self.observer_store.wait_reles_change(False)
                 continue
 
             if not self.driver.is_connected():
@@ -185,16 +410,38 @@ class ProtectionRelayClient:
                         "No se pudo establecer conexion con el servidor Modbus. Reintentando en el proximo ciclo.",
                         origen="OBS/RELE"
                     )
-                    time.sleep(self.refresh_interval)
+                    self.observer_store.wait_reles_change(True, timeout=self.refresh_interval)
                     continue
 
             if not self.relay_unit_ids:
                 self.logger.log("No hay reles activos para monitorear. Esperando...", origen="OBS/RELE")
-                time.sleep(self.refresh_interval)
+                self.observer_store.wait_reles_change(True, timeout=self.refresh_interval)
                 continue
 
-            for relay_id in self.relay_unit_ids:
-                self.logger.log(f"Comienza iteracion sobre rele {relay_id}", origen="OBS/RELE")
-                self.read_relay_status(relay_id)
+            self.scheduler.sync(self.relay_unit_ids)
+            wait = self.scheduler.time_until_next()
+            if wait:
+                # la espera se corta si se pausa el monitoreo
+                if not self.observer_store.wait_reles_change(True, timeout=wait):
+                    continue
+
+            due_relay_ids = self.scheduler.due()
+            self.sweep(due_relay_ids)
+            self.scheduler.complete(due_relay_ids)
 
-            time.sleep(self.refresh_interval)
+    def get_stats(self) -> dict:
+        with self._latency_lock:
+            latencias = {
+                str(relay_id): {
+                    "barridos": stats["scans"],
+                    "ms_prom": round(stats["total"] * 1000 / stats["scans"], 3),
+                    "ms_max": round(stats["max"] * 1000, 3),
+                    "ms_ultimo": round(stats["last"] * 1000, 3),
+                }
+                for relay_id, stats in sorted(self._scan_latency.items())
+            }
+        return {
+            "scheduler": self.scheduler.get_stats(),
+            "concurrencia": self.max_concurrency,
+            "latencia_barrido": latencias,
+        }
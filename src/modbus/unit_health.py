@@ -0,0 +1,135 @@
+import threading
+import time
+from typing import Callable
+
+# Excepciones Modbus de gateway: el esclavo detras del gateway no respondio.
+GATEWAY_EXCEPTION_CODES = {0x0A, 0x0B}
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class _UnitState:
+    __slots__ = (
+        "srtt", "rttvar", "consecutive_failures", "timeout_backoff", "state",
+        "open_until", "backoff", "probe_in_flight", "ok", "failures", "skipped",
+    )
+
+    def __init__(self):
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.consecutive_failures = 0
+        self.timeout_backoff = 1
+        self.state = CERRADO
+        self.open_until = 0.0
+        self.backoff = 0.0
+        self.probe_in_flight = False
+        self.ok = 0
+        self.failures = 0
+        self.skipped = 0
+
+
+class UnitHealthRegistry:
+    """
+    Salud por Unit ID Modbus: circuit breaker con reintento por backoff exponencial
+    y timeout adaptativo a partir del RTT medido (media suavizada + 4 * varianza,
+    como el RTO de TCP). Un unit caido deja de consultarse tras varias fallas
+    seguidas y solo se sondea de nuevo cuando vence su backoff.
+    """
+
+    def __init__(
+        self,
+        min_timeout: float,
+        max_timeout: float,
+        failure_threshold: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_timeout = float(min_timeout)
+        self.max_timeout = float(max_timeout)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._units: dict[int, _UnitState] = {}
+
+    def _unit(self, unit_id: int) -> _UnitState:
+        unit = self._units.get(unit_id)
+        if unit is None:
+            unit = self._units[unit_id] = _UnitState()
+        return unit
+
+    def allow(self, unit_id: int) -> bool:
+        """True si se puede consultar el unit ahora (circuito cerrado o sondeo permitido)."""
+        with self._lock:
+            unit = self._unit(unit_id)
+            if unit.state == CERRADO:
+                return True
+            if unit.state == ABIERTO and self._clock() >= unit.open_until:
+                unit.state = SEMIABIERTO
+            if unit.state == SEMIABIERTO and not unit.probe_in_flight:
+                unit.probe_in_flight = True
+                return True
+            unit.skipped += 1
+            return False
+
+    def timeout_for(self, unit_id: int) -> float:
+        """Timeout de la proxima transaccion: RTO estimado, duplicado por cada falla seguida."""
+        with self._lock:
+            unit = self._unit(unit_id)
+            if unit.srtt is None:
+                rto = self.max_timeout
+            else:
+                rto = unit.srtt + 4 * unit.rttvar
+            rto *= unit.timeout_backoff
+            return min(self.max_timeout, max(self.min_timeout, rto))
+
+    def record_success(self, unit_id: int, rtt: float) -> None:
+        with self._lock:
+            unit = self._unit(unit_id)
+            if unit.srtt is None:
+                unit.srtt = rtt
+                unit.rttvar = rtt / 2
+            else:
+                unit.rttvar = 0.75 * unit.rttvar + 0.25 * abs(unit.srtt - rtt)
+                unit.srtt = 0.875 * unit.srtt + 0.125 * rtt
+            unit.ok += 1
+            unit.consecutive_failures = 0
+            unit.timeout_backoff = 1
+            unit.state = CERRADO
+            unit.backoff = 0.0
+            unit.probe_in_flight = False
+
+    def record_failure(self, unit_id: int) -> None:
+        with self._lock:
+            unit = self._unit(unit_id)
+            unit.failures += 1
+            unit.consecutive_failures += 1
+            unit.timeout_backoff = min(unit.timeout_backoff * 2, 64)
+            unit.probe_in_flight = False
+            if unit.state == SEMIABIERTO or unit.consecutive_failures >= self.failure_threshold:
+                unit.backoff = (
+                    min(self.backoff_max, unit.backoff * 2) if unit.backoff else self.backoff_base
+                )
+                unit.state = ABIERTO
+                unit.open_until = self._clock() + unit.backoff
+
+    def get_stats(self) -> dict:
+        now = self._clock()
+        with self._lock:
+            return {
+                str(unit_id): {
+                    "estado": unit.state,
+                    "srtt_ms": round(unit.srtt * 1000, 3) if unit.srtt is not None else None,
+                    "rttvar_ms": round(unit.rttvar * 1000, 3),
+                    "fallas_seguidas": unit.consecutive_failures,
+                    "ok": unit.ok,
+                    "fallas": unit.failures,
+                    "omitidas": unit.skipped,
+                    "reintento_en_s": round(max(0.0, unit.open_until - now), 3) if unit.state == ABIERTO else 0.0,
+                }
+                for unit_id, unit in sorted(self._units.items())
+            }
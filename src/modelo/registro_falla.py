@@ -1,33 +1,92 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
+
+import numpy as np
+
 from src.logger import Logosaurio
 from src.utils import timebox
 
+FAULT_WORDS = 15
+
+# Rangos validos de los componentes de fecha/hora IEC 870 (nombre, min, max).
+_DATE_RANGES = (
+    ("fault_year", "Año", 1994, 2093),
+    ("fault_month", "Mes", 1, 12),
+    ("fault_day", "Dia del mes", 1, 31),
+    ("fault_day_of_week", "Dia de la semana", 1, 7),
+    ("fault_season", "Temporada", 0, 1),
+    ("fault_hour", "Hora", 0, 23),
+    ("fault_minute", "Minuto", 0, 59),
+    ("fault_date_validity", "Validez de fecha", 0, 1),
+    ("fault_seconds", "Segundos", 0, 59),
+    ("fault_microseconds", "Microsegundos", 0, 999999),
+)
+
+# Palabras 5..14 de la ventana, en orden.
+_REMAINING_FIELDS = (
+    "ignored_word_6",
+    "active_group",
+    "involved_phases_type",
+    "fault_type",
+    "amplitude",
+    "current_phase_a",
+    "current_phase_b",
+    "current_phase_c",
+    "earth_current",
+)
+
+
 class RegistroFalla:
     """
     Representa un registro de falla decodificado de una lectura Modbus de un rele,
     siguiendo el formato de fecha/hora IEC 870.
     """
-    def __init__(self, raw_registers: list[int], logger: Logosaurio):
+    __slots__ = (
+        "logger", "_raw_registers", "fault_number",
+        "fault_year", "fault_month", "fault_day_of_week", "fault_day",
+        "fault_season", "fault_hour", "fault_date_validity", "fault_minute",
+        "fault_milliseconds_raw", "fault_seconds", "fault_microseconds",
+        "fault_datetime", "recognized",
+    ) + _REMAINING_FIELDS
+
+    def __init__(self, raw_registers: Sequence[int], logger: Optional[Logosaurio] = None):
         """
         Inicializa una instancia de RegistroFalla con los registros Modbus brutos.
 
         Args:
-            raw_registers (list[int]): Una lista de 15 enteros (palabras Modbus)
+            raw_registers (Sequence[int]): 15 enteros (palabras Modbus)
                                          leidos directamente del rele.
-            logger (Logosaurio): Una instancia del servicio de logging.
+            logger (Logosaurio | None): Servicio de logging; sin logger no se
+                                        registran los problemas de decodificacion.
         Raises:
             ValueError: Si la lista de registros no tiene la longitud esperada (15).
         """
-        if len(raw_registers) != 15:
+        if len(raw_registers) != FAULT_WORDS:
             raise ValueError(
                 f"Se esperaban 15 registros Modbus, pero se recibieron {len(raw_registers)}."
             )
-        
+
         self.logger = logger
-        self._raw_registers = raw_registers
+        self._raw_registers = tuple(int(word) for word in raw_registers)
         self._parse_registers()
 
+    @classmethod
+    def _from_fields(cls, raw_registers: Sequence[int], fields: dict, logger: Optional[Logosaurio]) -> "RegistroFalla":
+        """Arma el registro con campos ya decodificados (ver LoteRegistrosFalla)."""
+        record = cls.__new__(cls)
+        record.logger = logger
+        record._raw_registers = tuple(int(word) for word in raw_registers)
+        date_valid = fields.pop("_date_valid")
+        for name, value in fields.items():
+            setattr(record, name, value)
+        record._parse_remaining_registers()
+        record._create_datetime(date_valid)
+        return record
+
+    def _log(self, message: str) -> None:
+        if self.logger is not None:
+            self.logger.log(message, origen="MODELO")
+
     def _parse_registers(self):
         """
         Decodifica los registros Modbus brutos en atributos significativos.
@@ -51,17 +110,14 @@ class RegistroFalla:
         """Decodifica el año de la palabra Modbus 0x0800."""
         year_hi_byte = (word >> 8) & 0xFF
         year_lo_byte = word & 0xFF
-        
+
         self.fault_year: Optional[int] = None
         if 94 <= year_hi_byte <= 99:
             self.fault_year = 1900 + year_hi_byte
         elif 0 <= (year_lo_byte & 0x7F) <= 93:
             self.fault_year = 2000 + (year_lo_byte & 0x7F)
         else:
-            self.logger.log(
-                f"Formato de año no reconocido en Word 0x0800 ({word}).",
-                origen="MODELO"
-            )
+            self._log(f"Formato de año no reconocido en Word 0x0800 ({word}).")
 
     def _parse_date_components(self, word: int):
         """Decodifica mes, dia de la semana y dia del mes de 0x0801."""
@@ -75,7 +131,7 @@ class RegistroFalla:
         season_hour_byte_hi = (word >> 8) & 0xFF
         self.fault_season: int = ((season_hour_byte_hi & 0x80) >> 7)
         self.fault_hour: int = (season_hour_byte_hi & 0x1F)
-        
+
         validity_minute_byte_lo = word & 0xFF
         self.fault_date_validity: int = ((validity_minute_byte_lo & 0x80) >> 7)
         self.fault_minute: int = (validity_minute_byte_lo & 0x3F)
@@ -88,34 +144,18 @@ class RegistroFalla:
 
     def _validate_and_create_datetime(self):
         """Valida los componentes de fecha y crea el objeto datetime."""
-        validations = [
-            (self.fault_year, "Año", 1994, 2093),
-            (self.fault_month, "Mes", 1, 12),
-            (self.fault_day, "Dia del mes", 1, 31),
-            (self.fault_day_of_week, "Dia de la semana", 1, 7),
-            (self.fault_season, "Temporada", 0, 1),
-            (self.fault_hour, "Hora", 0, 23),
-            (self.fault_minute, "Minuto", 0, 59),
-            (self.fault_date_validity, "Validez de fecha", 0, 1),
-            (self.fault_seconds, "Segundos", 0, 59),
-            (self.fault_microseconds, "Microsegundos", 0, 999999),
-        ]
-
         is_date_components_valid = True
-        for value, name, min_val, max_val in validations:
+        for attribute, name, min_val, max_val in _DATE_RANGES:
+            value = getattr(self, attribute)
             if value is not None and not (min_val <= value <= max_val):
-                self.logger.log(
-                    f"{name} fuera de rango ({min_val}-{max_val}): {value}",
-                    origen="MODELO"
-                )
+                self._log(f"{name} fuera de rango ({min_val}-{max_val}): {value}")
                 is_date_components_valid = False
+        self._create_datetime(is_date_components_valid)
 
+    def _create_datetime(self, is_date_components_valid: bool):
         self.fault_datetime: Optional[datetime] = None
         if not is_date_components_valid or self.fault_year is None:
-            self.logger.log(
-                "Componentes de fecha/hora invalidos. No se creara el objeto datetime.",
-                origen="MODELO"
-            )
+            self._log("Componentes de fecha/hora invalidos. No se creara el objeto datetime.")
             return
 
         try:
@@ -130,25 +170,16 @@ class RegistroFalla:
             )
             self.fault_datetime = timebox.parse(naive_dt, legacy=True)
         except ValueError as e:
-            self.logger.log(
+            self._log(
                 f"Error al crear datetime: {e}. Valores: Año={self.fault_year}, Mes={self.fault_month}, "
                 f"Dia={self.fault_day}, Hora={self.fault_hour}, Minuto={self.fault_minute}, "
-                f"Segundo={self.fault_seconds}, Microsegundo={self.fault_microseconds}",
-                origen="MODELO"
+                f"Segundo={self.fault_seconds}, Microsegundo={self.fault_microseconds}"
             )
-    
+
     def _parse_remaining_registers(self):
         """Decodifica el resto de los registros de falla."""
-        # Se usa un diccionario para asignar nombres a los indices, mejorando la legibilidad.
-        self.ignored_word_6: int = self._raw_registers[5]
-        self.active_group: int = self._raw_registers[6]
-        self.involved_phases_type: int = self._raw_registers[7]
-        self.fault_type: int = self._raw_registers[8]
-        self.amplitude: int = self._raw_registers[9]
-        self.current_phase_a: int = self._raw_registers[10]
-        self.current_phase_b: int = self._raw_registers[11]
-        self.current_phase_c: int = self._raw_registers[12]
-        self.earth_current: int = self._raw_registers[13]
+        for offset, name in enumerate(_REMAINING_FIELDS, start=5):
+            setattr(self, name, self._raw_registers[offset])
         self.recognized: bool = bool(self._raw_registers[14])
 
     def __repr__(self) -> str:
@@ -186,3 +217,89 @@ class RegistroFalla:
             "earth_current": self.earth_current,
             "recognized": self.recognized
         }
+
+
+class LoteRegistrosFalla:
+    """
+    Decodificacion vectorizada de una tabla de fallas completa.
+    Recibe la matriz de ventanas brutas (una fila de 15 palabras por slot) y
+    calcula con NumPy los campos de fecha IEC 870, su validez y las corrientes
+    de todas las filas a la vez. Los objetos RegistroFalla se construyen solo
+    para las filas que se piden con registro().
+    """
+
+    def __init__(self, windows: np.ndarray, present: np.ndarray | None = None):
+        """
+        Args:
+            windows: Matriz (slots x 15) de palabras Modbus.
+            present: Mascara por fila de ventanas efectivamente leidas (por defecto todas).
+        """
+        raw = np.asarray(windows, dtype=np.uint16)
+        if raw.ndim != 2 or raw.shape[1] != FAULT_WORDS:
+            raise ValueError(f"Se esperaba una matriz de Nx15 palabras, se recibio {raw.shape}.")
+        self.raw = raw
+        self.present = np.ones(len(raw), dtype=bool) if present is None else np.asarray(present, dtype=bool)
+
+        words = raw.astype(np.int32)
+        self.fault_number = words[:, 0]
+
+        year_hi = (words[:, 1] >> 8) & 0xFF
+        year_lo = words[:, 1] & 0x7F
+        self.year_known = ((year_hi >= 94) & (year_hi <= 99)) | (year_lo <= 93)
+        self.year = np.where((year_hi >= 94) & (year_hi <= 99), 1900 + year_hi, 2000 + year_lo)
+
+        self.month = (words[:, 2] >> 8) & 0x0F
+        self.day_of_week = (words[:, 2] & 0xE0) >> 5
+        self.day = words[:, 2] & 0x1F
+
+        self.season = (words[:, 3] >> 15) & 0x01
+        self.hour = (words[:, 3] >> 8) & 0x1F
+        self.date_validity = (words[:, 3] & 0x80) >> 7
+        self.minute = words[:, 3] & 0x3F
+
+        self.milliseconds = words[:, 4]
+        self.seconds = self.milliseconds // 1000
+        self.microseconds = (self.milliseconds % 1000) * 1000
+
+        # Mismos rangos que RegistroFalla._validate_and_create_datetime; temporada,
+        # validez y microsegundos quedan en rango por construccion.
+        self.date_valid = (
+            self.year_known
+            & (self.month >= 1) & (self.month <= 12)
+            & (self.day >= 1)
+            & (self.day_of_week >= 1)
+            & (self.hour <= 23)
+            & (self.minute <= 59)
+            & (self.seconds <= 59)
+        )
+
+        self.currents = words[:, 10:14]
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def latest(self) -> int | None:
+        """Fila leida con el mayor numero de falla (la primera si hay empate), o None."""
+        if not self.present.any():
+            return None
+        candidates = np.where(self.present, self.fault_number, -1)
+        return int(np.argmax(candidates))
+
+    def registro(self, row: int, logger: Optional[Logosaurio] = None) -> RegistroFalla:
+        """Construye el RegistroFalla de una fila a partir de los campos ya decodificados."""
+        fields = {
+            "fault_number": int(self.fault_number[row]),
+            "fault_year": int(self.year[row]) if self.year_known[row] else None,
+            "fault_month": int(self.month[row]),
+            "fault_day_of_week": int(self.day_of_week[row]),
+            "fault_day": int(self.day[row]),
+            "fault_season": int(self.season[row]),
+            "fault_hour": int(self.hour[row]),
+            "fault_date_validity": int(self.date_validity[row]),
+            "fault_minute": int(self.minute[row]),
+            "fault_milliseconds_raw": int(self.milliseconds[row]),
+            "fault_seconds": int(self.seconds[row]),
+            "fault_microseconds": int(self.microseconds[row]),
+            "_date_valid": bool(self.date_valid[row]),
+        }
+        return RegistroFalla._from_fields(self.raw[row].tolist(), fields, logger)
@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Sequence
+
+import numpy as np
+
+from src import config
+
+# Archivo frio de las tablas de historia: un .npz comprimido (zlib) por tabla y mes UTC,
+# con una columna int64 por campo y una mascara '<campo>__null' para los NULL.
+TABLAS = {
+    "historicos": ("timestamp", "id_grd", "conectado"),
+    "fallas_reles": (
+        "id", "id_rele", "numero_falla", "timestamp",
+        "fasea_corr", "faseb_corr", "fasec_corr", "tierra_corr",
+    ),
+}
+# Columnas que identifican una fila (para no duplicar al re-archivar un mes).
+_CLAVES = {
+    "historicos": ("timestamp", "id_grd"),
+    "fallas_reles": ("id",),
+}
+_NOMBRE = re.compile(r"^(?P<tabla>[a-z_]+)-(?P<mes>\d{4}-\d{2})\.npz$")
+_NULL = "__null"
+
+
+def month_key(timestamp_ms: int) -> str:
+    """Mes UTC ('YYYY-MM') de un epoch en milisegundos."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def month_bounds(key: str) -> tuple[int, int]:
+    """[inicio, fin) en epoch ms del mes 'YYYY-MM'."""
+    year, month = (int(part) for part in key.split("-"))
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+class ArchivoHistorico:
+    """
+    Lectura y escritura del archivo frio. Escribir un mes reemplaza su archivo de
+    forma atomica (tmp + os.replace) fusionando las filas que ya tenia; leer usa
+    una cache de los ultimos meses cargados, invalidada por mtime.
+    """
+
+    def __init__(self, directory: str, cache_size: int = 24):
+        self.directory = directory
+        self.cache_size = max(0, int(cache_size))
+        self._lock = threading.Lock()
+        self._cache: dict[str, tuple[float, dict[str, np.ndarray]]] = {}
+
+    def _path(self, table: str, month: str) -> str:
+        return os.path.join(self.directory, f"{table}-{month}.npz")
+
+    def months(self, table: str) -> list[str]:
+        """Meses archivados de una tabla, del mas viejo al mas nuevo."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for name in os.listdir(self.directory):
+            match = _NOMBRE.match(name)
+            if match and match.group("tabla") == table:
+                found.append(match.group("mes"))
+        return sorted(found)
+
+    def _load(self, table: str, month: str) -> dict[str, np.ndarray]:
+        path = self._path(table, month)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+        with self._lock:
+            self._cache.pop(path, None)
+            if self.cache_size:
+                self._cache[path] = (mtime, columns)
+                while len(self._cache) > self.cache_size:
+                    self._cache.pop(next(iter(self._cache)))
+        return columns
+
+    @staticmethod
+    def _to_columns(table: str, rows: Sequence[Sequence]) -> dict[str, np.ndarray]:
+        columns = {}
+        for index, name in enumerate(TABLAS[table]):
+            values = [row[index] for row in rows]
+            nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+            columns[name] = np.array([0 if value is None else value for value in values], dtype=np.int64)
+            if nulls.any():
+                columns[name + _NULL] = nulls
+        return columns
+
+    def append(self, table: str, rows: Sequence[Sequence]) -> int:
+        """
+        Agrega filas (en el orden de columnas de TABLAS[table]) a los archivos de
+        sus meses. Las filas ya archivadas con la misma clave no se duplican.
+        Retorna la cantidad de filas nuevas en el archivo.
+        """
+        if not rows:
+            return 0
+        names = TABLAS[table]
+        ts_index = names.index("timestamp")
+        by_month: dict[str, list] = {}
+        for row in rows:
+            by_month.setdefault(month_key(row[ts_index]), []).append(row)
+
+        os.makedirs(self.directory, exist_ok=True)
+        added = 0
+        for month, month_rows in by_month.items():
+            new = self._to_columns(table, month_rows)
+            path = self._path(table, month)
+            previous = 0
+            if os.path.exists(path):
+                old = self._load(table, month)
+                previous = len(old["timestamp"])
+                new = self._concat(names, old, new)
+            new = self._dedupe(table, new)
+            added += len(new["timestamp"]) - previous
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as fh:
+                np.savez_compressed(fh, **new)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, path)
+        return added
+
+    @staticmethod
+    def _concat(names, old: dict, new: dict) -> dict:
+        merged = {}
+        for name in names:
+            merged[name] = np.concatenate([old[name], new[name]])
+            if name + _NULL in old or name + _NULL in new:
+                merged[name + _NULL] = np.concatenate([
+                    old.get(name + _NULL, np.zeros(len(old[name]), dtype=bool)),
+                    new.get(name + _NULL, np.zeros(len(new[name]), dtype=bool)),
+                ])
+        return merged
+
+    @staticmethod
+    def _dedupe(table: str, columns: dict) -> dict:
+        # Ante claves repetidas gana la ultima fila (la recien archivada); se ordena por timestamp.
+        keys = np.stack([columns[name] for name in _CLAVES[table]], axis=1)
+        _, last = np.unique(keys[::-1], axis=0, return_index=True)
+        keep = len(keys) - 1 - last
+        keep = keep[np.argsort(columns["timestamp"][keep], kind="stable")]
+        return {name: values[keep] for name, values in columns.items()}
+
+    def read_historicos(
+        self, grd_id: int, start_ms: int | None = None, end_ms: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps, conectado) archivados de un GRD con start_ms <= timestamp < end_ms,
+        ordenados por timestamp. 'conectado' es float con NaN para los NULL.
+        """
+        timestamps, values = [], []
+        for month in self.months("historicos"):
+            month_start, month_end = month_bounds(month)
+            if (end_ms is not None and month_start >= end_ms) or (start_ms is not None and month_end <= start_ms):
+                continue
+            data = self._load("historicos", month)
+            mask = data["id_grd"] == grd_id
+            if start_ms is not None:
+                mask &= data["timestamp"] >= start_ms
+            if end_ms is not None:
+                mask &= data["timestamp"] < end_ms
+            if not mask.any():
+                continue
+            conectado = data["conectado"][mask].astype(float)
+            if "conectado" + _NULL in data:
+                conectado[data["conectado" + _NULL][mask]] = np.nan
+            timestamps.append(data["timestamp"][mask])
+            values.append(conectado)
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=float)
+        return np.concatenate(timestamps), np.concatenate(values)
+
+    def last_historico_before(self, grd_id: int, timestamp_ms: int):
+        """Valor 'conectado' archivado inmediatamente anterior a timestamp_ms, o None."""
+        for month in reversed(self.months("historicos")):
+            if month_bounds(month)[0] >= timestamp_ms:
+                continue
+            data = self._load("historicos", month)
+            mask = (data["id_grd"] == grd_id) & (data["timestamp"] < timestamp_ms)
+            if not mask.any():
+                continue
+            # Los archivos estan ordenados por timestamp: la ultima fila que cumple es la buscada.
+            index = np.flatnonzero(mask)[-1]
+            if "conectado" + _NULL in data and data["conectado" + _NULL][index]:
+                return None
+            return int(data["conectado"][index])
+        return None
+
+    def oldest_historico(self, grd_id: int) -> int | None:
+        """Timestamp archivado mas antiguo de un GRD, o None."""
+        for month in self.months("historicos"):
+            data = self._load("historicos", month)
+            mask = data["id_grd"] == grd_id
+            if mask.any():
+                return int(data["timestamp"][mask].min())
+        return None
+
+
+# Instancia global sobre DATABASE_DIR/archivo
+archivo_historico = ArchivoHistorico(config.ARCHIVE_DIR)
@@ -1,19 +1,150 @@
 import sqlite3
 import os
 import threading
+import weakref
 from src import config  # Importa la configuracion
 
 # Rutas de la base de datos usando config.py
 DATABASE_DIR = config.DATABASE_DIR
 DATABASE_FILE = os.path.join(DATABASE_DIR, config.DATABASE_NAME)
 
-# Bloqueo para asegurar la seguridad de los hilos al escribir/leer en la base de datos.
+# Bloqueo que serializa las escrituras. Con la base en modo WAL las lecturas
+# (get_db_reader) no lo toman: leen un snapshot consistente sin bloquear al escritor.
 db_lock = threading.RLock()                     # Usar RLock para permitir bloqueos anidados
 
-def get_db_connection():
-    """Crea y retorna una conexion a la base de datos."""
-    os.makedirs(DATABASE_DIR, exist_ok=True)
-    conn = sqlite3.connect(DATABASE_FILE)
+# Sentencias preparadas que sqlite3 conserva por conexion.
+CACHED_STATEMENTS = 256
+
+# Checkpoint PASSIVE del WAL cada N transacciones de escritura (0 = solo autocheckpoint).
+CHECKPOINT_EVERY_WRITES = max(0, config.DB_CHECKPOINT_EVERY_WRITES)
+
+_WRITER = "escritura"
+_READER = "lectura"
+
+# Conexiones persistentes por hilo ({tipo: conexion}); el registro permite cerrarlas todas al apagar.
+_local = threading.local()
+_connections: "weakref.WeakKeyDictionary[threading.Thread, dict]" = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+_generation = 0
+_dir_ready = False
+_writes_since_checkpoint = 0
+
+
+def _connect(kind: str) -> sqlite3.Connection:
+    global _dir_ready
+    if not _dir_ready:
+        os.makedirs(DATABASE_DIR, exist_ok=True)
+        _dir_ready = True
+    # check_same_thread=False solo para poder cerrarla desde close_all_connections;
+    # cada conexion se usa exclusivamente desde su hilo.
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
     conn.row_factory = sqlite3.Row              # Permite acceder a columnas por nombre
     conn.execute("PRAGMA foreign_keys = ON;")   # Asegura que las FK esten habilitadas en cada conexion
+    if kind == _WRITER:
+        # journal_mode queda grabado en el archivo; repetirlo es inocuo.
+        conn.execute("PRAGMA journal_mode = WAL;")
+    else:
+        conn.execute("PRAGMA query_only = ON;")
     return conn
+
+
+def _thread_connection(kind: str) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.generation != _generation:
+        conns = {}
+        _local.conns = conns
+        _local.generation = _generation
+        _local.total_changes = 0
+        with _registry_lock:
+            _connections[threading.current_thread()] = conns
+    conn = conns.get(kind)
+    if conn is None:
+        if kind == _READER and _WRITER not in conns and not os.path.exists(DATABASE_FILE):
+            # La primera conexion sobre un archivo nuevo debe poder pasarlo a WAL.
+            _thread_connection(_WRITER)
+        conn = _connect(kind)
+        conns[kind] = conn
+    return conn
+
+
+def get_db_connection():
+    """
+    Retorna la conexion de escritura persistente del hilo actual, creandola la primera vez.
+    Las escrituras se hacen bajo db_lock. No se debe cerrar: al terminar cada
+    operacion se entrega con release_db_connection().
+    """
+    return _thread_connection(_WRITER)
+
+
+def get_db_reader():
+    """
+    Retorna la conexion de solo lectura persistente del hilo actual (PRAGMA query_only).
+    No requiere db_lock: en modo WAL cada consulta ve el ultimo commit sin
+    esperar a las escrituras en curso. Se entrega con release_db_connection().
+    """
+    return _thread_connection(_READER)
+
+
+def checkpoint(mode: str = "PASSIVE") -> tuple | None:
+    """
+    Ejecuta un checkpoint del WAL (PASSIVE, FULL, RESTART o TRUNCATE) con la
+    conexion de escritura del hilo. Retorna (busy, paginas_wal, paginas_copiadas).
+    """
+    global _writes_since_checkpoint
+    mode = mode.upper()
+    if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Modo de checkpoint invalido: {mode}")
+    with db_lock:
+        conn = get_db_connection()
+        try:
+            row = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+            _writes_since_checkpoint = 0
+            return tuple(row) if row else None
+        except sqlite3.Error as e:
+            print(f"Error en checkpoint {mode} de la base de datos: {e}")
+            return None
+
+
+def release_db_connection(conn) -> None:
+    """
+    Fin de una operacion sobre una conexion del hilo: descarta cualquier
+    transaccion que haya quedado abierta (ej. por un error antes del commit)
+    para no retener locks entre llamadas. La conexion queda abierta.
+    Tras las escrituras aplica la politica de checkpoint.
+    """
+    global _writes_since_checkpoint
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    conns = getattr(_local, "conns", None)
+    if not CHECKPOINT_EVERY_WRITES or conns is None or conns.get(_WRITER) is not conn:
+        return
+    changes = conn.total_changes
+    if changes == getattr(_local, "total_changes", 0):
+        return
+    _local.total_changes = changes
+    with db_lock:
+        _writes_since_checkpoint += 1
+        if _writes_since_checkpoint >= CHECKPOINT_EVERY_WRITES:
+            checkpoint("PASSIVE")
+
+
+def close_all_connections() -> None:
+    """
+    Cierra las conexiones de todos los hilos (apagado del servicio), previo
+    checkpoint TRUNCATE para dejar el WAL vacio.
+    """
+    global _generation
+    if os.path.exists(DATABASE_FILE):
+        checkpoint("TRUNCATE")
+    with _registry_lock:
+        connections = [conn for conns in _connections.values() for conn in conns.values()]
+        _connections.clear()
+        # Los hilos que sigan vivos abren una conexion nueva en su proximo uso.
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,216 @@
+import math
+import sqlite3
+from .dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection
+from src.persistencia.archivo import archivo_historico
+from src.utils import timebox
+
+HORA_MS = 3_600_000
+DIA_MS = 86_400_000
+
+_GRANULARIDADES = {
+    "hora": ("disponibilidad_hora", "hora", HORA_MS),
+    "dia": ("disponibilidad_dia", "dia", DIA_MS),
+}
+
+
+def _floor(value: int, step: int) -> int:
+    return value - value % step
+
+
+def _accumulate(buckets: dict, start: int, end: int, conectado, step: int) -> None:
+    """Suma el intervalo [start, end) con estado 'conectado' a los buckets {inicio: [conectado_ms, observado_ms]}."""
+    while start < end:
+        bucket = _floor(start, step)
+        segment_end = min(end, bucket + step)
+        totals = buckets.setdefault(bucket, [0, 0])
+        if conectado == 1:
+            totals[0] += segment_end - start
+        totals[1] += segment_end - start
+        start = segment_end
+
+
+class DisponibilidadDAO:
+    """
+    Rollups de disponibilidad por GRD en las tablas 'disponibilidad_hora' y
+    'disponibilidad_dia' (milisegundos conectado / observado por bucket UTC).
+    Solo acumulan intervalos cerrados, hasta la ultima lectura de cada GRD; el
+    tramo abierto hasta ahora se agrega al consultar desde 'grd_estado_actual'.
+    """
+
+    def _rebuild_range(self, cursor: sqlite3.Cursor, grd_id: int, start_ms: int, end_ms: int) -> None:
+        """
+        Recalcula desde 'historicos' las horas que tocan [start_ms, end_ms] y los
+        dias que las contienen. Corre dentro de la transaccion del llamador.
+        """
+        last = cursor.execute("SELECT MAX(timestamp) FROM historicos WHERE id_grd = ?", (grd_id,)).fetchone()[0]
+        h0 = _floor(start_ms, HORA_MS)
+        h1 = _floor(end_ms, HORA_MS) + HORA_MS
+
+        hours: dict[int, list[int]] = {}
+        if last is not None:
+            before = cursor.execute("""
+                SELECT conectado FROM historicos
+                WHERE id_grd = ? AND timestamp < ?
+                ORDER BY timestamp DESC
+                LIMIT 1
+            """, (grd_id, h0)).fetchone()
+            if before:
+                points = [(h0, before[0])]
+            else:
+                points = self._archived_points(cursor, grd_id, h0)
+            points += [
+                (row[0], row[1]) for row in cursor.execute("""
+                    SELECT timestamp, conectado FROM historicos
+                    WHERE id_grd = ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY timestamp ASC
+                """, (grd_id, h0, h1))
+            ]
+            observed_until = min(h1, last)
+            for index, (timestamp, conectado) in enumerate(points):
+                until = points[index + 1][0] if index + 1 < len(points) else observed_until
+                _accumulate(hours, timestamp, until, conectado, HORA_MS)
+
+        cursor.execute(
+            "DELETE FROM disponibilidad_hora WHERE id_grd = ? AND hora >= ? AND hora < ?",
+            (grd_id, h0, h1)
+        )
+        cursor.executemany(
+            "INSERT INTO disponibilidad_hora (id_grd, hora, conectado_ms, observado_ms) VALUES (?, ?, ?, ?)",
+            [(grd_id, hour, totals[0], totals[1]) for hour, totals in sorted(hours.items()) if totals[1]]
+        )
+
+        d0 = _floor(h0, DIA_MS)
+        d1 = _floor(h1 - 1, DIA_MS) + DIA_MS
+        cursor.execute(
+            "DELETE FROM disponibilidad_dia WHERE id_grd = ? AND dia >= ? AND dia < ?",
+            (grd_id, d0, d1)
+        )
+        cursor.execute("""
+            INSERT INTO disponibilidad_dia (id_grd, dia, conectado_ms, observado_ms)
+            SELECT id_grd, hora - hora % ?, SUM(conectado_ms), SUM(observado_ms)
+            FROM disponibilidad_hora
+            WHERE id_grd = ? AND hora >= ? AND hora < ?
+            GROUP BY id_grd, hora - hora % ?
+        """, (DIA_MS, grd_id, d0, d1, DIA_MS))
+
+    def _archived_points(self, cursor: sqlite3.Cursor, grd_id: int, h0: int) -> list[tuple]:
+        """
+        Sin lecturas en la DB antes de h0, la historia previa puede estar en el archivo
+        frio (la retencion solo deja la fila ancla): estado vigente en h0 y lecturas
+        archivadas desde h0 hasta la primera de la DB.
+        """
+        first = cursor.execute("SELECT MIN(timestamp) FROM historicos WHERE id_grd = ?", (grd_id,)).fetchone()[0]
+        oldest = archivo_historico.oldest_historico(grd_id)
+        if oldest is None or first is None or oldest >= first:
+            return []
+        points = []
+        if oldest < h0:
+            points.append((h0, archivo_historico.last_historico_before(grd_id, h0)))
+        timestamps, values = archivo_historico.read_historicos(grd_id, h0, first)
+        points += [
+            (int(timestamp), None if math.isnan(value) else int(value))
+            for timestamp, value in zip(timestamps, values)
+        ]
+        return points
+
+    def update_after_insert(self, cursor: sqlite3.Cursor, grd_id: int, first_timestamp: int) -> None:
+        """
+        Actualiza los rollups de un GRD tras insertar lecturas desde first_timestamp,
+        con el cursor de la misma transaccion. Se recalcula desde la lectura anterior
+        (cuyo intervalo quedo cerrado) hasta la ultima, lo que cubre inserts fuera de orden.
+        """
+        previous = cursor.execute(
+            "SELECT MAX(timestamp) FROM historicos WHERE id_grd = ? AND timestamp < ?",
+            (grd_id, first_timestamp)
+        ).fetchone()[0]
+        last = cursor.execute("SELECT MAX(timestamp) FROM historicos WHERE id_grd = ?", (grd_id,)).fetchone()[0]
+        if last is None:
+            return
+        self._rebuild_range(cursor, grd_id, previous if previous is not None else first_timestamp, last)
+
+    def rebuild(self, grd_ids: list[int] | None = None) -> dict[int, int]:
+        """
+        Recalcula por completo los rollups de los GRDs indicados (todos los que tienen
+        'historicos' si es None), un GRD por transaccion. Retorna {grd_id: horas con datos}.
+        Si parte de la historia del GRD ya esta en el archivo frio, se conservan los
+        rollups hasta la hora de su fila ancla (la ultima lectura anterior al corte)
+        y se recalcula desde la hora siguiente.
+        """
+        result = {}
+        if grd_ids is None:
+            conn = None
+            try:
+                conn = get_db_reader()
+                grd_ids = [row[0] for row in conn.execute("SELECT DISTINCT id_grd FROM historicos ORDER BY id_grd")]
+            finally:
+                if conn:
+                    release_db_connection(conn)
+
+        for grd_id in grd_ids:
+            conn = None
+            with db_lock:
+                try:
+                    conn = get_db_connection()
+                    cursor = conn.cursor()
+                    bounds = cursor.execute(
+                        "SELECT MIN(timestamp), MAX(timestamp) FROM historicos WHERE id_grd = ?", (grd_id,)
+                    ).fetchone()
+                    start = bounds[0]
+                    archived = archivo_historico.oldest_historico(grd_id)
+                    if start is not None and archived is not None and archived < start:
+                        start = _floor(start, HORA_MS) + HORA_MS
+                    else:
+                        cursor.execute("DELETE FROM disponibilidad_hora WHERE id_grd = ?", (grd_id,))
+                        cursor.execute("DELETE FROM disponibilidad_dia WHERE id_grd = ?", (grd_id,))
+                    if start is not None and start <= bounds[1]:
+                        self._rebuild_range(cursor, grd_id, start, bounds[1])
+                    conn.commit()
+                    result[grd_id] = cursor.execute(
+                        "SELECT COUNT(*) FROM disponibilidad_hora WHERE id_grd = ?", (grd_id,)
+                    ).fetchone()[0]
+                except sqlite3.Error as e:
+                    print(f"Error al recalcular disponibilidad para GRD ID {grd_id}: {e}")
+                finally:
+                    if conn:
+                        release_db_connection(conn)
+        return result
+
+    def get_availability(self, grd_id: int, start_ms: int | None, end_ms: int, granularity: str = "dia") -> list[dict]:
+        """
+        Buckets de disponibilidad de un GRD entre start_ms (None = desde el primero) y end_ms,
+        alineados a la hora/dia UTC que contiene start_ms. Incluye el tramo abierto
+        desde la ultima lectura hasta ahora.
+        Retorna [{'inicio': epoch ms, 'conectado_ms': int, 'observado_ms': int}] ordenada.
+        """
+        table, column, step = _GRANULARIDADES[granularity]
+        start = _floor(start_ms, step) if start_ms is not None else 0
+        conn = None
+        buckets: dict[int, list[int]] = {}
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {column}, conectado_ms, observado_ms FROM {table}
+                WHERE id_grd = ? AND {column} >= ? AND {column} <= ?
+                ORDER BY {column} ASC
+            """, (grd_id, start, end_ms))
+            for row in cursor.fetchall():
+                buckets[row[0]] = [row[1], row[2]]
+            estado = cursor.execute(
+                "SELECT conectado, timestamp FROM grd_estado_actual WHERE id_grd = ?", (grd_id,)
+            ).fetchone()
+            if estado is not None:
+                tail_end = min(timebox.utc_now_ms(), end_ms)
+                _accumulate(buckets, max(estado['timestamp'], start), tail_end, estado['conectado'], step)
+        except sqlite3.Error as e:
+            print(f"Error al obtener disponibilidad para GRD ID {grd_id}: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
+        return [
+            {"inicio": bucket, "conectado_ms": totals[0], "observado_ms": totals[1]}
+            for bucket, totals in sorted(buckets.items())
+        ]
+
+# Instancia global del DAO de disponibilidad
+disponibilidad_dao = DisponibilidadDAO()
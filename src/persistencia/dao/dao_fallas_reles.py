@@ -1,5 +1,5 @@
 import sqlite3
-from .dao_base import get_db_connection, db_lock # Importa las funciones y variables de dao_base
+from .dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection # Importa las funciones y variables de dao_base
 
 class FallasRelesDAO:
     """
@@ -8,11 +8,12 @@ class FallasRelesDAO:
     def __init__(self):
         pass
 
-    def insert_falla_rele(self, id_rele: int, numero_falla: int, timestamp: str,
+    def insert_falla_rele(self, id_rele: int, numero_falla: int, timestamp: int,
                           fasea_corr: int | None, faseb_corr: int | None,
-                          fasec_corr: int | None, tierra_corr: int | None):
+                          fasec_corr: int | None, tierra_corr: int | None) -> bool:
         """
-        Inserta un registro de falla de rele en la tabla 'fallas_reles'.
+        Inserta un registro de falla de rele en la tabla 'fallas_reles' (timestamp en epoch ms UTC).
+        Retorna True si quedo persistido.
         """
         conn = None
         with db_lock:
@@ -29,60 +30,60 @@ class FallasRelesDAO:
                       fasea_corr, faseb_corr, fasec_corr, tierra_corr))
                 conn.commit()
                 print(f"Falla (Nro {numero_falla}) para Rele interno ID {id_rele} registrada en DB.")
+                return True
             except sqlite3.Error as e:
                 print(f"ERROR al insertar falla de rele en la base de datos: {e}")
+                return False
             finally:
                 if conn:
-                    conn.close()
+                    release_db_connection(conn)
 
-    def falla_exists(self, id_rele: int, numero_falla: int, timestamp: str) -> bool:
+    def falla_exists(self, id_rele: int, numero_falla: int, timestamp: int) -> bool:
         """
         Verifica si ya existe una falla con la misma combinacion de id_rele, numero_falla y timestamp.
         Retorna True si existe, False en caso contrario.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT 1 FROM fallas_reles
-                    WHERE id_rele = ? AND numero_falla = ? AND timestamp = ?
-                ''', (id_rele, numero_falla, timestamp))
-                return cursor.fetchone() is not None
-            except sqlite3.Error as e:
-                print(f"ERROR al verificar existencia de falla en la base de datos: {e}")
-                return False
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT 1 FROM fallas_reles
+                WHERE id_rele = ? AND numero_falla = ? AND timestamp = ?
+            ''', (id_rele, numero_falla, timestamp))
+            return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"ERROR al verificar existencia de falla en la base de datos: {e}")
+            return False
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_latest_falla_for_rele(self, id_rele: int) -> dict | None:
         """
         Obtiene la falla mas reciente (mayor numero_falla y luego timestamp mas reciente)
         para un rele especifico.
-        Retorna un diccionario con los datos de la falla o None si no se encuentra.
+        Retorna un diccionario con los datos de la falla (timestamp en epoch ms UTC) o None si no se encuentra.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id_rele, numero_falla, timestamp, fasea_corr, faseb_corr, fasec_corr, tierra_corr
-                    FROM fallas_reles
-                    WHERE id_rele = ?
-                    ORDER BY numero_falla DESC, timestamp DESC
-                    LIMIT 1
-                ''', (id_rele,))
-                result = cursor.fetchone()
-                return dict(result) if result else None
-            except sqlite3.Error as e:
-                print(f"ERROR al obtener la ultima falla para el rele interno ID {id_rele}: {e}")
-                return None
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id_rele, numero_falla, timestamp, fasea_corr, faseb_corr, fasec_corr, tierra_corr
+                FROM fallas_reles
+                WHERE id_rele = ?
+                ORDER BY numero_falla DESC, timestamp DESC
+                LIMIT 1
+            ''', (id_rele,))
+            result = cursor.fetchone()
+            return dict(result) if result else None
+        except sqlite3.Error as e:
+            print(f"ERROR al obtener la ultima falla para el rele interno ID {id_rele}: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
 
 # Instancia global del DAO para fallas de reles
 fallas_reles_dao = FallasRelesDAO()
\ No newline at end of file
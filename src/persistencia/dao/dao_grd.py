@@ -1,5 +1,5 @@
 import sqlite3
-from .dao_base import get_db_connection, db_lock
+from .dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection
 
 class GrdDAO:
     def insert_grd_description(self, grd_id: int, description: str):
@@ -23,26 +23,25 @@ class GrdDAO:
                 print(f"Error al insertar descripcion GRD: {e}")
             finally:
                 if conn:
-                    conn.close()
+                    release_db_connection(conn)
 
     def get_grd_description(self, grd_id: int):
         """
         Obtiene la descripcion de un GRD_ID.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT descripcion FROM grd WHERE id = ?", (grd_id,))
-                result = cursor.fetchone()
-                return result['descripcion'] if result else None
-            except sqlite3.Error as e:
-                print(f"Error al obtener descripcion de GRD {grd_id}: {e}")
-                return None
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT descripcion FROM grd WHERE id = ?", (grd_id,))
+            result = cursor.fetchone()
+            return result['descripcion'] if result else None
+        except sqlite3.Error as e:
+            print(f"Error al obtener descripcion de GRD {grd_id}: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def grd_exists(self, grd_id: int) -> bool:
         """
@@ -50,18 +49,17 @@ class GrdDAO:
         Retorna True si existe, False en caso contrario.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()        
-                cursor.execute("SELECT 1 FROM grd WHERE id = ?", (grd_id,))
-                return cursor.fetchone() is not None
-            except sqlite3.Error as e:
-                print(f"Error al verificar la existencia de GRD ID {grd_id}: {e}")
-                return False
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()        
+            cursor.execute("SELECT 1 FROM grd WHERE id = ?", (grd_id,))
+            return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"Error al verificar la existencia de GRD ID {grd_id}: {e}")
+            return False
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_all_grds_with_descriptions(self, only_active: bool = False) -> dict:
         """
@@ -72,24 +70,23 @@ class GrdDAO:
         """
         conn = None
         grds_data = {}
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                query = "SELECT id, descripcion FROM grd WHERE descripcion <> 'reserva'"
-                params = []
-                if only_active:
-                    query += " AND activo = 1"
-                query += " ORDER BY id ASC;"
-                cursor.execute(query, params)
-                rows = cursor.fetchall()
-                for row in rows:
-                    grds_data[row['id']] = row['descripcion']
-            except sqlite3.Error as e:
-                print(f"Error al obtener todos los GRD con descripciones: {e}")
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            query = "SELECT id, descripcion FROM grd WHERE descripcion <> 'reserva'"
+            params = []
+            if only_active:
+                query += " AND activo = 1"
+            query += " ORDER BY id ASC;"
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            for row in rows:
+                grds_data[row['id']] = row['descripcion']
+        except sqlite3.Error as e:
+            print(f"Error al obtener todos los GRD con descripciones: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return grds_data
 
 # Instancia de la clase para usar sus metodos
@@ -1,16 +1,52 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from .dao_base import get_db_connection, db_lock
+from .dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection
 from .dao_grd import grd_dao # Se necesita para la validacion de GRD_ID
+from .dao_disponibilidad import disponibilidad_dao
+from src.persistencia.archivo import archivo_historico
 from src.utils import timebox
 
 class HistoricosDAO:
-    def insert_historico_reading(self, grd_id: int, timestamp: str, conectado_value: int):
+    def _with_archive(self, df: pd.DataFrame, grd_id: int, start_ms: int | None = None, end_ms: int | None = None) -> pd.DataFrame:
         """
-        Inserta una nueva lectura procesada para un GRD_ID especifico en la tabla 'historicos'.
+        Completa las filas de 'historicos' (timestamp en epoch ms) con las del archivo frio
+        en [start_ms, end_ms) y convierte el timestamp a datetime UTC. Solo se abren los
+        meses archivados que se solapan con el rango.
+        """
+        timestamps, conectado = archivo_historico.read_historicos(grd_id, start_ms, end_ms)
+        if len(timestamps):
+            archived = pd.DataFrame({
+                'timestamp': timestamps,
+                'id_grd': np.full(len(timestamps), grd_id, dtype=np.int64),
+                'conectado': conectado,
+            })
+            # La fila ancla de cada GRD puede estar en la DB y en el archivo.
+            df = pd.concat([archived, df], ignore_index=True) if not df.empty else archived
+            df = df.drop_duplicates(subset='timestamp', keep='last').sort_values('timestamp', ignore_index=True)
+        if not df.empty:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+        return df
+
+    def _oldest_timestamp(self, cursor: sqlite3.Cursor, grd_id: int) -> int | None:
+        """Timestamp mas antiguo de un GRD entre 'historicos' y el archivo frio."""
+        cursor.execute("""
+            SELECT MIN(timestamp) FROM historicos
+            WHERE id_grd = ?
+        """, (grd_id,))
+        min_ts_ms = cursor.fetchone()['MIN(timestamp)'] # Acceder por nombre de columna
+        candidates = [ts for ts in (min_ts_ms, archivo_historico.oldest_historico(grd_id)) if ts is not None]
+        return min(candidates) if candidates else None
+
+    def insert_historico_reading(self, grd_id: int, timestamp: int, conectado_value: int) -> bool:
+        """
+        Inserta una nueva lectura procesada para un GRD_ID especifico en la tabla 'historicos'
+        ('grd_estado_actual' se actualiza por trigger y los rollups de disponibilidad en la
+        misma transaccion). timestamp es epoch ms UTC.
         Primero verifica que el GRD_ID exista en la tabla 'grd'.
+        Retorna True si la lectura quedo persistida.
         """
         conn = None
         with db_lock:
@@ -18,7 +54,7 @@ class HistoricosDAO:
                 # Logica de validacion: el GRD_ID debe existir en la tabla 'grd'.
                 if not grd_dao.grd_exists(grd_id):
                     print(f"Error: No se pudo insertar el dato para GRD ID {grd_id} ({timestamp}). Equipo desconocido: el ID no existe en la tabla 'grd'.")
-                    return # No se procede con la insercion si el GRD no existe
+                    return False # No se procede con la insercion si el GRD no existe
 
                 conn = get_db_connection()
                 cursor = conn.cursor()
@@ -30,76 +66,125 @@ class HistoricosDAO:
                     INSERT OR IGNORE INTO historicos ({', '.join(columns)})
                     VALUES ({', '.join(['?']*len(columns))})
                 ''', values)
+                inserted = cursor.rowcount > 0
+                if inserted:
+                    disponibilidad_dao.update_after_insert(conn.cursor(), grd_id, timestamp)
                 conn.commit()
-                # print(f"Dato insertado: GRD_ID {grd_id} ({timestamp}): Conectado: {conectado_value}") 
+                # print(f"Dato insertado: GRD_ID {grd_id} ({timestamp}): Conectado: {conectado_value}")
+                return inserted
             except sqlite3.Error as e:
                 print(f"Error al insertar lectura en 'historicos' para GRD ID {grd_id}: {e}")
+                return False
             finally:
                 if conn:
-                    conn.close()
+                    release_db_connection(conn)
 
-    def get_latest_connected_state_for_grd(self, grd_id: int):
+    def insert_historico_readings(self, readings: list[tuple[int, int, int]]) -> int | None:
         """
-        Recupera el ultimo valor 'conectado' (binario) registrado para un GRD_ID especifico.
-        Retorna None si no hay datos para ese GRD_ID.
+        Inserta las lecturas de un ciclo de sondeo, [(grd_id, timestamp epoch ms, conectado)],
+        con un unico executemany y un unico commit (que incluye los rollups de disponibilidad). No valida los GRD_ID contra la tabla
+        'grd': el llamador filtra con su catalogo en memoria (la FK rechaza el lote si no).
+        Retorna la cantidad de filas nuevas, o None si el lote no se pudo persistir.
         """
+        if not readings:
+            return 0
         conn = None
         with db_lock:
             try:
                 conn = get_db_connection()
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT conectado FROM historicos
-                    WHERE id_grd = ?
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                """, (grd_id,))
-                result = cursor.fetchone()
-                return result['conectado'] if result else None
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO historicos (timestamp, id_grd, conectado)
+                    VALUES (?, ?, ?)
+                ''', [(timestamp, grd_id, conectado) for grd_id, timestamp, conectado in readings])
+                inserted = cursor.rowcount
+                first_by_grd = {}
+                for grd_id, timestamp, _ in readings:
+                    first_by_grd[grd_id] = min(timestamp, first_by_grd.get(grd_id, timestamp))
+                rollup_cursor = conn.cursor()
+                for grd_id, first_timestamp in first_by_grd.items():
+                    disponibilidad_dao.update_after_insert(rollup_cursor, grd_id, first_timestamp)
+                conn.commit()
+                return inserted
             except sqlite3.Error as e:
-                print(f"Error al obtener el ultimo estado 'conectado' para GRD ID {grd_id}: {e}")
+                print(f"Error al insertar lote de {len(readings)} lecturas en 'historicos': {e}")
                 return None
             finally:
                 if conn:
-                    conn.close()
+                    release_db_connection(conn)
+
+    def get_latest_connected_state_for_grd(self, grd_id: int):
+        """
+        Recupera el ultimo valor 'conectado' (binario) registrado para un GRD_ID especifico.
+        Retorna None si no hay datos para ese GRD_ID.
+        """
+        conn = None
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT conectado FROM grd_estado_actual WHERE id_grd = ?", (grd_id,))
+            result = cursor.fetchone()
+            return result['conectado'] if result else None
+        except sqlite3.Error as e:
+            print(f"Error al obtener el ultimo estado 'conectado' para GRD ID {grd_id}: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
+
+    def get_latest_connected_state_by_grd(self) -> dict:
+        """
+        Recupera el ultimo valor 'conectado' de cada GRD_ID con registros en 'historicos'
+        (tabla 'grd_estado_actual'), sin filtrar por catalogo. Se usa para cargar el
+        estado en memoria del poller.
+        Retorna un diccionario {grd_id: conectado}.
+        """
+        conn = None
+        latest_states = {}
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT id_grd, conectado FROM grd_estado_actual;")
+            for row in cursor.fetchall():
+                latest_states[row['id_grd']] = row['conectado']
+        except sqlite3.Error as e:
+            print(f"Error al obtener los ultimos estados por GRD: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
+        return latest_states
 
     def get_latest_states_for_all_grds(self) -> dict: # Agregado 'self'
         """
-        Recupera el ultimo estado 'conectado' para cada GRD_ID existente en la tabla 'historicos',
-        excluyendo aquellos GRD cuya descripcion en la tabla 'grd' sea 'reserva'.
+        Recupera el ultimo estado 'conectado' para cada GRD_ID existente en la tabla 'historicos'
+        (mantenido en 'grd_estado_actual'), excluyendo aquellos GRD cuya descripcion en la
+        tabla 'grd' sea 'reserva'.
         Retorna un diccionario donde la clave es el grd_id y el valor es su ultimo estado (0 o 1).
         Si un GRD no tiene registros o es de 'reserva', no estara en el diccionario.
         """
         conn = None
         latest_states = {}
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT h.id_grd, h.conectado
-                    FROM historicos h
-                    INNER JOIN (
-                        SELECT id_grd, MAX(timestamp) AS max_timestamp
-                        FROM historicos
-                        GROUP BY id_grd
-                    ) AS latest_records ON h.id_grd = latest_records.id_grd 
-                        AND h.timestamp = latest_records.max_timestamp
-                    INNER JOIN grd g ON h.id_grd = g.id
-                    WHERE g.descripcion <> 'reserva'
-                        AND g.descripcion <> 'SE - CD45 Murchison'
-                        AND g.activo = 1;
-                """)
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT e.id_grd, e.conectado
+                FROM grd_estado_actual e
+                INNER JOIN grd g ON e.id_grd = g.id
+                WHERE g.descripcion <> 'reserva'
+                    AND g.descripcion <> 'SE - CD45 Murchison'
+                    AND g.activo = 1;
+            """)
                 
-                rows = cursor.fetchall()
-                for row in rows:
-                    latest_states[row['id_grd']] = row['conectado']
-            except sqlite3.Error as e:
-                print(f"Error al obtener los ultimos estados para todos los GRD (excluyendo reservas): {e}")
-            finally:
-                if conn:
-                    conn.close()
+            rows = cursor.fetchall()
+            for row in rows:
+                latest_states[row['id_grd']] = row['conectado']
+        except sqlite3.Error as e:
+            print(f"Error al obtener los ultimos estados para todos los GRD (excluyendo reservas): {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return latest_states
 
     def get_all_disconnected_grds(self) -> list[dict]: # Agregado 'self'
@@ -107,57 +192,47 @@ class HistoricosDAO:
         Recupera los GRD_ID, sus descripciones y la estampa de tiempo de su ultima desconexion
         para los GRD que estan actualmente desconectados (estado 'conectado' = 0),
         excluyendo aquellos GRD cuya descripcion en la tabla 'grd' sea 'reserva'.
-        La estampa de tiempo sera la del registro que indica el estado actual de desconexion.
-        
+        La estampa de tiempo es desde cuando esta desconectado ('grd_estado_actual.desde').
+
         Esta funcion cumple con:
         1. Traer todos los equipos cuyo ULTIMO estado registrado es 'desconectado' (0).
         2. Excluir equipos cuya descripcion en la tabla 'grd' sea 'reserva'.
-        3. Incluir la estampa de tiempo correspondiente a ese ULTIMO registro encontrado.
-        Retorna una lista de diccionarios, ordenada por GRD ID.
+        3. Incluir la estampa de tiempo en que comenzo esa desconexion.
+        Retorna una lista de diccionarios, ordenada por GRD ID; la estampa es epoch ms UTC.
         """
         conn = None
         disconnected_grds = []
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT
-                        h.id_grd,
-                        g.descripcion,
-                        h.timestamp AS last_disconnected_timestamp
-                    FROM
-                        historicos h
-                    INNER JOIN (
-                        SELECT
-                            id_grd,
-                            MAX(timestamp) AS max_timestamp
-                        FROM
-                            historicos
-                        GROUP BY
-                            id_grd
-                    ) AS latest_grd_status ON h.id_grd = latest_grd_status.id_grd AND h.timestamp = latest_grd_status.max_timestamp
-                    INNER JOIN
-                        grd g ON h.id_grd = g.id
-                    WHERE
-                        h.conectado = 0 AND g.descripcion <> 'reserva' AND g.activo = 1
-                    ORDER BY
-                        h.id_grd ASC;
-                """)
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT
+                    e.id_grd,
+                    g.descripcion,
+                    e.desde AS last_disconnected_timestamp
+                FROM
+                    grd_estado_actual e
+                INNER JOIN
+                    grd g ON e.id_grd = g.id
+                WHERE
+                    e.conectado = 0 AND g.descripcion <> 'reserva' AND g.activo = 1
+                ORDER BY
+                    e.id_grd ASC;
+            """)
                 
-                rows = cursor.fetchall()
-                for row in rows:
-                    disconnected_grds.append({
-                        'id_grd': row['id_grd'],
-                        'description': row['descripcion'],
-                        'last_disconnected_timestamp': datetime.strptime(row['last_disconnected_timestamp'], '%Y-%m-%d %H:%M:%S') # Convertir a datetime
-                    })
-            except sqlite3.Error as e:
-                print(f"Error al obtener los GRD desconectados con timestamp: {e}")
-            finally:
-                if conn:
-                    conn.close()
+            rows = cursor.fetchall()
+            for row in rows:
+                disconnected_grds.append({
+                    'id_grd': row['id_grd'],
+                    'description': row['descripcion'],
+                    'last_disconnected_timestamp': row['last_disconnected_timestamp'] # epoch ms UTC
+                })
+        except sqlite3.Error as e:
+            print(f"Error al obtener los GRD desconectados con timestamp: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return disconnected_grds
 
     def get_connected_state_before_timestamp(self, grd_id: int, timestamp: datetime):
@@ -166,24 +241,26 @@ class HistoricosDAO:
         Retorna None si no hay datos anteriores.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT conectado FROM historicos
-                    WHERE id_grd = ? AND timestamp < ?
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                """, (grd_id, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-                result = cursor.fetchone()
-                return result['conectado'] if result else None
-            except sqlite3.Error as e:
-                print(f"Error al obtener estado anterior para GRD ID {grd_id} y {timestamp}: {e}")
-                return None
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT conectado FROM historicos
+                WHERE id_grd = ? AND timestamp < ?
+                ORDER BY timestamp DESC
+                LIMIT 1
+            """, (grd_id, timebox.to_epoch_ms(timestamp)))
+            result = cursor.fetchone()
+            if result:
+                return result['conectado']
+            # Sin filas previas en la DB: la historia anterior puede estar archivada.
+            return archivo_historico.last_historico_before(grd_id, timebox.to_epoch_ms(timestamp))
+        except sqlite3.Error as e:
+            print(f"Error al obtener estado anterior para GRD ID {grd_id} y {timestamp}: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_weekly_data_for_grd(self, grd_id: int, reference_date_str: str, page_number: int = 0) -> pd.DataFrame:
         """
@@ -193,30 +270,30 @@ class HistoricosDAO:
         """
         conn = None
         df = pd.DataFrame()
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                
-                reference_date = datetime.strptime(reference_date_str, '%Y-%m-%d')
+        try:
+            conn = get_db_reader()
                 
-                week_end_date = reference_date - timedelta(weeks=page_number)
-                week_start_date = week_end_date - timedelta(days=6)
-
-                query = f"""
-                    SELECT timestamp, id_grd, conectado
-                    FROM historicos
-                    WHERE id_grd = ? AND timestamp BETWEEN '{week_start_date.strftime('%Y-%m-%d 00:00:00')}' AND '{week_end_date.strftime('%Y-%m-%d 23:59:59')}'
-                    ORDER BY timestamp ASC;
-                """
+            reference_date = datetime.strptime(reference_date_str, '%Y-%m-%d')
                 
-                df = pd.read_sql_query(query, conn, params=(grd_id,))
-                if not df.empty:
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-            except sqlite3.Error as e:
-                print(f"Error al obtener datos semanales para GRD ID {grd_id}: {e}")
-            finally:
-                if conn:
-                    conn.close()
+            week_end_date = reference_date - timedelta(weeks=page_number)
+            week_start_date = week_end_date - timedelta(days=6)
+
+            query = """
+                SELECT timestamp, id_grd, conectado
+                FROM historicos
+                WHERE id_grd = ? AND timestamp >= ? AND timestamp < ?
+                ORDER BY timestamp ASC;
+            """
+
+            start_ms = timebox.to_epoch_ms(week_start_date)
+            end_ms = timebox.to_epoch_ms(week_end_date + timedelta(days=1))
+            df = pd.read_sql_query(query, conn, params=(grd_id, start_ms, end_ms))
+            df = self._with_archive(df, grd_id, start_ms, end_ms)
+        except sqlite3.Error as e:
+            print(f"Error al obtener datos semanales para GRD ID {grd_id}: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return df
 
     def get_monthly_data_for_grd(self, grd_id: int, reference_date_str: str, page_number: int = 0) -> pd.DataFrame:
@@ -226,137 +303,140 @@ class HistoricosDAO:
         """
         conn = None
         df = pd.DataFrame()
-        with db_lock:
-            try:
-                conn = get_db_connection()
+        try:
+            conn = get_db_reader()
                 
-                current_dashboard_date = datetime.strptime(reference_date_str, '%Y-%m-%d')
+            current_dashboard_date = datetime.strptime(reference_date_str, '%Y-%m-%d')
                 
-                first_day_of_current_month = current_dashboard_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            first_day_of_current_month = current_dashboard_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
                 
-                target_month_first_day = first_day_of_current_month - relativedelta(months=page_number)
+            target_month_first_day = first_day_of_current_month - relativedelta(months=page_number)
                 
-                target_month_last_day = target_month_first_day + relativedelta(months=1) - timedelta(microseconds=1)
+            target_month_last_day = target_month_first_day + relativedelta(months=1) - timedelta(microseconds=1)
 
-                if page_number == 0:
-                    month_end_datetime_for_query = timebox.utc_now()
-                else:
-                    month_end_datetime_for_query = target_month_last_day 
-                
-                month_start_datetime_for_query = target_month_first_day 
-
-                query = f"""
-                    SELECT timestamp, id_grd, conectado
-                    FROM historicos
-                    WHERE id_grd = ? AND timestamp BETWEEN '{month_start_datetime_for_query.strftime('%Y-%m-%d %H:%M:%S')}' AND '{month_end_datetime_for_query.strftime('%Y-%m-%d %H:%M:%S')}'
-                    ORDER BY timestamp ASC;
-                """
+            if page_number == 0:
+                month_end_datetime_for_query = timebox.utc_now()
+            else:
+                month_end_datetime_for_query = target_month_last_day 
                 
-                df = pd.read_sql_query(query, conn, params=(grd_id,))
-                if not df.empty:
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-            except sqlite3.Error as e:
-                print(f"Error al obtener datos mensuales para GRD ID {grd_id}: {e}")
-            finally:
-                if conn:
-                    conn.close()
+            month_start_datetime_for_query = target_month_first_day 
+
+            query = """
+                SELECT timestamp, id_grd, conectado
+                FROM historicos
+                WHERE id_grd = ? AND timestamp BETWEEN ? AND ?
+                ORDER BY timestamp ASC;
+            """
+
+            start_ms = timebox.to_epoch_ms(month_start_datetime_for_query)
+            end_ms = timebox.to_epoch_ms(month_end_datetime_for_query)
+            df = pd.read_sql_query(query, conn, params=(grd_id, start_ms, end_ms))
+            df = self._with_archive(df, grd_id, start_ms, end_ms + 1)
+        except sqlite3.Error as e:
+            print(f"Error al obtener datos mensuales para GRD ID {grd_id}: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return df
 
     def get_all_data_for_grd(self, grd_id: int) -> pd.DataFrame:
         """
-        Obtiene todos los datos historicos de 'conectado' para un GRD_ID especifico.
+        Obtiene todos los datos historicos de 'conectado' para un GRD_ID especifico,
+        incluidos los que la retencion movio al archivo frio.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                query = f"""
-                    SELECT timestamp, id_grd, conectado
-                    FROM historicos
-                    WHERE id_grd = ?
-                    ORDER BY timestamp ASC;
-                """
-                df = pd.read_sql_query(query, conn, params=(grd_id,))
-                if not df.empty:
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-            except sqlite3.Error as e:
-                print(f"Error al obtener todos los datos para GRD ID {grd_id}: {e}")
-            finally:
-                if conn:
-                    conn.close()
+        df = pd.DataFrame()
+        try:
+            conn = get_db_reader()
+            query = f"""
+                SELECT timestamp, id_grd, conectado
+                FROM historicos
+                WHERE id_grd = ?
+                ORDER BY timestamp ASC;
+            """
+            df = pd.read_sql_query(query, conn, params=(grd_id,))
+            df = self._with_archive(df, grd_id)
+        except sqlite3.Error as e:
+            print(f"Error al obtener todos los datos para GRD ID {grd_id}: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return df
 
+    def get_first_timestamp_for_grd(self, grd_id: int) -> int | None:
+        """Timestamp (epoch ms) de la primera lectura de un GRD, incluido el archivo frio."""
+        conn = None
+        try:
+            conn = get_db_reader()
+            return self._oldest_timestamp(conn.cursor(), grd_id)
+        except sqlite3.Error as e:
+            print(f"Error al obtener la primera lectura para GRD ID {grd_id}: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
+
     def get_total_weeks_for_grd(self, grd_id: int, reference_date_str: str) -> int:
         """
         Calcula el numero total de semanas de datos historicos disponibles para un GRD_ID especifico.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT MIN(timestamp) FROM historicos
-                    WHERE id_grd = ?
-                """, (grd_id,))
-                min_ts_str = cursor.fetchone()['MIN(timestamp)'] # Acceder por nombre de columna
-                
-                if not min_ts_str:
-                    return 0
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            min_ts_ms = self._oldest_timestamp(cursor, grd_id)
+
+            if min_ts_ms is None:
+                return 0
 
-                min_ts = datetime.strptime(min_ts_str, '%Y-%m-%d %H:%M:%S')
-                current_time = timebox.utc_now() 
+            min_ts = timebox.from_epoch_ms(min_ts_ms)
+            current_time = timebox.utc_now() 
 
-                if current_time.date() < min_ts.date(): 
-                    return 0 # Si el primer registro es futuro, no hay semanas "historicas"
+            if current_time.date() < min_ts.date(): 
+                return 0 # Si el primer registro es futuro, no hay semanas "historicas"
 
-                total_days = (current_time.date() - min_ts.date()).days
-                total_weeks = (total_days // 7) + 1 
+            total_days = (current_time.date() - min_ts.date()).days
+            total_weeks = (total_days // 7) + 1 
                 
-                return max(1, total_weeks) # Siempre al menos 1 si hay datos
-            except sqlite3.Error as e:
-                print(f"Error al calcular el total de semanas: {e}")
-                return 0
-            finally:
-                if conn:
-                    conn.close()
+            return max(1, total_weeks) # Siempre al menos 1 si hay datos
+        except sqlite3.Error as e:
+            print(f"Error al calcular el total de semanas: {e}")
+            return 0
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_total_months_for_grd(self, grd_id: int, reference_date_str: str) -> int:
         """
         Calcula el numero total de meses de datos historicos disponibles para un GRD_ID especifico.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT MIN(timestamp) FROM historicos
-                    WHERE id_grd = ?
-                """, (grd_id,))
-                min_ts_str = cursor.fetchone()['MIN(timestamp)'] # Acceder por nombre de columna
-                
-                if not min_ts_str:
-                    return 0
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            min_ts_ms = self._oldest_timestamp(cursor, grd_id)
 
-                min_ts = datetime.strptime(min_ts_str, '%Y-%m-%d %H:%M:%S')
+            if min_ts_ms is None:
+                return 0
+
+            min_ts = timebox.from_epoch_ms(min_ts_ms).replace(tzinfo=None)
                 
-                current_date_for_total = timebox.utc_now().replace(tzinfo=None) 
+            current_date_for_total = timebox.utc_now().replace(tzinfo=None) 
 
-                if min_ts > current_date_for_total:
-                    return 0 
+            if min_ts > current_date_for_total:
+                return 0 
 
-                diff = relativedelta(current_date_for_total, min_ts)
+            diff = relativedelta(current_date_for_total, min_ts)
                 
-                total_months = diff.years * 12 + diff.months + 1 
+            total_months = diff.years * 12 + diff.months + 1 
                 
-                return total_months
-            except sqlite3.Error as e:
-                print(f"Error al calcular el total de meses: {e}")
-                return 0
-            finally:
-                if conn:
-                    conn.close()
+            return total_months
+        except sqlite3.Error as e:
+            print(f"Error al calcular el total de meses: {e}")
+            return 0
+        finally:
+            if conn:
+                release_db_connection(conn)
 
 # Instancia de la clase para usar sus metodos
 historicos_dao = HistoricosDAO()
@@ -1,5 +1,5 @@
 import sqlite3
-from .dao_base import get_db_connection, db_lock # Importa las funciones y variables de dao_base
+from .dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection # Importa las funciones y variables de dao_base
 
 class RelesDAO:
     """
@@ -36,44 +36,42 @@ class RelesDAO:
                 print(f"ERROR al insertar rele en la base de datos: {e}")
             finally:
                 if conn:
-                    conn.close()
+                    release_db_connection(conn)
 
     def get_rele_description(self, id_modbus: int) -> str | None:
         """
         Obtiene la descripcion de un rele por su id_modbus.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT descripcion FROM reles WHERE id_modbus = ?", (id_modbus,))
-                result = cursor.fetchone()
-                return result['descripcion'] if result else None # Acceso por nombre de columna
-            except sqlite3.Error as e:
-                print(f"ERROR al obtener descripcion de rele: {e}")
-                return None
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT descripcion FROM reles WHERE id_modbus = ?", (id_modbus,))
+            result = cursor.fetchone()
+            return result['descripcion'] if result else None # Acceso por nombre de columna
+        except sqlite3.Error as e:
+            print(f"ERROR al obtener descripcion de rele: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def rele_exists(self, id_modbus: int) -> bool:
         """
         Verifica si un rele con el id_modbus dado ya existe en la base de datos.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1 FROM reles WHERE id_modbus = ?", (id_modbus,))
-                return cursor.fetchone() is not None
-            except sqlite3.Error as e:
-                print(f"ERROR al verificar existencia de rele: {e}")
-                return False
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM reles WHERE id_modbus = ?", (id_modbus,))
+            return cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"ERROR al verificar existencia de rele: {e}")
+            return False
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_internal_id_by_modbus_id(self, id_modbus: int) -> int | None:
         """
@@ -81,19 +79,18 @@ class RelesDAO:
         Esto es necesario para insertar en tablas que referencian 'reles.id'.
         """
         conn = None
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM reles WHERE id_modbus = ?", (id_modbus,))
-                result = cursor.fetchone()
-                return result['id'] if result else None # Acceso por nombre de columna
-            except sqlite3.Error as e:
-                print(f"ERROR al obtener ID interno del rele por id_modbus: {e}")
-                return None
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM reles WHERE id_modbus = ?", (id_modbus,))
+            result = cursor.fetchone()
+            return result['id'] if result else None # Acceso por nombre de columna
+        except sqlite3.Error as e:
+            print(f"ERROR al obtener ID interno del rele por id_modbus: {e}")
+            return None
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     def get_all_reles_with_descriptions(self) -> dict:
         """
@@ -103,19 +100,18 @@ class RelesDAO:
         """
         conn = None
         reles_data = {}
-        with db_lock:
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT id_modbus, descripcion FROM reles WHERE descripcion <> 'NO APLICA' ORDER BY id_modbus ASC;")
-                rows = cursor.fetchall()
-                for row in rows:
-                    reles_data[row['id_modbus']] = row['descripcion']
-            except sqlite3.Error as e:
-                print(f"Error al obtener todos los reles con descripciones: {e}")
-            finally:
-                if conn:
-                    conn.close()
+        try:
+            conn = get_db_reader()
+            cursor = conn.cursor()
+            cursor.execute("SELECT id_modbus, descripcion FROM reles WHERE descripcion <> 'NO APLICA' ORDER BY id_modbus ASC;")
+            rows = cursor.fetchall()
+            for row in rows:
+                reles_data[row['id_modbus']] = row['descripcion']
+        except sqlite3.Error as e:
+            print(f"Error al obtener todos los reles con descripciones: {e}")
+        finally:
+            if conn:
+                release_db_connection(conn)
         return reles_data
 
 # Instancia global del DAO para reles
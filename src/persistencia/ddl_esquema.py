@@ -1,6 +1,7 @@
 import os
 import sqlite3
-from .dao.dao_base import db_lock, get_db_connection, DATABASE_DIR, DATABASE_FILE
+from .dao.dao_base import db_lock, get_db_connection, release_db_connection, DATABASE_DIR, DATABASE_FILE
+from .migraciones import apply_migrations
 
 def create_database_schema():
     """
@@ -10,6 +11,9 @@ def create_database_schema():
     - mensajes_enviados
     - reles
     - fallas_reles
+    y luego aplica las migraciones versionadas pendientes (indices, cambios de esquema).
+    Las tablas se crean con el esquema base; los tipos vigentes (ej. timestamps
+    INTEGER en epoch ms UTC) los define migraciones.py.
     Usa el mismo RLock (db_lock) y get_db_connection() de dao_base.
     """
     if not os.path.exists(DATABASE_DIR):
@@ -85,9 +89,11 @@ def create_database_schema():
             print("Tabla 'fallas_reles' asegurada.")
 
             conn.commit()
-            print(f"Esquema de base de datos en {DATABASE_FILE} creado/asegurado.")
+
+            version = apply_migrations(conn)
+            print(f"Esquema de base de datos en {DATABASE_FILE} creado/asegurado (version {version}).")
         except sqlite3.Error as e:
             print(f"Error al configurar el esquema de la base de datos: {e}")
         finally:
             if conn:
-                conn.close()
+                release_db_connection(conn)
@@ -0,0 +1,226 @@
+import sqlite3
+from typing import Callable
+
+# Migraciones del esquema, versionadas con PRAGMA user_version.
+# Cada una corre en su propia transaccion junto con el cambio de version, de
+# modo que una migracion fallida no deja el esquema a medias. Solo se agregan
+# al final: una version aplicada no se modifica.
+MIGRACIONES: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = []
+
+
+def _migracion(version: int, descripcion: str):
+    def register(fn: Callable[[sqlite3.Connection], None]):
+        MIGRACIONES.append((version, descripcion, fn))
+        return fn
+    return register
+
+
+@_migracion(1, "indices por equipo en historicos y fallas_reles")
+def _indices_por_equipo(conn: sqlite3.Connection) -> None:
+    # La PK de historicos es (timestamp, id_grd): las consultas por GRD no pueden
+    # buscar por ella. El indice incluye 'conectado' para resolverlas sin ir a la tabla.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_historicos_grd_ts
+        ON historicos (id_grd, timestamp, conectado)
+    """)
+    # falla_exists / get_latest_falla_for_rele filtran por rele y ordenan por numero_falla.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fallas_reles_rele_numero
+        ON fallas_reles (id_rele, numero_falla, timestamp)
+    """)
+
+
+@_migracion(2, "tabla grd_estado_actual con el estado vigente de cada GRD")
+def _estado_actual(conn: sqlite3.Connection) -> None:
+    # Una fila por GRD: ultimo valor de 'conectado', desde cuando lo tiene y
+    # timestamp de la ultima lectura persistida. Se mantiene en cada insert de historicos.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS grd_estado_actual (
+            id_grd INTEGER PRIMARY KEY,
+            conectado INTEGER,
+            desde TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (id_grd) REFERENCES grd(id)
+        )
+    """)
+    _cargar_estado_actual(conn, "INSERT OR REPLACE", "''")
+
+
+def _cargar_estado_actual(conn: sqlite3.Connection, insert: str, menor_timestamp: str) -> None:
+    """
+    Carga grd_estado_actual desde historicos: 'desde' es la primera lectura posterior
+    al ultimo cambio de estado (usa idx_historicos_grd_ts de la migracion 1).
+    menor_timestamp es un literal menor a cualquier timestamp de la tabla ('' mientras
+    son texto, -1 como epoch ms).
+    """
+    conn.execute(f"""
+        {insert} INTO grd_estado_actual (id_grd, conectado, desde, timestamp)
+        SELECT
+            h.id_grd,
+            h.conectado,
+            COALESCE((
+                SELECT MIN(h2.timestamp) FROM historicos h2
+                WHERE h2.id_grd = h.id_grd
+                  AND h2.timestamp > COALESCE((
+                      SELECT MAX(h3.timestamp) FROM historicos h3
+                      WHERE h3.id_grd = h.id_grd AND h3.conectado IS NOT h.conectado
+                  ), {menor_timestamp})
+            ), h.timestamp),
+            h.timestamp
+        FROM historicos h
+        INNER JOIN (
+            SELECT id_grd, MAX(timestamp) AS max_timestamp
+            FROM historicos
+            GROUP BY id_grd
+        ) AS latest ON h.id_grd = latest.id_grd AND h.timestamp = latest.max_timestamp
+    """)
+
+
+# Texto de fecha (ISO / '%Y-%m-%d %H:%M:%S', naive = UTC) a epoch ms; NULL si no se puede interpretar.
+def _epoch_ms_sql(column: str) -> str:
+    return f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+_ESTADO_ACTUAL_EPOCH_MS = """
+    CREATE TABLE IF NOT EXISTS grd_estado_actual (
+        id_grd INTEGER PRIMARY KEY,
+        conectado INTEGER,
+        desde INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL,
+        FOREIGN KEY (id_grd) REFERENCES grd(id)
+    )
+"""
+
+
+def _rebuild(conn: sqlite3.Connection, table: str, create_sql: str, columns: str, select_sql: str) -> None:
+    """Recrea una tabla con otro esquema copiando sus filas (no hay FKs que apunten a estas tablas)."""
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.execute(create_sql.format(table=f"{table}_nueva"))
+    copied = conn.execute(f"INSERT OR IGNORE INTO {table}_nueva ({columns}) {select_sql}").rowcount
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_nueva RENAME TO {table}")
+    if copied != total:
+        print(f"Migracion de '{table}': {total - copied} filas descartadas por timestamp invalido o duplicado.")
+
+
+@_migracion(3, "timestamps de historicos, fallas_reles y grd_estado_actual como epoch ms UTC")
+def _timestamps_epoch_ms(conn: sqlite3.Connection) -> None:
+    _rebuild(conn, "historicos", """
+        CREATE TABLE {table} (
+            timestamp INTEGER NOT NULL,
+            id_grd INTEGER NOT NULL,
+            conectado INTEGER,
+            PRIMARY KEY (timestamp, id_grd),
+            FOREIGN KEY (id_grd) REFERENCES grd(id)
+        )
+    """, "timestamp, id_grd, conectado", f"""
+        SELECT {_epoch_ms_sql('timestamp')} AS ts, id_grd, conectado
+        FROM historicos WHERE ts IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_historicos_grd_ts
+        ON historicos (id_grd, timestamp, conectado)
+    """)
+
+    _rebuild(conn, "fallas_reles", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_rele INTEGER NOT NULL,
+            numero_falla INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            fasea_corr INTEGER,
+            faseb_corr INTEGER,
+            fasec_corr INTEGER,
+            tierra_corr INTEGER,
+            FOREIGN KEY (id_rele) REFERENCES reles(id)
+        )
+    """, "id, id_rele, numero_falla, timestamp, fasea_corr, faseb_corr, fasec_corr, tierra_corr", f"""
+        SELECT id, id_rele, numero_falla, {_epoch_ms_sql('timestamp')} AS ts,
+               fasea_corr, faseb_corr, fasec_corr, tierra_corr
+        FROM fallas_reles WHERE ts IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fallas_reles_rele_numero
+        ON fallas_reles (id_rele, numero_falla, timestamp)
+    """)
+
+    # El estado vigente se recalcula desde 'historicos' ya migrado en lugar de copiar
+    # sus filas: una fila con fecha invalida no deja a un GRD sin estado.
+    conn.execute("DROP TABLE IF EXISTS grd_estado_actual")
+    conn.execute(_ESTADO_ACTUAL_EPOCH_MS)
+    _cargar_estado_actual(conn, "INSERT", "-1")
+
+
+@_migracion(4, "trigger que mantiene grd_estado_actual en cada insert de historicos")
+def _trigger_estado_actual(conn: sqlite3.Connection) -> None:
+    # Corre en la misma transaccion que el insert y solo para filas realmente
+    # insertadas (un INSERT OR IGNORE descartado no lo dispara), asi los inserts
+    # por lote quedan cubiertos. Solo avanza con lecturas no anteriores a la
+    # registrada y conserva 'desde' mientras el estado no cambie.
+    # Si una migracion futura recrea 'historicos', debe recrear este trigger.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_historicos_estado_actual
+        AFTER INSERT ON historicos
+        BEGIN
+            INSERT INTO grd_estado_actual (id_grd, conectado, desde, timestamp)
+            VALUES (NEW.id_grd, NEW.conectado, NEW.timestamp, NEW.timestamp)
+            ON CONFLICT(id_grd) DO UPDATE SET
+                conectado = excluded.conectado,
+                desde = CASE WHEN excluded.conectado IS grd_estado_actual.conectado
+                             THEN grd_estado_actual.desde ELSE excluded.desde END,
+                timestamp = excluded.timestamp
+            WHERE excluded.timestamp >= grd_estado_actual.timestamp;
+        END
+    """)
+
+
+
+@_migracion(5, "rollups de disponibilidad por hora y por dia")
+def _disponibilidad(conn: sqlite3.Connection) -> None:
+    # Milisegundos conectado / observado por GRD y bucket UTC (inicio en epoch ms).
+    # Los mantiene HistoricosDAO en cada insert; los datos previos se cargan con
+    # modbus_disponibilidad.py (backfill).
+    for table, column in (("disponibilidad_hora", "hora"), ("disponibilidad_dia", "dia")):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id_grd INTEGER NOT NULL,
+                {column} INTEGER NOT NULL,
+                conectado_ms INTEGER NOT NULL,
+                observado_ms INTEGER NOT NULL,
+                PRIMARY KEY (id_grd, {column})
+            ) WITHOUT ROWID
+        """)
+
+
+@_migracion(6, "estado vigente de los GRDs que la migracion 3 dejo sin fila")
+def _estado_actual_faltante(conn: sqlite3.Connection) -> None:
+    # Bases migradas antes de que la migracion 3 recalculara grd_estado_actual: completa
+    # los GRDs con historia y sin estado, sin tocar las filas existentes.
+    _cargar_estado_actual(conn, "INSERT OR IGNORE", "-1")
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Aplica en orden las migraciones con version mayor a la de la base.
+    Debe llamarse con db_lock tomado y sin transaccion abierta.
+    Retorna la version final del esquema.
+    """
+    current = schema_version(conn)
+    for version, descripcion, fn in sorted(MIGRACIONES, key=lambda item: item[0]):
+        if version <= current:
+            continue
+        conn.execute("BEGIN")
+        try:
+            fn(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Migracion {version} aplicada: {descripcion}.")
+        current = version
+    return current
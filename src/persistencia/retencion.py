@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+
+from src.persistencia.archivo import TABLAS, ArchivoHistorico, archivo_historico, month_bounds, month_key
+from src.persistencia.dao.dao_base import get_db_connection, get_db_reader, db_lock, release_db_connection
+from src.utils import timebox
+
+DIA_MS = 86_400_000
+
+# Filas que quedan en la DB aunque superen el horizonte:
+#  - historicos: la ultima lectura de cada GRD antes del corte, que da el estado vigente al
+#    inicio de la ventana caliente (rollups de disponibilidad, estado anterior a un timestamp).
+#  - fallas_reles: la ultima falla de cada rele, con la que falla_exists evita reinsertar la
+#    falla que el rele sigue reportando.
+_ANCLAS = {
+    "historicos": """
+        SELECT h.timestamp, h.id_grd FROM historicos h
+        INNER JOIN (
+            SELECT id_grd, MAX(timestamp) AS max_timestamp
+            FROM historicos WHERE timestamp < ?
+            GROUP BY id_grd
+        ) AS a ON h.id_grd = a.id_grd AND h.timestamp = a.max_timestamp
+    """,
+    "fallas_reles": """
+        SELECT f.id FROM fallas_reles f
+        WHERE f.timestamp < ? AND f.id = (
+            SELECT f2.id FROM fallas_reles f2
+            WHERE f2.id_rele = f.id_rele
+            ORDER BY f2.numero_falla DESC, f2.timestamp DESC
+            LIMIT 1
+        )
+    """,
+}
+# Borrado por clave primaria de las filas ya archivadas.
+_BORRADO = {
+    "historicos": ("DELETE FROM historicos WHERE timestamp = ? AND id_grd = ?", ("timestamp", "id_grd")),
+    "fallas_reles": ("DELETE FROM fallas_reles WHERE id = ?", ("id",)),
+}
+
+
+def _read_rows(table: str, start_ms: int, end_ms: int) -> list[tuple]:
+    conn = None
+    try:
+        conn = get_db_reader()
+        return [tuple(row) for row in conn.execute(
+            f"SELECT {', '.join(TABLAS[table])} FROM {table} WHERE timestamp >= ? AND timestamp < ?",
+            (start_ms, end_ms)
+        )]
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+
+def _archive_table(
+    table: str, cutoff_ms: int, archive: ArchivoHistorico, stop: threading.Event | None = None
+) -> tuple[int, int]:
+    """
+    Archiva y borra las filas de 'table' anteriores a cutoff_ms, un mes por vez.
+    Las filas se leen sin el lock (WAL) y el archivo del mes se escribe antes de
+    borrarlas: si el proceso se corta en el medio quedan en ambos lados y la
+    proxima corrida las vuelve a archivar sin duplicarlas. Con stop activado se
+    corta entre un mes y el siguiente.
+    Retorna (filas archivadas, filas borradas de la DB).
+    """
+    conn = None
+    try:
+        conn = get_db_reader()
+        oldest = conn.execute(f"SELECT MIN(timestamp) FROM {table} WHERE timestamp < ?", (cutoff_ms,)).fetchone()[0]
+        anchors = {tuple(row) for row in conn.execute(_ANCLAS[table], (cutoff_ms,))}
+    finally:
+        if conn:
+            release_db_connection(conn)
+    if oldest is None:
+        return 0, 0
+
+    names = TABLAS[table]
+    delete_sql, key_columns = _BORRADO[table]
+    key_indexes = [names.index(column) for column in key_columns]
+    archived = deleted = 0
+    month = month_key(oldest)
+    while True:
+        month_start, month_end = month_bounds(month)
+        if month_start >= cutoff_ms or (stop is not None and stop.is_set()):
+            break
+        rows = _read_rows(table, month_start, min(month_end, cutoff_ms))
+        if rows:
+            archived += archive.append(table, rows)
+            keys = [tuple(row[index] for index in key_indexes) for row in rows]
+            keys = [key for key in keys if key not in anchors]
+            conn = None
+            with db_lock:
+                try:
+                    conn = get_db_connection()
+                    cursor = conn.cursor()
+                    cursor.executemany(delete_sql, keys)
+                    conn.commit()
+                    deleted += cursor.rowcount
+                finally:
+                    if conn:
+                        release_db_connection(conn)
+        month = month_key(month_end)
+    return archived, deleted
+
+
+def archive_older_than(
+    days: int, archive: ArchivoHistorico = archivo_historico, stop: threading.Event | None = None
+) -> dict[str, tuple[int, int]]:
+    """
+    Mueve al archivo frio las filas de 'historicos' y 'fallas_reles' anteriores al
+    comienzo (UTC) del dia de hace 'days' dias. Los rollups de disponibilidad y
+    'grd_estado_actual' no se tocan. stop permite cortar la pasada entre meses.
+    Retorna {tabla: (filas archivadas, filas borradas)}.
+    """
+    now_ms = timebox.utc_now_ms()
+    cutoff_ms = now_ms - days * DIA_MS
+    cutoff_ms -= cutoff_ms % DIA_MS
+    result = {}
+    for table in TABLAS:
+        try:
+            result[table] = _archive_table(table, cutoff_ms, archive, stop)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error al archivar '{table}' anterior a {timebox.iso_from_epoch_ms(cutoff_ms)}: {e}")
+            result[table] = (0, 0)
+    return result
+
+
+def vacuum() -> None:
+    """Compacta el archivo de la DB tras borrar filas (bloquea las escrituras mientras corre)."""
+    conn = None
+    with db_lock:
+        try:
+            conn = get_db_connection()
+            conn.execute("VACUUM")
+        finally:
+            if conn:
+                release_db_connection(conn)
@@ -0,0 +1,98 @@
+import threading
+from typing import Callable, Iterable, Mapping
+
+import numpy as np
+
+
+class ConnectivityStateCache:
+    """
+    Estado de conexion vigente de cada GRD, en memoria e indexado por grd_id.
+    Se carga una vez desde la DB y se actualiza con cada insercion en 'historicos',
+    de modo que la deteccion de cambios del poller es un XOR vectorizado contra
+    el estado previo, sin lecturas a la DB en el camino caliente.
+    """
+
+    def __init__(self, capacity: int = 32):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._state = np.zeros(capacity, dtype=np.uint8)
+        self._known = np.zeros(capacity, dtype=bool)
+        self._loaded = False
+
+    def _ensure_capacity(self, max_id: int) -> None:
+        if max_id < len(self._state):
+            return
+        size = max(max_id + 1, 2 * len(self._state))
+        state = np.zeros(size, dtype=np.uint8)
+        known = np.zeros(size, dtype=bool)
+        state[:len(self._state)] = self._state
+        known[:len(self._known)] = self._known
+        self._state, self._known = state, known
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, states: Mapping[int, int]) -> None:
+        """Reemplaza el estado con {grd_id: conectado} tomado de la DB."""
+        with self._lock:
+            self._state[:] = 0
+            self._known[:] = False
+            if states:
+                self._ensure_capacity(max(states))
+                ids = np.fromiter(states.keys(), dtype=np.intp, count=len(states))
+                self._state[ids] = np.fromiter(states.values(), dtype=np.uint8, count=len(states))
+                self._known[ids] = True
+            self._loaded = True
+
+    def ensure_loaded(self, loader: Callable[[], Mapping[int, int]]) -> None:
+        """Carga el estado con loader() una unica vez, aunque lo pidan varios hilos."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self.load(loader())
+
+    def get(self, grd_id: int) -> int | None:
+        with self._lock:
+            if grd_id >= len(self._state) or not self._known[grd_id]:
+                return None
+            return int(self._state[grd_id])
+
+    def changed(self, states: Mapping[int, int]) -> list[int]:
+        """
+        Retorna los grd_id cuyo valor en states difiere del vigente (o que aun no
+        tienen estado conocido), en el orden de states.
+        """
+        if not states:
+            return []
+        ids = np.fromiter(states.keys(), dtype=np.intp, count=len(states))
+        values = np.fromiter(states.values(), dtype=np.uint8, count=len(states))
+        with self._lock:
+            self._ensure_capacity(int(ids.max()))
+            mask = (self._state[ids] ^ values).astype(bool) | ~self._known[ids]
+        return ids[mask].tolist()
+
+    def update(self, grd_id: int, value: int) -> None:
+        with self._lock:
+            self._ensure_capacity(grd_id)
+            self._state[grd_id] = value
+            self._known[grd_id] = True
+
+    def forget(self, grd_ids: Iterable[int]) -> None:
+        """
+        Vuelve desconocido el estado de los GRDs (p.ej. si su cambio no se pudo
+        persistir): el proximo ciclo los toma como cambiados y los persiste.
+        """
+        with self._lock:
+            for grd_id in grd_ids:
+                if grd_id < len(self._known):
+                    self._known[grd_id] = False
+
+    def snapshot(self, grd_ids: Iterable[int] | None = None) -> dict[int, int]:
+        """Estados conocidos como {grd_id: conectado}, opcionalmente filtrados."""
+        with self._lock:
+            known = np.flatnonzero(self._known)
+            result = {int(grd_id): int(self._state[grd_id]) for grd_id in known}
+        if grd_ids is None:
+            return result
+        return {grd_id: result[grd_id] for grd_id in grd_ids if grd_id in result}
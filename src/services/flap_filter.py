@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Mapping
+
+
+class _Candidate:
+    __slots__ = ("value", "timestamp", "first_seen", "reads")
+
+    def __init__(self, value: int, timestamp: int, first_seen: float):
+        self.value = value
+        self.timestamp = timestamp
+        self.first_seen = first_seen
+        self.reads = 1
+
+
+class FlapFilter:
+    """
+    Etapa de histeresis entre la lectura Modbus y la persistencia de 'historicos'.
+    Un cambio de estado de un GRD se confirma recien cuando se observa en
+    min_reads lecturas consecutivas y se mantiene al menos min_stable_seconds.
+    Si el GRD vuelve al estado confirmado antes, la transicion se descarta y se
+    cuenta como flap. Con los valores por defecto no filtra nada.
+    """
+
+    def __init__(
+        self,
+        min_reads: int = 1,
+        min_stable_seconds: float = 0.0,
+        history: int = 100,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_reads = max(1, int(min_reads))
+        self.min_stable_seconds = max(0.0, float(min_stable_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: dict[int, _Candidate] = {}
+        self._flaps: dict[int, int] = {}
+        self._suppressed: deque = deque(maxlen=history)
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_reads > 1 or self.min_stable_seconds > 0
+
+    def observe(
+        self,
+        readings: Mapping[int, int],
+        changed: Iterable[int],
+        timestamp: int,
+    ) -> dict[int, tuple[int, int]]:
+        """
+        Procesa las lecturas de un ciclo.
+
+        Args:
+            readings: {grd_id: valor leido} del ciclo.
+            changed: GRDs cuyo valor leido difiere del estado confirmado.
+            timestamp: Estampa del ciclo (epoch ms UTC).
+
+        Returns:
+            dict: {grd_id: (valor, timestamp de la primera lectura del cambio)} para
+            las transiciones confirmadas en este ciclo.
+        """
+        changed = set(changed)
+        if not self.enabled:
+            return {grd_id: (readings[grd_id], timestamp) for grd_id in changed}
+
+        now = self._clock()
+        confirmed: dict[int, tuple[int, int]] = {}
+        with self._lock:
+            for grd_id, value in readings.items():
+                candidate = self._pending.get(grd_id)
+                if grd_id not in changed:
+                    if candidate is not None:
+                        # Volvio al estado confirmado antes de estabilizarse.
+                        del self._pending[grd_id]
+                        self._flaps[grd_id] = self._flaps.get(grd_id, 0) + 1
+                        self._suppressed.append({
+                            "id_grd": grd_id,
+                            "valor": candidate.value,
+                            "desde": candidate.timestamp,
+                            "hasta": timestamp,
+                            "lecturas": candidate.reads,
+                        })
+                    continue
+
+                if candidate is None or candidate.value != value:
+                    candidate = self._pending[grd_id] = _Candidate(value, timestamp, now)
+                else:
+                    candidate.reads += 1
+
+                if candidate.reads >= self.min_reads and now - candidate.first_seen >= self.min_stable_seconds:
+                    del self._pending[grd_id]
+                    confirmed[grd_id] = (candidate.value, candidate.timestamp)
+        return confirmed
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "lecturas_minimas": self.min_reads,
+                "estable_s": self.min_stable_seconds,
+                "flaps": {str(grd_id): count for grd_id, count in sorted(self._flaps.items())},
+                "pendientes": {
+                    str(grd_id): {"valor": c.value, "desde": c.timestamp, "lecturas": c.reads}
+                    for grd_id, c in sorted(self._pending.items())
+                },
+                "suprimidas": list(self._suppressed),
+            }
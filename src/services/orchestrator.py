@@ -1,17 +1,63 @@
 import threading
+import time
+from dataclasses import dataclass
 
 from src import config
 from src.logger import Logosaurio
+from src.modbus.frame_recorder import FrameRecorder, RecordingDriver
+from src.modbus.gateway_catalog import GatewayCatalog, GatewayConfig, load_gateway_catalog
 from src.modbus.modbus_driver import ModbusTcpDriver
+from src.modbus.modbus_driver_async import AsyncModbusTcpDriver
+from src.modbus.register_map import load_grd_register_map
+from src.modbus.request_broker import PRIORIDAD_GRD, PRIORIDAD_RELE, ModbusRequestBroker
 from src.modbus.server_mb_middleware import GrdMiddlewareClient
 from src.modbus.server_mb_reles import ProtectionRelayClient
+from src.modbus.unit_health import UnitHealthRegistry
+from src.persistencia import retencion
+from src.persistencia.dao.dao_historicos import historicos_dao
+from src.services.connectivity_cache import ConnectivityStateCache
+from src.services.flap_filter import FlapFilter
 from src.services.mqtt_publisher import ModbusMqttPublisher
+from src.services.persistence_writer import PersistenceWriter
+from src.services.snapshot_publisher import GrdSnapshotPublisher
 from src.services.state_store import ObserverStateStore
+from src.utils import timebox
+
+
+def _with_iso(item: dict) -> dict:
+    """Copia de una entrada del filtro de flapping con sus estampas (epoch ms) en ISO."""
+    return {
+        key: timebox.iso_from_epoch_ms(value) if key in ("desde", "hasta") else value
+        for key, value in item.items()
+    }
+
+
+@dataclass
+class _GatewayRuntime:
+    """Conexion, broker y clientes de un gateway."""
+    gateway: GatewayConfig
+    health: UnitHealthRegistry
+    driver: ModbusTcpDriver | AsyncModbusTcpDriver | RecordingDriver
+    broker: ModbusRequestBroker
+    grd_client: GrdMiddlewareClient
+    relay_client: ProtectionRelayClient | None
+
+    def get_stats(self) -> dict:
+        return {
+            "host": f"{self.gateway.host}:{self.gateway.port}",
+            "broker": self.broker.get_stats(),
+            "units": self.health.get_stats(),
+            "grd": self.grd_client.get_stats(),
+            "reles": self.relay_client.get_stats() if self.relay_client else None,
+        }
 
 
 class ModbusOrchestrator:
     """
     Arranca y coordina los hilos de monitoreo de GRDs y relés.
+    Cada gateway del catalogo tiene su propia conexion, broker e hilos, de modo
+    que la latencia o la caida de uno no demora a los demas; el estado de
+    conectividad, los snapshots MQTT y la persistencia son compartidos.
     """
 
     def __init__(
@@ -24,35 +70,207 @@ class ModbusOrchestrator:
         self.mqtt_publisher = mqtt_publisher
         self.observer_store = observer_store
         self._threads: list[threading.Thread] = []
-        self._driver: ModbusTcpDriver | None = None
+        self._gateways: dict[str, _GatewayRuntime] = {}
+        self._stopping = threading.Event()
+        self._retention_thread: threading.Thread | None = None
+        # Persistencia de todos los gateways en un unico hilo escritor (write-behind).
+        self.writer = PersistenceWriter(
+            logger,
+            queue_size=config.DB_WRITE_QUEUE_SIZE,
+            batch_max=config.DB_WRITE_BATCH_MAX,
+            batch_seconds=config.DB_WRITE_BATCH_SECONDS,
+            put_timeout=config.DB_WRITE_QUEUE_TIMEOUT_SECONDS,
+        )
 
-    def start(self) -> None:
-        self.logger.log("Instanciando driver Modbus...", origen="MW/START")
-        self._driver = ModbusTcpDriver(
-            host=config.MB_HOST,
-            port=config.MB_PORT,
-            timeout=10,
+    def _build_driver(self, gateway: GatewayConfig, health: UnitHealthRegistry):
+        if config.MB_DRIVER == "async":
+            driver = AsyncModbusTcpDriver(
+                host=gateway.host,
+                port=gateway.port,
+                timeout=config.MB_TIMEOUT_SECONDS,
+                logger=self.logger,
+                max_in_flight=config.MB_MAX_IN_FLIGHT,
+                health=health,
+            )
+            return driver, config.MB_MAX_IN_FLIGHT
+        driver = ModbusTcpDriver(
+            host=gateway.host,
+            port=gateway.port,
+            timeout=config.MB_TIMEOUT_SECONDS,
             logger=self.logger,
+            health=health,
+        )
+        return driver, 1
+
+    def start(self) -> None:
+        catalog = load_gateway_catalog(
+            GatewayConfig(nombre="principal", host=config.MB_HOST, port=config.MB_PORT, unit_id=config.MB_ID),
+            config.GATEWAYS,
+        )
+        state_cache = ConnectivityStateCache()
+        # Estado vigente de cada GRD, leido una vez antes de arrancar los gateways.
+        state_cache.ensure_loaded(historicos_dao.get_latest_connected_state_by_grd)
+        snapshots = GrdSnapshotPublisher(self.mqtt_publisher, self.logger)
+        register_map = load_grd_register_map(config.MB_COUNT, config.GRD_REGISTER_MAP)
+        self.writer.start()
+
+        for gateway in catalog.gateways:
+            self._start_gateway(catalog, gateway, state_cache, snapshots, register_map)
+        if config.RETENTION_DAYS > 0:
+            self._retention_thread = threading.Thread(target=self._retention_loop, name="retencion", daemon=True)
+            self._retention_thread.start()
+            self._threads.append(self._retention_thread)
+        self.logger.log("Orquestador Modbus iniciado.", origen="MW/START")
+
+    def _retention_loop(self) -> None:
+        """Archiva periodicamente la historia mas vieja que config.RETENTION_DAYS."""
+        self.logger.log(
+            f"Retencion activa: {config.RETENTION_DAYS} dias en la DB, archivo en {config.ARCHIVE_DIR}.",
+            origen="MW/START"
         )
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                result = retencion.archive_older_than(config.RETENTION_DAYS, stop=self._stopping)
+            except Exception as e:
+                # p.ej. un .npz truncado en el archivo: se reintenta en la proxima pasada
+                self.logger.log(f"Error en la pasada de retencion: {e!r}", origen="MW/APP")
+                result = {}
+            for table, (archived, deleted) in result.items():
+                if archived or deleted:
+                    self.logger.log(
+                        f"Retencion '{table}': {archived} filas archivadas, {deleted} borradas de la DB "
+                        f"({time.monotonic() - started:.1f}s).",
+                        origen="MW/APP"
+                    )
+            self._stopping.wait(config.RETENTION_INTERVAL_SECONDS)
+
+    def stop(self) -> None:
+        """
+        Detiene los brokers (los hilos de sondeo dejan de recibir lecturas) y vacia
+        la cola de escritura antes de cerrar la DB. Lo que se encole despues se rechaza.
+        """
+        self._stopping.set()
+        for runtime in self._gateways.values():
+            runtime.broker.stop()
+        self.writer.stop(config.DB_WRITE_DRAIN_SECONDS)
+        # una pasada de retencion en curso termina el mes que esta moviendo antes de cerrar la DB
+        if self._retention_thread is not None:
+            self._retention_thread.join(timeout=config.DB_WRITE_DRAIN_SECONDS)
+            if self._retention_thread.is_alive():
+                self.logger.log("La pasada de retencion sigue en curso al apagar.", origen="MW/APP")
+
+    def _start_gateway(
+        self,
+        catalog: GatewayCatalog,
+        gateway: GatewayConfig,
+        state_cache: ConnectivityStateCache,
+        snapshots: GrdSnapshotPublisher,
+        register_map,
+    ) -> None:
+        self.logger.log(
+            f"Instanciando driver Modbus para gateway {gateway.nombre} ({gateway.host}:{gateway.port})...",
+            origen="MW/START"
+        )
+        # Unit IDs de distintos gateways son independientes: salud propia por gateway.
+        health = UnitHealthRegistry(
+            min_timeout=config.MB_TIMEOUT_MIN_SECONDS,
+            max_timeout=config.MB_TIMEOUT_SECONDS,
+            failure_threshold=config.MB_BREAKER_FAILURES,
+            backoff_base=config.MB_BREAKER_BACKOFF_SECONDS,
+            backoff_max=config.MB_BREAKER_BACKOFF_MAX_SECONDS,
+        )
+        driver, broker_workers = self._build_driver(gateway, health)
+        if config.CAPTURE_FILE:
+            capture_path = config.CAPTURE_FILE if gateway.nombre == "principal" else f"{config.CAPTURE_FILE}.{gateway.nombre}"
+            driver = RecordingDriver(
+                driver, FrameRecorder(capture_path, config.CAPTURE_MAX_BYTES, config.CAPTURE_BACKUPS)
+            )
+            self.logger.log(f"Capturando respuestas Modbus en {capture_path}", origen="MW/START")
+
+        # Un broker por gateway serializa el acceso a su driver y prioriza GRDs.
+        broker = ModbusRequestBroker(driver, self.logger, workers=broker_workers)
+        broker.start()
 
         grd_client = GrdMiddlewareClient(
-            modbus_driver=self._driver,
-            default_unit_id=config.MB_ID,
+            modbus_driver=broker.channel(PRIORIDAD_GRD),
+            default_unit_id=gateway.unit_id,
             register_count=config.MB_COUNT,
             refresh_interval=config.MB_INTERVAL_SECONDS,
             logger=self.logger,
             mqtt_publisher=self.mqtt_publisher,
+            intervals=config.GRD_INTERVALS,
+            jitter=config.POLL_JITTER,
+            state_cache=state_cache,
+            flap_filter=FlapFilter(config.DEBOUNCE_READS, config.DEBOUNCE_SECONDS),
+            register_map=register_map,
+            snapshots=snapshots,
+            grd_filter=lambda grd_id: catalog.owns_grd(gateway.nombre, grd_id),
+            block_base=gateway.grd_base,
+            gateway_name=gateway.nombre,
+            writer=self.writer,
         )
-        relay_client = ProtectionRelayClient(
-            modbus_driver=self._driver,
-            refresh_interval=config.MB_INTERVAL_SECONDS,
-            logger=self.logger,
-            observer_store=self.observer_store,
+        relay_client = None
+        if gateway.reles is None or gateway.reles:
+            relay_client = ProtectionRelayClient(
+                modbus_driver=broker.channel(PRIORIDAD_RELE),
+                refresh_interval=config.MB_INTERVAL_SECONDS,
+                logger=self.logger,
+                observer_store=self.observer_store,
+                intervals=config.RELE_INTERVALS,
+                jitter=config.POLL_JITTER,
+                full_scan_every=config.RELE_FULL_SCAN_EVERY,
+                fault_read_mode=config.RELE_FAULT_READ_MODE,
+                max_concurrency=config.RELE_MAX_CONCURRENCY,
+                relay_filter=lambda unit_id: catalog.owns_rele(gateway.nombre, unit_id),
+                gateway_name=gateway.nombre,
+                writer=self.writer,
+            )
+
+        suffix = "" if gateway.nombre == "principal" else f"-{gateway.nombre}"
+        threads = [threading.Thread(target=grd_client.start_observer_loop, name=f"grd-monitor{suffix}", daemon=True)]
+        if relay_client is not None:
+            threads.append(
+                threading.Thread(target=relay_client.start_monitoring_loop, name=f"rele-monitor{suffix}", daemon=True)
+            )
+        for thread in threads:
+            thread.start()
+        self._threads.extend(threads)
+        self._gateways[gateway.nombre] = _GatewayRuntime(
+            gateway=gateway,
+            health=health,
+            driver=driver,
+            broker=broker,
+            grd_client=grd_client,
+            relay_client=relay_client,
         )
 
-        grd_thread = threading.Thread(target=grd_client.start_observer_loop, name="grd-monitor", daemon=True)
-        rele_thread = threading.Thread(target=relay_client.start_monitoring_loop, name="rele-monitor", daemon=True)
-        grd_thread.start()
-        rele_thread.start()
-        self._threads.extend([grd_thread, rele_thread])
-        self.logger.log("Orquestador Modbus iniciado.", origen="MW/START")
+    def get_grd_telemetry(self) -> dict:
+        """Ultima telemetria decodificada de cada GRD, de todos los gateways."""
+        telemetry = {}
+        for runtime in self._gateways.values():
+            telemetry.update(runtime.grd_client.get_telemetry())
+        return dict(sorted(telemetry.items()))
+
+    def get_grd_flaps(self) -> dict:
+        """Estadisticas del filtro de flapping, combinadas entre gateways (los grd_id son globales)."""
+        merged = {
+            "lecturas_minimas": config.DEBOUNCE_READS,
+            "estable_s": config.DEBOUNCE_SECONDS,
+            "flaps": {},
+            "pendientes": {},
+            "suprimidas": [],
+        }
+        for runtime in self._gateways.values():
+            stats = runtime.grd_client.flap_filter.get_stats()
+            merged["flaps"].update(stats["flaps"])
+            merged["pendientes"].update({grd_id: _with_iso(item) for grd_id, item in stats["pendientes"].items()})
+            merged["suprimidas"].extend(_with_iso(item) for item in stats["suprimidas"])
+        return merged
+
+    def get_stats(self) -> dict:
+        """Metricas de runtime de los componentes Modbus, por gateway."""
+        return {
+            "gateways": {name: runtime.get_stats() for name, runtime in self._gateways.items()},
+            "escritor": self.writer.get_stats(),
+        }
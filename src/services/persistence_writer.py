@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+from src.logger import Logosaurio
+from src.persistencia.dao.dao_fallas_reles import fallas_reles_dao
+from src.persistencia.dao.dao_historicos import historicos_dao
+
+_HISTORICOS = "historicos"
+_FALLA = "falla"
+
+
+def store_falla(falla: dict) -> bool | None:
+    """
+    Persiste una falla de rele ({id_rele, numero_falla, timestamp, *_corr}) si no
+    existe ya. Retorna True si se inserto, False si ya existia y None si el insert fallo.
+    """
+    if fallas_reles_dao.falla_exists(falla["id_rele"], falla["numero_falla"], falla["timestamp"]):
+        return False
+    return True if fallas_reles_dao.insert_falla_rele(**falla) else None
+
+
+class PersistenceWriter:
+    """
+    Escritura diferida (write-behind) de la persistencia del sondeo.
+    Los hilos de GRDs y reles encolan comandos en una cola acotada y siguen
+    sondeando; un unico hilo escritor los toma en grupos y los persiste:
+    las lecturas de 'historicos' de todo el grupo van en una sola transaccion
+    (group commit). Con la cola llena, encolar espera hasta put_timeout segundos
+    (contrapresion) y luego rechaza el comando. Al detenerse se vacia la cola.
+    """
+
+    def __init__(
+        self,
+        logger: Logosaurio,
+        queue_size: int = 1000,
+        batch_max: int = 200,
+        batch_seconds: float = 0.05,
+        put_timeout: float = 5.0,
+    ):
+        self.logger = logger
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.batch_max = max(1, int(batch_max))
+        self.batch_seconds = max(0.0, float(batch_seconds))
+        self.put_timeout = max(0.0, float(put_timeout))
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "lotes": 0,
+            "comandos": 0,
+            "filas_historicos": 0,
+            "fallas": 0,
+            "errores": 0,
+            "rechazados": 0,
+            "cola_max": 0,
+            "escritura_ms_total": 0.0,
+            "escritura_ms_max": 0.0,
+            "espera_ms_max": 0.0,
+        }
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None or self._closing.is_set():
+                return
+            self._thread = threading.Thread(target=self._worker, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """
+        Deja de aceptar comandos y espera a que se persistan los encolados.
+        Retorna False si quedaron comandos sin escribir al vencer el timeout.
+        """
+        self._closing.set()
+        with self._start_lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        pending = self._queue.qsize()
+        if pending or (thread is not None and thread.is_alive()):
+            self.logger.log(f"Escritor de DB detenido con {pending} comandos sin persistir.", origen="MW/APP")
+            return False
+        self.logger.log("Escritor de DB detenido con la cola vacia.", origen="MW/APP")
+        return True
+
+    def submit_historicos(
+        self, rows: list[tuple[int, int, int]], on_done: Callable[[int | None], None] | None = None
+    ) -> bool:
+        """
+        Encola lecturas de 'historicos' [(grd_id, timestamp epoch ms, conectado)].
+        on_done se llama desde el hilo escritor con el resultado del insert (None si fallo).
+        Retorna False si el comando no se pudo encolar.
+        """
+        return self._submit(_HISTORICOS, rows, on_done)
+
+    def submit_falla(self, falla: dict, on_done: Callable[[bool | None], None] | None = None) -> bool:
+        """
+        Encola una falla de rele. on_done recibe el resultado de store_falla (None si fallo).
+        Retorna False si el comando no se pudo encolar.
+        """
+        return self._submit(_FALLA, falla, on_done)
+
+    def _submit(self, kind: str, payload, on_done) -> bool:
+        if self._closing.is_set():
+            self._reject(kind, "el escritor esta detenido")
+            return False
+        self.start()
+        try:
+            self._queue.put((kind, payload, on_done, time.monotonic()), timeout=self.put_timeout)
+        except queue.Full:
+            self._reject(kind, f"cola llena ({self._queue.maxsize}) tras {self.put_timeout}s")
+            return False
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["cola_max"] = max(self._stats["cola_max"], depth)
+        return True
+
+    def _reject(self, kind: str, reason: str) -> None:
+        with self._stats_lock:
+            self._stats["rechazados"] += 1
+        self.logger.log(f"Comando de persistencia '{kind}' rechazado: {reason}.", origen="MW/APP")
+
+    def _next_batch(self) -> list:
+        """Espera un comando y junta los que lleguen dentro de batch_seconds (hasta batch_max)."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_seconds
+        while len(batch) < self.batch_max:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._closing.is_set():
+                return
+
+    def _write(self, batch: list) -> None:
+        started = time.monotonic()
+        results = []
+        historicos = [command for command in batch if command[0] == _HISTORICOS]
+        if historicos:
+            inserted = historicos_dao.insert_historico_readings([row for command in historicos for row in command[1]])
+            if inserted is None and len(historicos) > 1:
+                # Un comando invalido hace fallar el grupo: se reintenta cada uno por separado.
+                results += [(command, historicos_dao.insert_historico_readings(command[1])) for command in historicos]
+            else:
+                results += [(command, inserted) for command in historicos]
+        for command in batch:
+            if command[0] == _FALLA:
+                try:
+                    results.append((command, store_falla(command[1])))
+                except Exception as e:
+                    self.logger.log(f"Error al persistir falla de rele {command[1].get('id_rele')}: {e}", origen="MW/APP")
+                    results.append((command, None))
+        finished = time.monotonic()
+
+        with self._stats_lock:
+            stats = self._stats
+            stats["lotes"] += 1
+            stats["comandos"] += len(batch)
+            stats["filas_historicos"] += sum(len(command[1]) for command in historicos)
+            stats["fallas"] += len(batch) - len(historicos)
+            stats["errores"] += sum(1 for _, result in results if result is None)
+            stats["escritura_ms_total"] += (finished - started) * 1000
+            stats["escritura_ms_max"] = max(stats["escritura_ms_max"], (finished - started) * 1000)
+            stats["espera_ms_max"] = max(stats["espera_ms_max"], (started - batch[0][3]) * 1000)
+
+        for (_, _, on_done, _), result in results:
+            if on_done is None:
+                continue
+            try:
+                on_done(result)
+            except Exception as e:
+                self.logger.log(f"Excepcion en callback de persistencia: {e}", origen="MW/APP")
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lotes = stats["lotes"] or 1
+        return {
+            "pendientes": self._queue.qsize(),
+            "capacidad": self._queue.maxsize,
+            "cola_max": stats["cola_max"],
+            "lotes": stats["lotes"],
+            "comandos": stats["comandos"],
+            "comandos_por_lote": round(stats["comandos"] / lotes, 2),
+            "filas_historicos": stats["filas_historicos"],
+            "fallas": stats["fallas"],
+            "errores": stats["errores"],
+            "rechazados": stats["rechazados"],
+            "escritura_ms_prom": round(stats["escritura_ms_total"] / lotes, 3),
+            "escritura_ms_max": round(stats["escritura_ms_max"], 3),
+            "espera_ms_max": round(stats["espera_ms_max"], 3),
+        }
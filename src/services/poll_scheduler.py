@@ -0,0 +1,126 @@
+import math
+import random
+import threading
+import time
+from typing import Callable, Hashable, Iterable, Mapping
+
+
+class DeadlineScheduler:
+    """
+    Planificador de sondeos a tasa fija sobre deadlines absolutos.
+    Cada clave (GRD, rele) tiene su propio intervalo; el deadline siguiente se
+    calcula desde el anterior y no desde el fin del ciclo, por lo que la duracion
+    del barrido no acumula deriva. El jitter desplaza cada disparo sin mover la
+    grilla base. Un ciclo que termina despues de su proximo deadline cuenta
+    como overrun y los periodos perdidos se saltean.
+    """
+
+    def __init__(
+        self,
+        default_interval: float,
+        intervals: Mapping[Hashable, float] | None = None,
+        jitter: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            default_interval: Periodo en segundos para claves sin intervalo propio.
+            intervals: Periodos particulares por clave.
+            jitter: Fraccion del periodo (0..0.5) usada como desplazamiento aleatorio.
+            clock: Reloj monotono (inyectable para pruebas y simulaciones).
+        """
+        self.default_interval = float(default_interval)
+        self.intervals = dict(intervals or {})
+        for key, interval in [("default", self.default_interval), *self.intervals.items()]:
+            if not interval > 0:
+                raise ValueError(f"Intervalo de sondeo invalido para {key}: {interval} (debe ser > 0)")
+        self.jitter = min(max(float(jitter), 0.0), 0.5)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._base: dict[Hashable, float] = {}
+        self._fire: dict[Hashable, float] = {}
+        self._runs: dict[Hashable, int] = {}
+        self._overruns: dict[Hashable, int] = {}
+
+    def interval_for(self, key: Hashable) -> float:
+        return float(self.intervals.get(key, self.default_interval))
+
+    def _jittered(self, key: Hashable, base: float) -> float:
+        if not self.jitter:
+            return base
+        spread = self.jitter * self.interval_for(key)
+        return base + random.uniform(-spread, spread)
+
+    def sync(self, keys: Iterable[Hashable]) -> None:
+        """Alinea las claves planificadas con las activas; las nuevas arrancan ya."""
+        now = self._clock()
+        wanted = set(keys)
+        with self._lock:
+            for key in list(self._base):
+                if key not in wanted:
+                    del self._base[key]
+                    del self._fire[key]
+            for key in wanted:
+                if key not in self._base:
+                    self._base[key] = now
+                    # Primer disparo repartido dentro del margen de jitter.
+                    self._fire[key] = now + random.uniform(0, self.jitter * self.interval_for(key))
+                    self._runs.setdefault(key, 0)
+                    self._overruns.setdefault(key, 0)
+
+    def reschedule_now(self) -> None:
+        """Adelanta todas las claves para que venzan de inmediato (ej. al reanudar)."""
+        now = self._clock()
+        with self._lock:
+            for key in self._base:
+                self._base[key] = now
+                self._fire[key] = now
+
+    def time_until_next(self) -> float | None:
+        """Segundos hasta el proximo disparo (0 si ya vencio, None si no hay claves)."""
+        with self._lock:
+            if not self._fire:
+                return None
+            return max(0.0, min(self._fire.values()) - self._clock())
+
+    def due(self, lookahead: float = 0.0) -> list[Hashable]:
+        """
+        Claves cuyo disparo vencio. lookahead adelanta claves que vencen dentro
+        de esa ventana para que se lean en el mismo ciclo.
+        """
+        limit = self._clock() + lookahead
+        with self._lock:
+            return sorted(key for key, fire in self._fire.items() if fire <= limit)
+
+    def complete(self, keys: Iterable[Hashable]) -> None:
+        """Registra el fin del ciclo de las claves dadas y agenda su proximo disparo."""
+        finished_at = self._clock()
+        with self._lock:
+            for key in keys:
+                if key not in self._base:
+                    continue
+                interval = self.interval_for(key)
+                next_base = self._base[key] + interval
+                if finished_at > next_base:
+                    self._overruns[key] += 1
+                    missed = math.ceil((finished_at - next_base) / interval)
+                    next_base += missed * interval
+                self._base[key] = next_base
+                self._fire[key] = self._jittered(key, next_base)
+                self._runs[key] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            por_clave = {
+                str(key): {
+                    "intervalo_s": self.interval_for(key),
+                    "ciclos": self._runs.get(key, 0),
+                    "overruns": self._overruns.get(key, 0),
+                }
+                for key in sorted(self._base)
+            }
+            return {
+                "ciclos": sum(self._runs.values()),
+                "overruns": sum(self._overruns.values()),
+                "claves": por_clave,
+            }
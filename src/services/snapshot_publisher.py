@@ -0,0 +1,68 @@
+import threading
+
+from src import config
+from src.logger import Logosaurio
+from src.persistencia.dao.dao_historicos import historicos_dao as dao
+from src.services.mqtt_publisher import ModbusMqttPublisher
+from src.utils import timebox
+
+
+class GrdSnapshotPublisher:
+    """
+    Publica a MQTT los snapshots globales de GRDs:
+      - Grado global:   config.MQTT_TOPIC_GRADO
+      - GRDs down:      config.MQTT_TOPIC_GRDS
+    Es compartido por los clientes de GRD de todos los gateways, de modo que el
+    ultimo payload publicado es uno solo.
+    """
+
+    def __init__(self, mqtt_publisher: ModbusMqttPublisher, logger: Logosaurio):
+        self.publisher = mqtt_publisher
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._last_payload_grado = None
+        self._last_payload_down = None
+
+    def publish_if_changed(self) -> None:
+        """
+        Calcula grado global y lista de desconectados; publica si hay cambios
+        (y la primera vez siempre publica).
+        """
+        with self._lock:
+            latest_states = dao.get_latest_states_for_all_grds()
+            total = len(latest_states)
+            conectados = sum(1 for v in latest_states.values() if v == 1)
+            porcentaje = round((conectados / total) * 100, 2) if total else 0.0
+
+            grado_payload = {
+                "porcentaje": porcentaje,
+                "total": total,
+                "conectados": conectados,
+                "ts": timebox.utc_iso()
+            }
+
+            down = []
+            for item in dao.get_all_disconnected_grds():
+                down.append({
+                    "id": item["id_grd"],
+                    "nombre": item["description"],
+                    "ultima_caida": timebox.iso_from_epoch_ms(item.get("last_disconnected_timestamp"))
+                })
+
+            down_timestamp = timebox.utc_iso()
+            down_payload = {
+                "items": down,
+                "ts": down_timestamp
+            }
+
+            # Publicar grado si cambió
+            if grado_payload != self._last_payload_grado:
+                self.publisher.publish_grado(grado_payload)
+                self._last_payload_grado = grado_payload
+                self.logger.log(f"Publicado grado global en {config.MQTT_TOPIC_GRADO}: {grado_payload}", origen="OBS/MW")
+
+            # Publicar desconectados si cambió
+            if down_payload != self._last_payload_down:
+                self.publisher.publish_grds(down_payload)
+                self._last_payload_down = down_payload
+                self.logger.log(f"Publicado snapshot de desconectados en {config.MQTT_TOPIC_GRDS}: {down_payload}", origen="OBS/MW")
@@ -1,17 +1,21 @@
 import json
 import os
 import threading
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List
 
 
 class ObserverStateStore:
     """
-    Persistencia simple para banderas de observacion (hoy: relés).
+    Persistencia simple para banderas de observacion (hoy: relés) y watermarks
+    de fallas por rele. Los cambios de la bandera de relés se notifican por una
+    condicion (para hilos que esperan) y por listeners (para reaccionar al instante).
     """
 
     def __init__(self, path: str):
         self._path = path
         self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._listeners: List[Callable[[bool], None]] = []
         self._data: Dict[str, Any] = {}
         self._load()
 
@@ -39,3 +43,38 @@ class ObserverStateStore:
         with self._lock:
             self._data["reles_consultar"] = bool(enabled)
             self._save()
+            self._changed.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(bool(enabled))
+
+    def add_reles_listener(self, listener: Callable[[bool], None]) -> None:
+        """Registra un callback que recibe el nuevo valor de la bandera de relés."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def wait_reles_change(self, current: bool, timeout: float | None = None) -> bool:
+        """
+        Bloquea hasta que la bandera de relés difiera de current o venza timeout.
+        Retorna el valor vigente.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.get_reles_enabled() != current, timeout=timeout)
+            return self.get_reles_enabled()
+
+    def get_rele_watermarks(self) -> Dict[int, tuple[int, int]]:
+        """Watermarks persistidos como {unit_id: (numero_falla, slot)}."""
+        with self._lock:
+            raw = self._data.get("reles_watermark", {})
+            return {int(unit_id): (int(item["numero_falla"]), int(item["slot"])) for unit_id, item in raw.items()}
+
+    def set_rele_watermark(self, unit_id: int, numero_falla: int, slot: int) -> None:
+        with self._lock:
+            watermarks = self._data.setdefault("reles_watermark", {})
+            watermarks[str(unit_id)] = {"numero_falla": int(numero_falla), "slot": int(slot)}
+            self._save()
+
+    def clear_rele_watermark(self, unit_id: int) -> None:
+        with self._lock:
+            if self._data.get("reles_watermark", {}).pop(str(unit_id), None) is not None:
+                self._save()
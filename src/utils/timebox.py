@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from typing import Union
 
 from timeauthority import TimeAuthority, get_time_authority
@@ -28,3 +28,26 @@ def parse(value: TimestampLike, *, legacy: bool = False) -> datetime:
 
 def format_local(value: TimestampLike, fmt: str = "%Y-%m-%d %H:%M:%S", *, legacy: bool = False) -> str:
     return _AUTH.format_local(value, fmt, assume_utc_on_naive=legacy)
+
+
+# Epoch en milisegundos (UTC): formato de almacenamiento de los timestamps en la DB.
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MS = timedelta(milliseconds=1)
+
+
+def utc_now_ms() -> int:
+    return to_epoch_ms(utc_now())
+
+
+def to_epoch_ms(value: TimestampLike, *, legacy: bool = True) -> int:
+    """Epoch ms UTC de un datetime/string (naive se asume UTC salvo legacy=False)."""
+    return (parse(value, legacy=legacy) - _EPOCH) // _MS
+
+
+def from_epoch_ms(value: int) -> datetime:
+    """Datetime UTC (aware) de un epoch en milisegundos."""
+    return _EPOCH + timedelta(milliseconds=int(value))
+
+
+def iso_from_epoch_ms(value: int | None) -> str:
+    return utc_iso(from_epoch_ms(value)) if value is not None else ""
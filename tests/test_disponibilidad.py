@@ -0,0 +1,168 @@
+"""
+Los rollups de disponibilidad mantenidos en cada insert deben coincidir con los
+que recalcula disponibilidad_dao.rebuild desde 'historicos'.
+
+Uso:
+    python -m pytest tests/test_disponibilidad.py
+"""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="modbus-mw-test-")
+# config.py exige estas variables; la DB y el archivo frio van a un directorio temporal.
+for _name, _value in {
+    "MODBUS_MW_MB_HOST": "127.0.0.1",
+    "MODBUS_MW_MB_PORT": "502",
+    "MODBUS_MW_MB_ID": "1",
+    "MODBUS_MW_MB_COUNT": "17",
+    "MODBUS_MW_MB_INTERVAL_SECONDS": "30",
+    "MQTT_BROKER_HOST": "127.0.0.1",
+    "MQTT_BROKER_PORT": "1883",
+    "MQTT_BROKER_USERNAME": "test",
+    "MQTT_BROKER_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
+os.environ["MODBUS_MW_DATA_DIR"] = _DATA_DIR
+os.environ["MODBUS_MW_ARCHIVE_DIR"] = os.path.join(_DATA_DIR, "archivo")
+
+from src.persistencia import ddl_esquema, retencion  # noqa: E402
+from src.persistencia.archivo import archivo_historico  # noqa: E402
+from src.persistencia.dao.dao_base import close_all_connections, get_db_reader, release_db_connection  # noqa: E402
+from src.persistencia.dao.dao_disponibilidad import HORA_MS, DIA_MS, disponibilidad_dao  # noqa: E402
+from src.persistencia.dao.dao_grd import grd_dao  # noqa: E402
+from src.persistencia.dao.dao_historicos import historicos_dao  # noqa: E402
+from src.utils import timebox  # noqa: E402
+
+MINUTO_MS = 60_000
+
+
+def setUpModule():
+    ddl_esquema.create_database_schema()
+
+
+def tearDownModule():
+    close_all_connections()
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+def _rollups(grd_id: int) -> tuple[list[tuple], list[tuple]]:
+    conn = None
+    try:
+        conn = get_db_reader()
+        hours = [tuple(row) for row in conn.execute(
+            "SELECT hora, conectado_ms, observado_ms FROM disponibilidad_hora WHERE id_grd = ? ORDER BY hora",
+            (grd_id,)
+        )]
+        days = [tuple(row) for row in conn.execute(
+            "SELECT dia, conectado_ms, observado_ms FROM disponibilidad_dia WHERE id_grd = ? ORDER BY dia",
+            (grd_id,)
+        )]
+        return hours, days
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+
+def _first_in_db(grd_id: int) -> int:
+    conn = None
+    try:
+        conn = get_db_reader()
+        return conn.execute("SELECT MIN(timestamp) FROM historicos WHERE id_grd = ?", (grd_id,)).fetchone()[0]
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+
+def _readings(grd_id: int, start_ms: int, count: int, seed: int) -> list[tuple[int, int, int]]:
+    """Lecturas [(grd_id, timestamp, conectado)] a intervalos irregulares desde start_ms, desordenadas."""
+    rng = random.Random(seed)
+    timestamp = start_ms
+    readings = []
+    for _ in range(count):
+        timestamp += rng.randint(1, 240) * MINUTO_MS + rng.randint(0, 59_999)
+        readings.append((grd_id, timestamp, rng.randint(0, 1)))
+    rng.shuffle(readings)
+    return readings
+
+
+class DisponibilidadRollupsTest(unittest.TestCase):
+
+    def _insert(self, grd_id: int, readings: list[tuple[int, int, int]]) -> None:
+        """Mezcla inserts individuales y lotes, como el sondeo con y sin escritor diferido."""
+        grd_dao.insert_grd_description(grd_id, f"test {grd_id}")
+        index = 0
+        while index < len(readings):
+            if index % 3 == 0:
+                _, timestamp, conectado = readings[index]
+                self.assertTrue(historicos_dao.insert_historico_reading(grd_id, timestamp, conectado))
+                index += 1
+            else:
+                batch = readings[index:index + 7]
+                self.assertEqual(historicos_dao.insert_historico_readings(batch), len(batch))
+                index += len(batch)
+
+    def test_incremental_equivale_a_recalculo(self):
+        grd_id = 101
+        self._insert(grd_id, _readings(grd_id, 1_735_689_600_000, 400, seed=1))
+        incremental = _rollups(grd_id)
+        self.assertTrue(incremental[0])
+
+        disponibilidad_dao.rebuild([grd_id])
+        self.assertEqual(_rollups(grd_id), incremental)
+
+    def test_dias_suman_sus_horas(self):
+        grd_id = 102
+        self._insert(grd_id, _readings(grd_id, 1_735_689_600_000, 300, seed=2))
+        hours, days = _rollups(grd_id)
+
+        expected: dict[int, list[int]] = {}
+        for hour, conectado_ms, observado_ms in hours:
+            self.assertEqual(hour % HORA_MS, 0)
+            self.assertLessEqual(conectado_ms, observado_ms)
+            self.assertLessEqual(observado_ms, HORA_MS)
+            totals = expected.setdefault(hour - hour % DIA_MS, [0, 0])
+            totals[0] += conectado_ms
+            totals[1] += observado_ms
+        self.assertEqual(days, [(day, totals[0], totals[1]) for day, totals in sorted(expected.items())])
+
+    def test_insert_tras_archivar_cierra_la_hora_del_ancla(self):
+        # Sin lecturas posteriores al corte, el proximo insert cierra el intervalo de la
+        # fila ancla; la parte archivada de su hora no se debe perder.
+        grd_id = 104
+        hour = timebox.utc_now_ms() - 40 * DIA_MS
+        hour -= hour % HORA_MS
+        self._insert(grd_id, [(grd_id, hour + 10 * MINUTO_MS, 1), (grd_id, hour + 30 * MINUTO_MS, 0)])
+        self.assertEqual(_rollups(grd_id)[0], [(hour, 20 * MINUTO_MS, 20 * MINUTO_MS)])
+
+        retencion.archive_older_than(20)
+        self._insert(grd_id, [(grd_id, timebox.utc_now_ms() - HORA_MS, 1)])
+        hours, days = _rollups(grd_id)
+        self.assertEqual(hours[0], (hour, 20 * MINUTO_MS, 50 * MINUTO_MS))
+        self.assertEqual(days[0][1], 20 * MINUTO_MS)
+
+        disponibilidad_dao.rebuild([grd_id])
+        self.assertEqual(_rollups(grd_id), (hours, days))
+
+    def test_recalculo_con_ancla_en_archivo(self):
+        # Historia de hace ~40 dias a hoy; la retencion deja en la DB los ultimos 20
+        # y la fila ancla de cada GRD, y el recalculo no debe alterar los rollups.
+        grd_id = 103
+        start_ms = timebox.utc_now_ms() - 40 * DIA_MS
+        readings = [reading for reading in _readings(grd_id, start_ms, 600, seed=3)
+                    if reading[1] < timebox.utc_now_ms()]
+        self._insert(grd_id, readings)
+        before = _rollups(grd_id)
+
+        archived = retencion.archive_older_than(20)
+        self.assertGreater(archived["historicos"][1], 0)
+        # El recalculo toma el camino del ancla: hay historia archivada anterior a la DB.
+        self.assertLess(archivo_historico.oldest_historico(grd_id), _first_in_db(grd_id))
+        disponibilidad_dao.rebuild([grd_id])
+        self.assertEqual(_rollups(grd_id), before)
+
+
+if __name__ == "__main__":
+    unittest.main()